@@ -1,5 +1,5 @@
-from telegram.ext import CommandHandler, MessageHandler, ConversationHandler, filters
-from handlers.show import show_me, show_my_forms, show_all, handle_show_command, clear_last, clear_all
+from telegram.ext import CommandHandler, MessageHandler, ConversationHandler, CallbackQueryHandler, filters
+from handlers.show import show_me, show_my_forms, show_all, handle_forms_page, handle_show_command, clear_last, clear_all
 from handlers.form import cancel
 
 from utils.states import HEIGHT, WEIGHT, ACTIVITY_LEVEL, GENDER, YEARS_EXPERIENCE, GOAL, SHORT_WEIGHT, SHORT_ACTIVITY_LEVEL
@@ -22,6 +22,9 @@ def create_anketa_conversation() -> ConversationHandler:
             SHORT_ACTIVITY_LEVEL: [MessageHandler(filters.TEXT & ~filters.COMMAND, get_short_activity_level)],
         },
         fallbacks=[CommandHandler('cancel', cancel)],
+        # Шаг анкеты сохраняется в базе вместе с ответами (user_data)
+        name='anketa',
+        persistent=True,
     )
 
 
@@ -29,6 +32,7 @@ def register_anketa_handlers(application):
     application.add_handler(CommandHandler("show_me", show_me))
     application.add_handler(CommandHandler("my_forms", show_my_forms))
     application.add_handler(CommandHandler("show_all", show_all))
+    application.add_handler(CallbackQueryHandler(handle_forms_page, pattern=r"^forms:(prev|next):"))
     application.add_handler(CommandHandler("clear_last", clear_last))
     application.add_handler(CommandHandler("clear_all", clear_all))
     application.add_handler(create_anketa_conversation())
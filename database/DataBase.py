@@ -1,239 +1,516 @@
-import sqlite3
+import time
+from datetime import date
 
+from database.connection import get_manager, DEFAULT_PROFILE
+from database.models import UserForm, TrainingSession, TrainingLogEntry, UserSettings, FormHistoryEntry
+from database.write_queue import submit_write
+from utils.schedule import (
+    next_check_time, reminder_time, reset_time, slot_date, training_type_for, from_timestamp, to_timestamp
+)
 
-def init_db(db_path: str = 'users.db') -> None:
-    conn = sqlite3.connect(db_path)
+
+# Проекции колонок: запросы выбирают только то, что нужно вызывающему коду
+SESSION_COLUMNS = (
+    'id', 'user_id', 'week_number', 'training_days', 'current_day', 'completed_days',
+    'check01_passed', 'check02_passed', 'timezone',
+)
+PENDING_LOG_COLUMNS = ('id', 'training_type')
+FIRST_FORM_COLUMNS = ('id', 'height', 'gender', 'years_experience', 'goal')
+
+# Размер пачки для запросов, обрабатывающих все активные сессии
+DEFAULT_BATCH_SIZE = 500
+
+# Анкет на странице истории (/my_forms)
+FORM_HISTORY_PAGE_SIZE = 10
+
+
+def _invalidate_session(db_path: str = None):
+    """on_commit для submit_write: сбрасывает кэш активной сессии пользователя, id которого вернула операция"""
+    cache = get_manager(db_path).session_cache
+
+    def invalidate(user_id):
+        if user_id is not None:
+            cache.invalidate(user_id)
+    return invalidate
+
+
+def _select(conn, model, sql: str, params=()):
+    """Выполняет SELECT и возвращает курсор, строки которого - объекты модели"""
     cursor = conn.cursor()
+    cursor.row_factory = model.row_factory
+    return cursor.execute(sql, params)
+
+
+def init_db(db_path: str = None, profile: str = DEFAULT_PROFILE) -> None:
+    """Создает схему базы и применяет профиль производительности (см. PRAGMA_PROFILES)"""
+    manager = get_manager(db_path)
+    manager.set_profile(profile)
+    with manager.writer() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER,
+                username TEXT,
+                height REAL,
+                weight REAL,
+                activity_level TEXT,
+                gender TEXT,
+                years_experience INTEGER,
+                brm REAL,
+                goal TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS training_sessions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER,
+                week_number INTEGER,
+                training_days TEXT,
+                current_day INTEGER,
+                completed_days INTEGER,
+                session_active BOOLEAN DEFAULT 1,
+                check01_passed BOOLEAN DEFAULT 0,
+                check02_passed BOOLEAN DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                timezone TEXT,
+                reminder_offset INTEGER NOT NULL DEFAULT 0,
+                next_check_at INTEGER,
+                next_reminder_at INTEGER,
+                last_check_date DATE,
+                FOREIGN KEY (user_id) REFERENCES users(user_id)
+            )
+        ''')
+        # Базы, созданные до появления часовых поясов и очереди проверок
+        _add_column(cursor, 'training_sessions', 'timezone', 'TEXT')
+        _add_column(cursor, 'training_sessions', 'reminder_offset', 'INTEGER NOT NULL DEFAULT 0')
+        _add_column(cursor, 'training_sessions', 'next_check_at', 'INTEGER')
+        _add_column(cursor, 'training_sessions', 'next_reminder_at', 'INTEGER')
+        _add_column(cursor, 'training_sessions', 'last_check_date', 'DATE')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS training_log (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER,
+                session_id INTEGER,
+                training_date DATE,
+                training_type TEXT,
+                completed BOOLEAN,
+                pain_feedback TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                expires_at INTEGER,
+                FOREIGN KEY (user_id) REFERENCES users(user_id),
+                FOREIGN KEY (session_id) REFERENCES training_sessions(id)
+            )
+        ''')
+        if _add_column(cursor, 'training_log', 'expires_at', 'INTEGER'):
+            _schedule_pending_resets(cursor)
+        # Последняя версия анкеты каждого пользователя (users - журнал версий, только добавление).
+        # Колонки в том же порядке, что и в users; поддерживается триггерами ниже.
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS user_latest (
+                id INTEGER NOT NULL,
+                user_id INTEGER PRIMARY KEY,
+                username TEXT,
+                height REAL,
+                weight REAL,
+                activity_level TEXT,
+                gender TEXT,
+                years_experience INTEGER,
+                brm REAL,
+                goal TEXT,
+                created_at TIMESTAMP,
+                updated_at TIMESTAMP
+            )
+        ''')
+        # Часовой пояс и сдвиг напоминаний пользователя; копируются в training_sessions,
+        # чтобы задачи планировщика выбирали сессии по индексу. timezone NULL - пояс бота
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS user_settings (
+                user_id INTEGER PRIMARY KEY,
+                timezone TEXT,
+                reminder_offset INTEGER NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        # Служебное состояние задач планировщика (например, последний обработанный слот)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS scheduler_state (
+                name TEXT PRIMARY KEY,
+                value TEXT,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        # Аренда лидерства между экземплярами бота: задачи планировщика запускает только
+        # владелец аренды (owner), пока она не истекла (expires_at, секунды эпохи)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS leases (
+                name TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        ''')
+        # Выполненные запуски задач: ключ идемпотентности (задача, run_key), чтобы
+        # повторный запуск после смены лидера ничего не делал
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS job_runs (
+                job TEXT NOT NULL,
+                run_key TEXT NOT NULL,
+                owner TEXT,
+                started_at REAL NOT NULL,
+                finished_at REAL,
+                PRIMARY KEY (job, run_key)
+            )
+        ''')
+        # Состояние бота между перезапусками (database.persistence): context.user_data
+        # пользователя и состояния ConversationHandler, значения - JSON
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS bot_user_data (
+                user_id INTEGER PRIMARY KEY,
+                data TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS bot_conversations (
+                name TEXT NOT NULL,
+                key TEXT NOT NULL,
+                state TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (name, key)
+            )
+        ''')
+        create_indexes(cursor)
+        create_triggers(cursor)
+        _schedule_unscheduled_sessions(cursor)
+
+
+def _add_column(cursor, table: str, column: str, definition: str) -> bool:
+    """Добавляет колонку в существующую таблицу, если ее еще нет; True - колонка добавлена"""
+    columns = {row[1] for row in cursor.execute(f'PRAGMA table_info({table})')}
+    if column in columns:
+        return False
+    cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+    return True
+
+
+def _schedule_pending_resets(cursor) -> None:
+    """Задает срок ответа проверкам без ответа, созданным до появления expires_at (однократно)"""
+    rows = cursor.execute('''
+        SELECT l.id, l.training_date, s.timezone, s.reminder_offset
+        FROM training_log AS l JOIN training_sessions AS s ON s.id = l.session_id
+        WHERE l.completed IS NULL AND s.session_active = 1
+    ''').fetchall()
+    cursor.executemany('UPDATE training_log SET expires_at = ? WHERE id = ?', [
+        (to_timestamp(reset_time(date.fromisoformat(training_date), timezone, reminder_offset)), log_id)
+        for log_id, training_date, timezone, reminder_offset in rows
+    ])
+
+
+def _schedule_unscheduled_sessions(cursor, limit: int = DEFAULT_BATCH_SIZE) -> None:
+    """Заполняет next_check_at активных сессий, созданных до очереди проверок (пачками по id)"""
+    after_session_id = 0
+    while True:
+        sessions = _select(cursor.connection, TrainingSession, '''
+            SELECT id, training_days, timezone, reminder_offset FROM training_sessions
+            WHERE session_active = 1 AND next_check_at IS NULL AND id > ?
+            ORDER BY id
+            LIMIT ?
+        ''', (after_session_id, limit)).fetchall()
+        if not sessions:
+            break
+        cursor.executemany('UPDATE training_sessions SET next_check_at = ? WHERE id = ?', [
+            (to_timestamp(next_check_time(s.training_days, s.timezone, s.reminder_offset)), s.id)
+            for s in sessions
+        ])
+        after_session_id = sessions[-1].id
+
+
+def create_indexes(cursor) -> None:
+    """Создает составные и частичные индексы под запросы этого модуля (см. tools/check_query_plans.py)"""
+    # Одноколоночные индексы по user_id покрываются составными индексами ниже
+    cursor.execute('DROP INDEX IF EXISTS idx_user_id')
+    cursor.execute('DROP INDEX IF EXISTS idx_training_user_id')
+    cursor.execute('DROP INDEX IF EXISTS idx_training_log_user_id')
+
+    # Анкеты пользователя по дате: последняя/первая/предыдущая анкета, история, удаление
     cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            username TEXT,
-            height REAL,
-            weight REAL,
-            activity_level TEXT,
-            gender TEXT,
-            years_experience INTEGER,
-            brm REAL,
-            goal TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
+        CREATE INDEX IF NOT EXISTS idx_users_user_created ON users(user_id, created_at)
     ''')
+    # Список пользователей для администратора в порядке заполнения
+    cursor.execute('DROP INDEX IF EXISTS idx_users_created')
     cursor.execute('''
-        CREATE TABLE IF NOT EXISTS training_sessions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            week_number INTEGER,
-            training_days TEXT,
-            current_day INTEGER,
-            completed_days INTEGER,
-            session_active BOOLEAN DEFAULT 1,
-            check01_passed BOOLEAN DEFAULT 0,
-            check02_passed BOOLEAN DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users(user_id)
-        )
+        CREATE INDEX IF NOT EXISTS idx_user_latest_created ON user_latest(created_at)
     ''')
+    # Активная сессия пользователя (get_active_training_session, advance_to_next_week)
     cursor.execute('''
-        CREATE TABLE IF NOT EXISTS training_log (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            session_id INTEGER,
-            training_date DATE,
-            training_type TEXT,
-            completed BOOLEAN,
-            pain_feedback TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users(user_id),
-            FOREIGN KEY (session_id) REFERENCES training_sessions(id)
-        )
+        CREATE INDEX IF NOT EXISTS idx_sessions_user_active_created
+        ON training_sessions(user_id, session_active, created_at)
     ''')
+    # Полный список активных сессий заменен очередью проверок (см. ниже)
+    cursor.execute('DROP INDEX IF EXISTS idx_sessions_active_created')
+    # Слоты напоминаний заменены очередью проверок (next_check_at, expires_at)
+    cursor.execute('DROP INDEX IF EXISTS idx_sessions_active_days')
+    cursor.execute('DROP INDEX IF EXISTS idx_sessions_active_slot')
+    # Очередь проверок и напоминаний: задачи планировщика выбирают только сессии,
+    # время которых наступило, в порядке времени
     cursor.execute('''
-        CREATE INDEX IF NOT EXISTS idx_user_id ON users(user_id)
+        CREATE INDEX IF NOT EXISTS idx_sessions_next_check
+        ON training_sessions(next_check_at, id) WHERE session_active = 1
     ''')
     cursor.execute('''
-        CREATE INDEX IF NOT EXISTS idx_training_user_id ON training_sessions(user_id)
+        CREATE INDEX IF NOT EXISTS idx_sessions_next_reminder
+        ON training_sessions(next_reminder_at, id) WHERE session_active = 1 AND next_reminder_at IS NOT NULL
     ''')
+    # Очистка старых запусков задач
     cursor.execute('''
-        CREATE INDEX IF NOT EXISTS idx_training_log_user_id ON training_log(user_id)
+        CREATE INDEX IF NOT EXISTS idx_job_runs_finished ON job_runs(finished_at) WHERE finished_at IS NOT NULL
     ''')
-    conn.commit()
-    conn.close()
-
-
-def save_user_to_db(user_data: dict, db_path: str = 'users.db') -> None:
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
-    # Всегда создаем новую запись
+    # Лог тренировок пользователя по дате
     cursor.execute('''
-        INSERT INTO users 
-        (user_id, username, height, weight, activity_level, gender, years_experience, brm, goal)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (
-        user_data['user_id'],
-        user_data['username'],
-        user_data['height'],
-        user_data['weight'],
-        user_data['activity_level'],
-        user_data['gender'],
-        user_data['years_experience'],
-        user_data.get('brm'),
-        user_data.get('goal')
-    ))
-
-    conn.commit()
-    conn.close()
-def get_all_users(db_path: str = 'users.db'):
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+        CREATE INDEX IF NOT EXISTS idx_training_log_user_date ON training_log(user_id, training_date)
+    ''')
+    # Лог тренировок конкретной сессии
     cursor.execute('''
-        SELECT u1.* FROM users u1
-        INNER JOIN (
-            SELECT user_id, MAX(created_at) as max_date 
-            FROM users 
-            GROUP BY user_id
-        ) u2 ON u1.user_id = u2.user_id AND u1.created_at = u2.max_date
-        ORDER BY u1.created_at DESC
+        CREATE INDEX IF NOT EXISTS idx_training_log_user_session_date
+        ON training_log(user_id, session_id, training_date, created_at)
+    ''')
+    # Тренировки, ожидающие ответа (completed IS NULL) - небольшая часть лога.
+    # completed включен в индекс, чтобы get_pending_training_check читал только индекс
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_training_log_pending
+        ON training_log(user_id, training_date, created_at, training_type, completed) WHERE completed IS NULL
+    ''')
+    # Проверки без ответа по сроку ответа: сброс сессий выбирает только истекшие
+    # (completed включен, чтобы подзапрос сброса читал только индекс)
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_training_log_expires
+        ON training_log(expires_at, session_id, completed) WHERE completed IS NULL AND expires_at IS NOT NULL
     ''')
-    users = cursor.fetchall()
-    conn.close()
-    return users
 
 
-def get_user_by_id(user_id: int, db_path: str = 'users.db'):
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+def create_triggers(cursor) -> None:
+    """Триггеры, поддерживающие user_latest в актуальном состоянии"""
+    # Новая анкета заменяет последнюю, если она не старше текущей
     cursor.execute('''
-        SELECT * FROM users 
-        WHERE user_id = ? 
-        ORDER BY created_at DESC 
-        LIMIT 1
-    ''', (user_id,))
-    user = cursor.fetchone()
-    conn.close()
-    return user
-
-
-def get_all_user_forms(user_id: int, db_path: str = 'users.db'):
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+        CREATE TRIGGER IF NOT EXISTS trg_users_latest_insert AFTER INSERT ON users
+        BEGIN
+            INSERT INTO user_latest
+            (id, user_id, username, height, weight, activity_level, gender,
+             years_experience, brm, goal, created_at, updated_at)
+            VALUES (NEW.id, NEW.user_id, NEW.username, NEW.height, NEW.weight, NEW.activity_level,
+                    NEW.gender, NEW.years_experience, NEW.brm, NEW.goal, NEW.created_at, NEW.updated_at)
+            ON CONFLICT(user_id) DO UPDATE SET
+                id = excluded.id, username = excluded.username, height = excluded.height,
+                weight = excluded.weight, activity_level = excluded.activity_level,
+                gender = excluded.gender, years_experience = excluded.years_experience,
+                brm = excluded.brm, goal = excluded.goal,
+                created_at = excluded.created_at, updated_at = excluded.updated_at
+            WHERE excluded.created_at >= user_latest.created_at;
+        END
+    ''')
+    # При удалении последней анкеты ее место занимает предыдущая
     cursor.execute('''
-        SELECT DISTINCT * FROM users 
-        WHERE user_id = ? 
-        ORDER BY created_at ASC
-    ''', (user_id,))
-    forms = cursor.fetchall()
-    conn.close()
+        CREATE TRIGGER IF NOT EXISTS trg_users_latest_delete AFTER DELETE ON users
+        BEGIN
+            DELETE FROM user_latest WHERE user_id = OLD.user_id AND id = OLD.id;
+            INSERT OR IGNORE INTO user_latest
+            SELECT * FROM users WHERE user_id = OLD.user_id
+            ORDER BY created_at DESC, id DESC
+            LIMIT 1;
+        END
+    ''')
+
+
+def backfill_user_latest(db_path: str = None) -> int:
+    """Заполняет user_latest по существующей таблице users (однократно для старых баз)"""
+    with get_manager(db_path).writer() as conn:
+        conn.execute('DELETE FROM user_latest')
+        cursor = conn.execute('''
+            INSERT INTO user_latest
+            SELECT * FROM users u1
+            WHERE u1.id = (
+                SELECT u2.id FROM users u2
+                WHERE u2.user_id = u1.user_id
+                ORDER BY u2.created_at DESC, u2.id DESC
+                LIMIT 1
+            )
+        ''')
+        return cursor.rowcount
+
+
+def save_user_to_db(user_data: dict, db_path: str = None, durable: bool = True) -> None:
+    def op(conn):
+        # Всегда создаем новую запись
+        conn.execute('''
+            INSERT INTO users
+            (user_id, username, height, weight, activity_level, gender, years_experience, brm, goal)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            user_data['user_id'],
+            user_data['username'],
+            user_data['height'],
+            user_data['weight'],
+            user_data['activity_level'],
+            user_data['gender'],
+            user_data['years_experience'],
+            user_data.get('brm'),
+            user_data.get('goal')
+        ))
+
+    submit_write(op, db_path, durable)
+
+
+def get_all_users(columns: tuple = None, db_path: str = None):
+    with get_manager(db_path).reader() as conn:
+        cursor = _select(conn, UserForm, f'''
+            SELECT {UserForm.columns(columns)} FROM user_latest
+            ORDER BY created_at DESC
+        ''')
+        return cursor.fetchall()
+
+
+def get_user_by_id(user_id: int, columns: tuple = None, db_path: str = None):
+    with get_manager(db_path).reader() as conn:
+        cursor = _select(conn, UserForm, f'''
+            SELECT {UserForm.columns(columns)} FROM user_latest WHERE user_id = ?
+        ''', (user_id,))
+        return cursor.fetchone()
+
+
+def get_user_form_history(user_id: int, after_id: int = None, before_id: int = None,
+                          limit: int = FORM_HISTORY_PAGE_SIZE, db_path: str = None):
+    """Страница истории анкет пользователя в порядке заполнения (одним запросом)
+
+    after_id - страница после анкеты after_id, before_id - перед анкетой before_id,
+    иначе первая страница. У каждой анкеты previous_weight / previous_activity_level -
+    значения предыдущей анкеты (LAG), total - число анкет пользователя. Для LAG на первой
+    строке страницы запрос берет по ключу (created_at, id) на одну анкету больше.
+    """
+    key = after_id if after_id is not None else before_id
+    if key is None:
+        condition, order, extra = '', 'ASC', 0
+    elif after_id is not None:
+        # Анкета after_id - предыдущая для первой строки страницы
+        condition, order, extra = 'AND (created_at, id) >= (SELECT created_at, id FROM users WHERE id = ? AND user_id = ?)', 'ASC', 1
+    else:
+        condition, order, extra = 'AND (created_at, id) < (SELECT created_at, id FROM users WHERE id = ? AND user_id = ?)', 'DESC', 1
+    params = [user_id, user_id] + ([key, user_id] if key is not None else []) + [limit + extra]
+
+    with get_manager(db_path).reader() as conn:
+        cursor = _select(conn, FormHistoryEntry, f'''
+            SELECT id, height, weight, activity_level, gender, years_experience, goal, created_at,
+                   LAG(weight) OVER w AS previous_weight,
+                   LAG(activity_level) OVER w AS previous_activity_level,
+                   (SELECT COUNT(*) FROM users WHERE user_id = ?) AS total
+            FROM (
+                SELECT id, height, weight, activity_level, gender, years_experience, goal, created_at
+                FROM users
+                WHERE user_id = ? {condition}
+                ORDER BY created_at {order}, id {order}
+                LIMIT ?
+            )
+            WINDOW w AS (ORDER BY created_at, id)
+            ORDER BY created_at, id
+        ''', params)
+        forms = cursor.fetchall()
+
+    # Предыдущая анкета нужна только для LAG: после after_id это сама after_id,
+    # перед before_id - лишняя строка (ее нет, если страница начинается с первой анкеты)
+    if after_id is not None or len(forms) > limit:
+        forms = forms[1:]
     return forms
 
 
-def delete_last_user_form(user_id: int, db_path: str = 'users.db') -> int:
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute('''
-        DELETE FROM users WHERE id = (
-            SELECT id FROM users WHERE user_id = ? ORDER BY created_at DESC LIMIT 1
-        )
-    ''', (user_id,))
-    deleted = cursor.rowcount
-    conn.commit()
-    conn.close()
-    return deleted
-
-
-def delete_all_user_forms(user_id: int, db_path: str = 'users.db') -> int:
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute('DELETE FROM users WHERE user_id = ?', (user_id,))
-    deleted = cursor.rowcount
-    conn.commit()
-    conn.close()
-    return deleted
+def delete_last_user_form(user_id: int, db_path: str = None) -> int:
+    def op(conn):
+        cursor = conn.execute('''
+            DELETE FROM users WHERE id = (
+                SELECT id FROM users WHERE user_id = ? ORDER BY created_at DESC LIMIT 1
+            )
+        ''', (user_id,))
+        return cursor.rowcount
+
+    return submit_write(op, db_path)
+
+
+def delete_all_user_forms(user_id: int, db_path: str = None) -> int:
+    def op(conn):
+        cursor = conn.execute('DELETE FROM users WHERE user_id = ?', (user_id,))
+        return cursor.rowcount
+
+    return submit_write(op, db_path)
 
 
-def has_user_forms(user_id: int, db_path: str = 'users.db') -> bool:
+def has_user_forms(user_id: int, db_path: str = None) -> bool:
     """Проверяет, есть ли у пользователя хотя бы одна анкета"""
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute('SELECT COUNT(*) FROM users WHERE user_id = ?', (user_id,))
-    count = cursor.fetchone()[0]
-    conn.close()
-    return count > 0
+    with get_manager(db_path).reader() as conn:
+        # Последняя анкета есть тогда и только тогда, когда есть хотя бы одна
+        cursor = conn.execute('SELECT 1 FROM user_latest WHERE user_id = ?', (user_id,))
+        return cursor.fetchone() is not None
 
 
-def get_user_first_form(user_id: int, db_path: str = 'users.db'):
+def get_user_first_form(user_id: int, columns: tuple = FIRST_FORM_COLUMNS, db_path: str = None):
     """Получает первую анкету пользователя"""
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT * FROM users 
-        WHERE user_id = ? 
-        ORDER BY created_at ASC 
-        LIMIT 1
-    ''', (user_id,))
-    form = cursor.fetchone()
-    conn.close()
-    return form
-
-
-def get_user_previous_form(user_id: int, current_form_id: int, db_path: str = 'users.db'):
-    """Получает предыдущую анкету пользователя относительно текущей"""
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT * FROM users 
-        WHERE user_id = ? AND id < ?
-        ORDER BY created_at DESC 
-        LIMIT 1
-    ''', (user_id, current_form_id))
-    form = cursor.fetchone()
-    conn.close()
-    return form
+    with get_manager(db_path).reader() as conn:
+        cursor = _select(conn, UserForm, f'''
+            SELECT {UserForm.columns(columns)} FROM users
+            WHERE user_id = ?
+            ORDER BY created_at ASC
+            LIMIT 1
+        ''', (user_id,))
+        return cursor.fetchone()
 
 
 # Функции для тренировочного процесса
-def create_training_session(user_id: int, week_number: int, training_days: str, db_path: str = 'users.db') -> int:
-    """Создает новую тренировочную сессию"""
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO training_sessions (user_id, week_number, training_days, current_day, completed_days)
-        VALUES (?, ?, ?, 0, 0)
-    ''', (user_id, week_number, training_days))
-    session_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
-    return session_id
-
-
-def get_active_training_session(user_id: int, db_path: str = 'users.db'):
-    """Получает активную тренировочную сессию пользователя"""
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT * FROM training_sessions 
-        WHERE user_id = ? AND session_active = 1
-        ORDER BY created_at DESC 
-        LIMIT 1
-    ''', (user_id,))
-    session = cursor.fetchone()
-    conn.close()
-    return session
-
-
-def update_training_session(session_id: int, current_day: int = None, completed_days: int = None, 
-                          session_active: bool = None, check01_passed: bool = None, 
-                          check02_passed: bool = None, week_number: int = None, db_path: str = 'users.db'):
-    """Обновляет тренировочную сессию"""
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
+def create_training_session(user_id: int, week_number: int, training_days: str, db_path: str = None) -> int:
+    """Создает новую тренировочную сессию (с часовым поясом из настроек пользователя)"""
+    def op(conn):
+        settings = conn.execute('''
+            SELECT timezone, reminder_offset FROM user_settings WHERE user_id = ?
+        ''', (user_id,)).fetchone()
+        timezone, reminder_offset = settings or (None, 0)
+        # Время первой проверки считается здесь: часовые пояса недоступны в SQL
+        next_check_at = to_timestamp(next_check_time(training_days, timezone, reminder_offset))
+        cursor = conn.execute('''
+            INSERT INTO training_sessions
+            (user_id, week_number, training_days, current_day, completed_days,
+             timezone, reminder_offset, next_check_at)
+            VALUES (?, ?, ?, 0, 0, ?, ?, ?)
+        ''', (user_id, week_number, training_days, timezone, reminder_offset, next_check_at))
+        return cursor.lastrowid
+
+    cache = get_manager(db_path).session_cache
+    return submit_write(op, db_path, on_commit=lambda session_id: cache.invalidate(user_id))
+
+
+def get_active_training_session(user_id: int, db_path: str = None):
+    """Получает активную тренировочную сессию пользователя (через кэш manager.session_cache)"""
+    manager = get_manager(db_path)
+
+    def load():
+        with manager.reader() as conn:
+            cursor = _select(conn, TrainingSession, f'''
+                SELECT {TrainingSession.columns(SESSION_COLUMNS)} FROM training_sessions
+                WHERE user_id = ? AND session_active = 1
+                ORDER BY created_at DESC
+                LIMIT 1
+            ''', (user_id,))
+            return cursor.fetchone()
+
+    return manager.session_cache.get(user_id, load)
+
+
+def update_training_session(session_id: int, current_day: int = None, completed_days: int = None,
+                          session_active: bool = None, check01_passed: bool = None,
+                          check02_passed: bool = None, week_number: int = None, db_path: str = None,
+                          durable: bool = True):
+    """Обновляет тренировочную сессию (durable=False - не ждать коммита group commit)"""
     updates = []
     params = []
-    
+
     if current_day is not None:
         updates.append("current_day = ?")
         params.append(current_day)
@@ -252,113 +529,465 @@ def update_training_session(session_id: int, current_day: int = None, completed_
     if week_number is not None:
         updates.append("week_number = ?")
         params.append(week_number)
-    
-    if updates:
-        updates.append("updated_at = CURRENT_TIMESTAMP")
-        params.append(session_id)
-        
-        query = f"UPDATE training_sessions SET {', '.join(updates)} WHERE id = ?"
-        cursor.execute(query, params)
-    
-    conn.commit()
-    conn.close()
-
-
-def add_training_log(user_id: int, session_id: int, training_date: str, training_type: str, 
-                    completed: bool, pain_feedback: str = None, db_path: str = 'users.db'):
-    """Добавляет запись в лог тренировок"""
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO training_log (user_id, session_id, training_date, training_type, completed, pain_feedback)
-        VALUES (?, ?, ?, ?, ?, ?)
-    ''', (user_id, session_id, training_date, training_type, completed, pain_feedback))
-    conn.commit()
-    conn.close()
 
+    if not updates:
+        return
+
+    updates.append("updated_at = CURRENT_TIMESTAMP")
+    params.append(session_id)
+
+    query = f"UPDATE training_sessions SET {', '.join(updates)} WHERE id = ? RETURNING user_id"
+
+    def op(conn):
+        row = conn.execute(query, params).fetchone()
+        return row[0] if row else None
+
+    submit_write(op, db_path, durable, on_commit=_invalidate_session(db_path))
+
+
+def add_training_log(user_id: int, session_id: int, training_date: str, training_type: str,
+                    completed: bool, pain_feedback: str = None, db_path: str = None,
+                    durable: bool = True):
+    """Добавляет запись в лог тренировок и возвращает ее id (durable=False - не ждать коммита, вернет None)"""
+    def op(conn):
+        cursor = conn.execute('''
+            INSERT INTO training_log (user_id, session_id, training_date, training_type, completed, pain_feedback)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (user_id, session_id, training_date, training_type, completed, pain_feedback))
+        return cursor.lastrowid
+
+    return submit_write(op, db_path, durable)
+
+
+def update_training_log(log_id: int, completed: bool = None, pain_feedback: str = None,
+                        db_path: str = None):
+    """Обновляет запись лога тренировок и возвращает ее новое состояние (None, если записи нет)"""
+    updates = []
+    params = []
+
+    if completed is not None:
+        updates.append("completed = ?")
+        params.append(completed)
+    if pain_feedback is not None:
+        updates.append("pain_feedback = ?")
+        params.append(pain_feedback)
+
+    if not updates:
+        return None
+
+    params.append(log_id)
+    # RETURNING отдает обновленную строку тем же запросом - без повторного SELECT
+    query = f'''
+        UPDATE training_log SET {', '.join(updates)} WHERE id = ?
+        RETURNING {TrainingLogEntry.columns()}
+    '''
+
+    def op(conn):
+        return _select(conn, TrainingLogEntry, query, params).fetchone()
+
+    return submit_write(op, db_path)
 
-def get_training_log(user_id: int, session_id: int = None, db_path: str = 'users.db'):
+
+def get_training_log(user_id: int, session_id: int = None, db_path: str = None):
     """Получает лог тренировок пользователя"""
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
-    if session_id:
-        cursor.execute('''
-            SELECT * FROM training_log 
-            WHERE user_id = ? AND session_id = ?
-            ORDER BY training_date DESC
-        ''', (user_id, session_id))
-    else:
-        cursor.execute('''
-            SELECT * FROM training_log 
-            WHERE user_id = ?
-            ORDER BY training_date DESC
+    with get_manager(db_path).reader() as conn:
+        if session_id:
+            cursor = _select(conn, TrainingLogEntry, '''
+                SELECT * FROM training_log
+                WHERE user_id = ? AND session_id = ?
+                ORDER BY training_date DESC
+            ''', (user_id, session_id))
+        else:
+            cursor = _select(conn, TrainingLogEntry, '''
+                SELECT * FROM training_log
+                WHERE user_id = ?
+                ORDER BY training_date DESC
+            ''', (user_id,))
+        return cursor.fetchall()
+
+
+def advance_to_next_week(user_id: int, db_path: str = None):
+    """Переводит пользователя на следующую неделю тренировок"""
+    def op(conn):
+        # Получаем активную сессию
+        cursor = _select(conn, TrainingSession, '''
+            SELECT id, week_number FROM training_sessions
+            WHERE user_id = ? AND session_active = 1
+            ORDER BY created_at DESC
+            LIMIT 1
         ''', (user_id,))
-    
-    logs = cursor.fetchall()
-    conn.close()
-    return logs
+        session = cursor.fetchone()
 
+        if not session:
+            return None
+
+        session_id = session.id
+        new_week = session.week_number + 1
 
-def advance_to_next_week(user_id: int, db_path: str = 'users.db'):
-    """Переводит пользователя на следующую неделю тренировок"""
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
-    # Получаем активную сессию
-    cursor.execute('''
-        SELECT * FROM training_sessions 
-        WHERE user_id = ? AND session_active = 1
-        ORDER BY created_at DESC 
-        LIMIT 1
-    ''', (user_id,))
-    session = cursor.fetchone()
-    
-    if session:
-        session_id = session[0]
-        current_week = session[2]
-        new_week = current_week + 1
-        
         # Обновляем номер недели и сбрасываем счетчики
-        cursor.execute('''
-            UPDATE training_sessions 
-            SET week_number = ?, completed_days = 0, current_day = 0, 
+        conn.execute('''
+            UPDATE training_sessions
+            SET week_number = ?, completed_days = 0, current_day = 0,
                 check02_passed = 0, updated_at = CURRENT_TIMESTAMP
             WHERE id = ?
         ''', (new_week, session_id))
-        
-        conn.commit()
-        conn.close()
         return new_week
-    else:
-        conn.close()
-        return None
-
-
-def get_all_active_training_sessions(db_path: str = 'users.db'):
-    """Получает все активные тренировочные сессии"""
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT * FROM training_sessions 
-        WHERE session_active = 1
-        ORDER BY created_at DESC
-    ''')
-    sessions = cursor.fetchall()
-    conn.close()
-    return sessions
 
-
-def get_pending_training_check(user_id: int, training_date: str, db_path: str = 'users.db'):
+    cache = get_manager(db_path).session_cache
+    return submit_write(op, db_path, on_commit=lambda new_week: cache.invalidate(user_id))
+
+
+def deactivate_training_sessions(user_ids, db_path: str = None) -> int:
+    """Завершает активные сессии пользователей (например, заблокировавших бота); возвращает их количество"""
+    user_ids = list(user_ids)
+
+    def op(conn):
+        cursor = conn.executemany('''
+            UPDATE training_sessions
+            SET session_active = 0, updated_at = CURRENT_TIMESTAMP
+            WHERE user_id = ? AND session_active = 1
+        ''', [(user_id,) for user_id in user_ids])
+        return cursor.rowcount
+
+    cache = get_manager(db_path).session_cache
+
+    def invalidate(count):
+        for user_id in user_ids:
+            cache.invalidate(user_id)
+
+    return submit_write(op, db_path, on_commit=invalidate)
+
+
+def claim_due_training_checks(now, not_before=None, limit: int = DEFAULT_BATCH_SIZE, db_path: str = None):
+    """Создает проверки тренировки для следующей пачки сессий, у которых наступило next_check_at
+
+    Для каждой выбранной сессии создается запись лога (completed = NULL, expires_at -
+    срок ответа) за день проверки по местному времени пользователя, а next_check_at переносится на
+    следующую после now проверку, next_reminder_at - на напоминание о ней.
+    Выбранные сессии уходят из очереди, поэтому следующий вызов продолжает с места,
+    где остановился предыдущий. Проверки, запланированные раньше not_before
+    (простой бота), только переносятся.
+
+    Возвращает записи лога в порядке очереди; id None - запись не создана (уже есть
+    за этот день или проверка устарела). Пустой список - очередь пуста.
+    """
+    def op(conn):
+        sessions = _select(conn, TrainingSession, '''
+            SELECT id, user_id, training_days, timezone, reminder_offset, next_check_at
+            FROM training_sessions
+            WHERE session_active = 1 AND next_check_at <= ?
+            ORDER BY next_check_at, id
+            LIMIT ?
+        ''', (to_timestamp(now), limit)).fetchall()
+
+        entries = []
+        updates = []
+        for session in sessions:
+            check_at = from_timestamp(session.next_check_at)
+            training_date = slot_date(check_at, session.timezone, session.reminder_offset)
+            entry = TrainingLogEntry(
+                user_id=session.user_id, session_id=session.id, training_date=training_date.isoformat(),
+                training_type=training_type_for(session.training_days, training_date.weekday())
+            )
+            if entry.training_type is not None and (not_before is None or check_at >= not_before):
+                entry.expires_at = to_timestamp(
+                    reset_time(training_date, session.timezone, session.reminder_offset)
+                )
+                cursor = conn.execute('''
+                    INSERT INTO training_log
+                    (user_id, session_id, training_date, training_type, completed, expires_at)
+                    SELECT ?, ?, ?, ?, NULL, ?
+                    WHERE NOT EXISTS (SELECT 1 FROM training_log WHERE user_id = ? AND training_date = ?)
+                ''', (entry.user_id, entry.session_id, entry.training_date, entry.training_type,
+                      entry.expires_at, entry.user_id, entry.training_date))
+                entry.id = cursor.lastrowid if cursor.rowcount else None
+            entries.append(entry)
+
+            next_reminder_at = None
+            if entry.id is not None:
+                next_reminder_at = to_timestamp(
+                    reminder_time(training_date, session.timezone, session.reminder_offset)
+                )
+            updates.append((
+                to_timestamp(next_check_time(session.training_days, session.timezone, session.reminder_offset,
+                                             max(check_at, now))),
+                next_reminder_at, entry.training_date if entry.id is not None else None, session.id
+            ))
+
+        # Сессии без новой проверки сохраняют ранее запланированное напоминание
+        conn.executemany('''
+            UPDATE training_sessions
+            SET next_check_at = ?,
+                next_reminder_at = COALESCE(?, next_reminder_at),
+                last_check_date = COALESCE(?, last_check_date)
+            WHERE id = ?
+        ''', updates)
+        return entries
+
+    return submit_write(op, db_path)
+
+
+def claim_due_training_reminders(now, not_before=None, limit: int = DEFAULT_BATCH_SIZE,
+                                 db_path: str = None):
+    """Следующая пачка сессий, у которых наступило next_reminder_at; напоминание снимается с очереди
+
+    Возвращает записи лога (session_id, user_id, training_type) в порядке очереди:
+    training_type - тип тренировки, проверка которой (last_check_date) еще без ответа;
+    None - пользователь уже ответил или напоминание устарело (раньше not_before).
+    Пустой список - очередь пуста.
+    """
+    def op(conn):
+        sessions = _select(conn, TrainingSession, '''
+            SELECT id, user_id, next_reminder_at, last_check_date FROM training_sessions
+            WHERE session_active = 1 AND next_reminder_at IS NOT NULL AND next_reminder_at <= ?
+            ORDER BY next_reminder_at, id
+            LIMIT ?
+        ''', (to_timestamp(now), limit)).fetchall()
+        if not sessions:
+            return []
+
+        entries = []
+        for session in sessions:
+            training_type = None
+            if not_before is None or from_timestamp(session.next_reminder_at) >= not_before:
+                # Колонки входят в частичный индекс idx_training_log_pending
+                row = conn.execute('''
+                    SELECT training_type FROM training_log
+                    WHERE user_id = ? AND training_date = ? AND completed IS NULL
+                    ORDER BY created_at DESC
+                    LIMIT 1
+                ''', (session.user_id, session.last_check_date)).fetchone()
+                training_type = row[0] if row else None
+            entries.append(TrainingLogEntry(user_id=session.user_id, session_id=session.id,
+                                            training_date=session.last_check_date,
+                                            training_type=training_type))
+
+        conn.executemany('UPDATE training_sessions SET next_reminder_at = NULL WHERE id = ?',
+                         [(session.id,) for session in sessions])
+        return entries
+
+    return submit_write(op, db_path)
+
+
+def deactivate_unanswered_sessions(now, not_before=None, db_path: str = None) -> list:
+    """Завершает сессии, у которых истек срок ответа на проверку тренировки; возвращает их user_id
+
+    Одна транзакция: UPDATE ... RETURNING завершает все сессии с проверкой без ответа,
+    expires_at которой наступил к now, и снимает истекшие проверки с очереди.
+    Проверки, истекшие раньше not_before (простой бота), снимаются без сброса сессии.
+    """
+    now_ts = to_timestamp(now)
+    not_before_ts = to_timestamp(not_before) if not_before is not None else 0
+
+    def op(conn):
+        cursor = conn.execute('''
+            UPDATE training_sessions SET session_active = 0, updated_at = CURRENT_TIMESTAMP
+            WHERE session_active = 1 AND id IN (
+                SELECT session_id FROM training_log
+                WHERE completed IS NULL AND expires_at IS NOT NULL AND expires_at BETWEEN ? AND ?
+            )
+            RETURNING user_id
+        ''', (not_before_ts, now_ts))
+        user_ids = [row[0] for row in cursor]
+        conn.execute('''
+            UPDATE training_log SET expires_at = NULL
+            WHERE completed IS NULL AND expires_at IS NOT NULL AND expires_at <= ?
+        ''', (now_ts,))
+        return user_ids
+
+    cache = get_manager(db_path).session_cache
+
+    def invalidate(user_ids):
+        for user_id in user_ids:
+            cache.invalidate(user_id)
+
+    return submit_write(op, db_path, on_commit=invalidate)
+
+
+def get_pending_training_check(user_id: int, training_date: str, db_path: str = None):
     """Получает запись о проверке тренировки"""
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT * FROM training_log 
-        WHERE user_id = ? AND training_date = ? AND completed IS NULL
-        ORDER BY created_at DESC 
-        LIMIT 1
-    ''', (user_id, training_date))
-    log = cursor.fetchone()
-    conn.close()
-    return log
\ No newline at end of file
+    with get_manager(db_path).reader() as conn:
+        # Колонки входят в частичный индекс idx_training_log_pending - запрос не читает таблицу
+        cursor = _select(conn, TrainingLogEntry, f'''
+            SELECT {TrainingLogEntry.columns(PENDING_LOG_COLUMNS)} FROM training_log
+            WHERE user_id = ? AND training_date = ? AND completed IS NULL
+            ORDER BY created_at DESC
+            LIMIT 1
+        ''', (user_id, training_date))
+        return cursor.fetchone()
+
+
+# Настройки напоминаний
+def get_user_settings(user_id: int, db_path: str = None):
+    """Получает часовой пояс и сдвиг напоминаний пользователя (None - настройки по умолчанию)"""
+    with get_manager(db_path).reader() as conn:
+        cursor = _select(conn, UserSettings, '''
+            SELECT user_id, timezone, reminder_offset, updated_at FROM user_settings WHERE user_id = ?
+        ''', (user_id,))
+        return cursor.fetchone()
+
+
+def set_user_settings(user_id: int, timezone: str, reminder_offset: int = 0, db_path: str = None) -> None:
+    """Сохраняет часовой пояс и сдвиг напоминаний и применяет их к сессиям пользователя"""
+    def op(conn):
+        conn.execute('''
+            INSERT INTO user_settings (user_id, timezone, reminder_offset) VALUES (?, ?, ?)
+            ON CONFLICT(user_id) DO UPDATE SET
+                timezone = excluded.timezone,
+                reminder_offset = excluded.reminder_offset,
+                updated_at = CURRENT_TIMESTAMP
+        ''', (user_id, timezone, reminder_offset))
+        # Запланированные проверка и напоминание переносятся на новое местное время
+        sessions = _select(conn, TrainingSession, '''
+            SELECT id, training_days, next_reminder_at, last_check_date FROM training_sessions
+            WHERE user_id = ? AND session_active = 1
+        ''', (user_id,)).fetchall()
+        conn.executemany('''
+            UPDATE training_sessions
+            SET timezone = ?, reminder_offset = ?, next_check_at = ?, next_reminder_at = ?,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', [
+            (timezone, reminder_offset,
+             to_timestamp(next_check_time(s.training_days, timezone, reminder_offset)),
+             to_timestamp(reminder_time(date.fromisoformat(s.last_check_date), timezone, reminder_offset))
+             if s.next_reminder_at is not None else None,
+             s.id)
+            for s in sessions
+        ])
+
+    cache = get_manager(db_path).session_cache
+    submit_write(op, db_path, on_commit=lambda result: cache.invalidate(user_id))
+
+
+# Состояние задач планировщика
+def get_scheduler_state(name: str, db_path: str = None):
+    """Получает сохраненное значение состояния задачи планировщика (None - не сохранялось)"""
+    with get_manager(db_path).reader() as conn:
+        row = conn.execute('SELECT value FROM scheduler_state WHERE name = ?', (name,)).fetchone()
+        return row[0] if row else None
+
+
+def set_scheduler_state(name: str, value: str, db_path: str = None) -> None:
+    """Сохраняет значение состояния задачи планировщика"""
+    def op(conn):
+        conn.execute('''
+            INSERT INTO scheduler_state (name, value) VALUES (?, ?)
+            ON CONFLICT(name) DO UPDATE SET value = excluded.value, updated_at = CURRENT_TIMESTAMP
+        ''', (name, value))
+
+    submit_write(op, db_path)
+
+
+# Состояние бота между перезапусками (database.persistence)
+def get_persisted_user_data(user_id: int, db_path: str = None):
+    """Получает сохраненные user_data пользователя в JSON (None - не сохранялись)"""
+    with get_manager(db_path).reader() as conn:
+        row = conn.execute('SELECT data FROM bot_user_data WHERE user_id = ?', (user_id,)).fetchone()
+        return row[0] if row else None
+
+
+def get_persisted_conversations(name: str, db_path: str = None) -> list:
+    """Получает незавершенные разговоры ConversationHandler: список (ключ, состояние) в JSON"""
+    with get_manager(db_path).reader() as conn:
+        return conn.execute('SELECT key, state FROM bot_conversations WHERE name = ?', (name,)).fetchall()
+
+
+def save_persisted_state(user_data: dict, conversations: dict, db_path: str = None) -> None:
+    """Записывает пачку изменений состояния бота одной транзакцией
+
+    user_data: {user_id: JSON или None - удалить}, conversations: {(имя, ключ): JSON
+    состояния или None - разговор завершен}. Строки с теми же данными не перезаписываются.
+    """
+    def op(conn):
+        now = time.time()
+        conn.executemany('''
+            INSERT INTO bot_user_data (user_id, data, updated_at) VALUES (?, ?, ?)
+            ON CONFLICT(user_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at
+            WHERE bot_user_data.data IS NOT excluded.data
+        ''', [(user_id, data, now) for user_id, data in user_data.items() if data is not None])
+        conn.executemany('DELETE FROM bot_user_data WHERE user_id = ?', [
+            (user_id,) for user_id, data in user_data.items() if data is None
+        ])
+        conn.executemany('''
+            INSERT INTO bot_conversations (name, key, state, updated_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT(name, key) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at
+        ''', [(name, key, state, now) for (name, key), state in conversations.items() if state is not None])
+        conn.executemany('DELETE FROM bot_conversations WHERE name = ? AND key = ?', [
+            (name, key) for (name, key), state in conversations.items() if state is None
+        ])
+
+    submit_write(op, db_path)
+
+
+# Лидерство и запуски задач планировщика
+def acquire_lease(name: str, owner: str, ttl: float, db_path: str = None) -> bool:
+    """Захватывает или продлевает аренду name на ttl секунд; True - owner владеет арендой
+
+    Аренду можно захватить, если ее нет, она истекла или уже принадлежит owner.
+    """
+    def op(conn):
+        now = time.time()
+        row = conn.execute('''
+            INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+            WHERE leases.owner = excluded.owner OR leases.expires_at < ?
+            RETURNING owner
+        ''', (name, owner, now + ttl, now)).fetchone()
+        return row is not None
+
+    return submit_write(op, db_path)
+
+
+def release_lease(name: str, owner: str, db_path: str = None) -> None:
+    """Освобождает аренду, если она принадлежит owner"""
+    def op(conn):
+        conn.execute('DELETE FROM leases WHERE name = ? AND owner = ?', (name, owner))
+
+    submit_write(op, db_path)
+
+
+def begin_job_run(job: str, run_key: str, owner: str, lease: str, db_path: str = None) -> bool:
+    """Отмечает начало запуска задачи; False - запуск выполнять не нужно
+
+    Запуск не выполняется, если он уже завершен или его выполняет другой экземпляр,
+    который еще владеет арендой lease. Незавершенный запуск переходит к новому
+    владельцу, только когда прежний аренду потерял (упал или был смещен).
+    """
+    def op(conn):
+        now = time.time()
+        row = conn.execute('''
+            INSERT INTO job_runs (job, run_key, owner, started_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT(job, run_key) DO UPDATE SET owner = excluded.owner, started_at = excluded.started_at
+            WHERE job_runs.finished_at IS NULL AND (
+                job_runs.owner IS excluded.owner OR NOT EXISTS (
+                    SELECT 1 FROM leases
+                    WHERE leases.name = ? AND leases.owner = job_runs.owner AND leases.expires_at >= ?
+                )
+            )
+            RETURNING owner
+        ''', (job, run_key, owner, now, lease, now)).fetchone()
+        return row is not None
+
+    return submit_write(op, db_path)
+
+
+def finish_job_run(job: str, run_key: str, db_path: str = None) -> None:
+    """Отмечает запуск задачи завершенным"""
+    def op(conn):
+        conn.execute('''
+            UPDATE job_runs SET finished_at = ? WHERE job = ? AND run_key = ?
+        ''', (time.time(), job, run_key))
+
+    submit_write(op, db_path)
+
+
+def purge_job_runs(older_than: float, db_path: str = None) -> int:
+    """Удаляет запуски задач, завершенные больше older_than секунд назад; возвращает их количество"""
+    def op(conn):
+        cursor = conn.execute('''
+            DELETE FROM job_runs WHERE finished_at IS NOT NULL AND finished_at < ?
+        ''', (time.time() - older_than,))
+        return cursor.rowcount
+
+    return submit_write(op, db_path)
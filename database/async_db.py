@@ -0,0 +1,63 @@
+"""
+Асинхронные версии функций database.DataBase.
+
+Каждая функция выполняется в потоке базы данных (database.executor),
+поэтому обработчики и задачи планировщика не блокируют event loop.
+"""
+import functools
+
+from database import DataBase
+from database.executor import run_db
+
+
+def _awaitable(func):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await run_db(func, *args, **kwargs)
+    return wrapper
+
+
+init_db = _awaitable(DataBase.init_db)
+backfill_user_latest = _awaitable(DataBase.backfill_user_latest)
+save_user_to_db = _awaitable(DataBase.save_user_to_db)
+get_all_users = _awaitable(DataBase.get_all_users)
+get_user_by_id = _awaitable(DataBase.get_user_by_id)
+get_user_form_history = _awaitable(DataBase.get_user_form_history)
+delete_last_user_form = _awaitable(DataBase.delete_last_user_form)
+delete_all_user_forms = _awaitable(DataBase.delete_all_user_forms)
+has_user_forms = _awaitable(DataBase.has_user_forms)
+get_user_first_form = _awaitable(DataBase.get_user_first_form)
+
+# Функции для тренировочного процесса
+create_training_session = _awaitable(DataBase.create_training_session)
+get_active_training_session = _awaitable(DataBase.get_active_training_session)
+update_training_session = _awaitable(DataBase.update_training_session)
+add_training_log = _awaitable(DataBase.add_training_log)
+update_training_log = _awaitable(DataBase.update_training_log)
+get_training_log = _awaitable(DataBase.get_training_log)
+advance_to_next_week = _awaitable(DataBase.advance_to_next_week)
+deactivate_training_sessions = _awaitable(DataBase.deactivate_training_sessions)
+get_pending_training_check = _awaitable(DataBase.get_pending_training_check)
+claim_due_training_checks = _awaitable(DataBase.claim_due_training_checks)
+claim_due_training_reminders = _awaitable(DataBase.claim_due_training_reminders)
+deactivate_unanswered_sessions = _awaitable(DataBase.deactivate_unanswered_sessions)
+
+# Настройки напоминаний
+get_user_settings = _awaitable(DataBase.get_user_settings)
+set_user_settings = _awaitable(DataBase.set_user_settings)
+
+# Состояние задач планировщика
+get_scheduler_state = _awaitable(DataBase.get_scheduler_state)
+set_scheduler_state = _awaitable(DataBase.set_scheduler_state)
+
+# Состояние бота между перезапусками
+get_persisted_user_data = _awaitable(DataBase.get_persisted_user_data)
+get_persisted_conversations = _awaitable(DataBase.get_persisted_conversations)
+save_persisted_state = _awaitable(DataBase.save_persisted_state)
+
+# Лидерство и запуски задач планировщика
+acquire_lease = _awaitable(DataBase.acquire_lease)
+release_lease = _awaitable(DataBase.release_lease)
+begin_job_run = _awaitable(DataBase.begin_job_run)
+finish_job_run = _awaitable(DataBase.finish_job_run)
+purge_job_runs = _awaitable(DataBase.purge_job_runs)
@@ -0,0 +1,106 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+# Максимальное количество пользователей в кэше активных сессий
+DEFAULT_SESSION_CACHE_SIZE = int(os.getenv('DB_SESSION_CACHE_SIZE', '10000'))
+
+# Время жизни записи кэша, с (страховка от изменений в обход API DataBase.py)
+DEFAULT_SESSION_CACHE_TTL = float(os.getenv('DB_SESSION_CACHE_TTL', '60'))
+
+_MISSING = object()
+
+
+class ReadThroughCache:
+    """Потокобезопасный LRU-кэш с TTL и чтением через загрузчик
+
+    get(key, loader) возвращает значение из кэша или вызывает loader() и
+    запоминает результат (в том числе None - "записи нет"). invalidate()
+    вызывается после коммита записи. Значение, загруженное до инвалидации
+    того же ключа, в кэш не попадает: загрузчик мог прочитать данные до коммита.
+    Загрузки других ключей инвалидация не затрагивает.
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_SESSION_CACHE_SIZE, ttl: float = DEFAULT_SESSION_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        # Загрузки в процессе: ключ -> [число загрузок, поколение ключа]. invalidate(key)
+        # меняет поколение только этого ключа; загрузка сохраняется, если поколение не изменилось.
+        # Ключ удаляется, когда его загрузки завершены, поэтому словарь не растет
+        self._loading = {}
+        # Поколение всего кэша (clear)
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key, loader):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            loading = self._loading.get(key)
+            if loading is None:
+                loading = self._loading[key] = [0, 0]
+            loading[0] += 1
+            generation = (self._generation, loading[1])
+
+        try:
+            value = loader()
+        finally:
+            with self._lock:
+                current = (self._generation, loading[1])
+                loading[0] -= 1
+                if not loading[0]:
+                    del self._loading[key]
+
+        with self._lock:
+            if generation == current and self.maxsize > 0:
+                self._data[key] = (value, time.monotonic() + self.ttl)
+                self._data.move_to_end(key)
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+                    self.evictions += 1
+        return value
+
+    def invalidate(self, key) -> None:
+        with self._lock:
+            loading = self._loading.get(key)
+            if loading is not None:
+                loading[1] += 1
+            self.invalidations += 1
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._data.clear()
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = len(self._data)
+        return {
+            'size': size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hit_rate, 4),
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+        }
@@ -0,0 +1,285 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from database.cache import ReadThroughCache
+
+
+# Путь к базе по умолчанию (можно переопределить через переменную окружения DB_PATH)
+DEFAULT_DB_PATH = os.getenv('DB_PATH', 'users.db')
+
+# Размер кэша подготовленных выражений на каждое соединение
+DEFAULT_CACHED_STATEMENTS = 256
+
+# Количество соединений для чтения в пуле
+DEFAULT_READERS = 4
+
+# Профили производительности: PRAGMA, применяемые к каждому соединению.
+# journal_mode хранится в самом файле базы и устанавливается один раз в init_db.
+PRAGMA_PROFILES = {
+    # Поведение SQLite по умолчанию (журнал отката, полный fsync)
+    'default': {
+        'journal_mode': 'DELETE',
+        'synchronous': 'FULL',
+        'busy_timeout': 5000,
+    },
+    # WAL + fsync только при checkpoint: читатели не блокируют писателя
+    'balanced': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -16000,            # 16 МБ
+        'mmap_size': 64 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000,
+        'journal_size_limit': 64 * 1024 * 1024,
+        'wal_autocheckpoint': 1000,
+    },
+    # WAL + fsync на каждый commit
+    'durable': {
+        'journal_mode': 'WAL',
+        'synchronous': 'FULL',
+        'cache_size': -16000,
+        'mmap_size': 64 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000,
+        'journal_size_limit': 64 * 1024 * 1024,
+        'wal_autocheckpoint': 1000,
+    },
+    # Максимальная скорость ценой устойчивости к сбою питания (нагрузочные тесты)
+    'fast': {
+        'journal_mode': 'WAL',
+        'synchronous': 'OFF',
+        'cache_size': -64000,            # 64 МБ
+        'mmap_size': 256 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000,
+        'journal_size_limit': 64 * 1024 * 1024,
+        'wal_autocheckpoint': 10000,
+    },
+}
+
+DEFAULT_PROFILE = os.getenv('DB_PROFILE', 'balanced')
+
+# Размер WAL-файла, после которого фоновый checkpoint усекает его до нуля
+DEFAULT_MAX_WAL_BYTES = 64 * 1024 * 1024
+
+
+class ConnectionManager:
+    """Долгоживущие соединения с базой: одно на запись и пул соединений на чтение"""
+
+    def __init__(self, db_path: str, readers: int = DEFAULT_READERS,
+                 cached_statements: int = DEFAULT_CACHED_STATEMENTS, timeout: float = 30.0):
+        self.db_path = db_path
+        self.readers = readers
+        self.cached_statements = cached_statements
+        self.timeout = timeout
+
+        self._write_lock = threading.RLock()
+        self._writer = None
+        self._reader_pool = queue.LifoQueue(maxsize=readers)
+        self._created_readers = 0
+        self._pool_lock = threading.Lock()
+        self._closed = False
+
+        # Профиль применяется к новым соединениям; уже открытые соединения
+        # получают его при следующей выдаче (сравнение поколения профиля)
+        self.profile = None
+        self._pragmas = {}
+        self._generation = 0
+        self._conn_generation = {}
+        self._trace_callback = None
+
+        # Очередь group commit (database.write_queue), по умолчанию выключена
+        self.write_queue = None
+
+        # Кэш активных тренировочных сессий по user_id (database.DataBase)
+        self.session_cache = ReadThroughCache()
+
+    def _connect(self) -> sqlite3.Connection:
+        # isolation_level=None - транзакциями управляем сами (BEGIN/COMMIT),
+        # check_same_thread=False - соединение используется из разных потоков, но под блокировкой
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.timeout,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=self.cached_statements
+        )
+        if self._trace_callback is not None:
+            conn.set_trace_callback(self._trace_callback)
+        self._apply_pragmas(conn)
+        return conn
+
+    def set_trace_callback(self, callback) -> None:
+        """Передает каждый выполняемый SQL-запрос в callback (для диагностики, применяется к новым соединениям)"""
+        self._trace_callback = callback
+
+    def _apply_pragmas(self, conn: sqlite3.Connection) -> None:
+        generation = self._generation
+        for name, value in self._pragmas.items():
+            if name == 'journal_mode':
+                continue
+            conn.execute(f'PRAGMA {name} = {value}')
+        self._conn_generation[conn] = generation
+
+    def set_profile(self, profile: str) -> None:
+        """Применяет профиль PRAGMA (см. PRAGMA_PROFILES) ко всем соединениям"""
+        if profile not in PRAGMA_PROFILES:
+            raise ValueError(f"Неизвестный профиль базы данных: {profile}")
+        with self._write_lock:
+            self.profile = profile
+            self._pragmas = dict(PRAGMA_PROFILES[profile])
+            self._generation += 1
+            if self._writer is None:
+                self._writer = self._connect()
+            else:
+                self._apply_pragmas(self._writer)
+            journal_mode = self._pragmas.get('journal_mode')
+            if journal_mode:
+                self._writer.execute(f'PRAGMA journal_mode = {journal_mode}')
+
+    def checkpoint(self, mode: str = 'PASSIVE'):
+        """Переносит WAL в основной файл базы; возвращает (busy, log, checkpointed)"""
+        with self._write_lock:
+            if self._writer is None:
+                self._writer = self._connect()
+            return self._writer.execute(f'PRAGMA wal_checkpoint({mode})').fetchone()
+
+    def wal_size(self) -> int:
+        """Текущий размер WAL-файла в байтах"""
+        try:
+            return os.path.getsize(self.db_path + '-wal')
+        except OSError:
+            return 0
+
+    def connect(self) -> sqlite3.Connection:
+        """Отдельное соединение с профилем базы вне пула и блокировки записи; закрывает вызывающий код"""
+        if self._closed:
+            raise sqlite3.ProgrammingError("ConnectionManager закрыт")
+        conn = self._connect()
+        # Поколение профиля отслеживается только для соединений менеджера
+        self._conn_generation.pop(conn, None)
+        return conn
+
+    @contextmanager
+    def writer(self):
+        """Выдает соединение на запись внутри транзакции (COMMIT при успехе, ROLLBACK при ошибке)"""
+        with self._write_lock:
+            if self._closed:
+                raise sqlite3.ProgrammingError("ConnectionManager закрыт")
+            if self._writer is None:
+                self._writer = self._connect()
+            conn = self._writer
+            # Вложенный вызов в том же потоке работает внутри уже открытой транзакции
+            if conn.in_transaction:
+                yield conn
+                return
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            else:
+                conn.execute('COMMIT')
+
+    @contextmanager
+    def reader(self):
+        """Выдает соединение на чтение из пула"""
+        conn = self._acquire_reader()
+        try:
+            yield conn
+        finally:
+            self._release_reader(conn)
+
+    def _acquire_reader(self) -> sqlite3.Connection:
+        if self._closed:
+            raise sqlite3.ProgrammingError("ConnectionManager закрыт")
+        try:
+            conn = self._reader_pool.get_nowait()
+        except queue.Empty:
+            with self._pool_lock:
+                if self._created_readers < self.readers:
+                    self._created_readers += 1
+                    return self._connect()
+            # Все соединения заняты - ждем освобождения
+            conn = self._reader_pool.get(timeout=self.timeout)
+        if self._conn_generation.get(conn) != self._generation:
+            self._apply_pragmas(conn)
+        return conn
+
+    def _release_reader(self, conn: sqlite3.Connection) -> None:
+        if conn.in_transaction:
+            conn.rollback()
+        if self._closed:
+            self._conn_generation.pop(conn, None)
+            conn.close()
+            return
+        self._reader_pool.put_nowait(conn)
+
+    def close(self) -> None:
+        """Закрывает все соединения (предварительно коммитит очередь записи)"""
+        if self.write_queue is not None:
+            self.write_queue.close()
+            self.write_queue = None
+        self._closed = True
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        while True:
+            try:
+                self._reader_pool.get_nowait().close()
+            except queue.Empty:
+                break
+        self._conn_generation.clear()
+
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+
+def get_manager(db_path: str = None) -> ConnectionManager:
+    """Возвращает менеджер соединений для базы (создается при первом обращении)"""
+    db_path = db_path or DEFAULT_DB_PATH
+    manager = _managers.get(db_path)
+    if manager is None:
+        with _managers_lock:
+            manager = _managers.get(db_path)
+            if manager is None:
+                manager = ConnectionManager(db_path)
+                _managers[db_path] = manager
+    return manager
+
+
+def configure(db_path: str = None, readers: int = DEFAULT_READERS,
+              cached_statements: int = DEFAULT_CACHED_STATEMENTS) -> ConnectionManager:
+    """Задает путь к базе по умолчанию и параметры пула соединений"""
+    global DEFAULT_DB_PATH
+    if db_path:
+        DEFAULT_DB_PATH = db_path
+    with _managers_lock:
+        old = _managers.pop(DEFAULT_DB_PATH, None)
+        if old is not None:
+            old.close()
+        manager = ConnectionManager(DEFAULT_DB_PATH, readers=readers, cached_statements=cached_statements)
+        _managers[DEFAULT_DB_PATH] = manager
+    return manager
+
+
+def close_all() -> None:
+    """Закрывает все открытые менеджеры соединений (вызывается при остановке бота)"""
+    with _managers_lock:
+        managers = list(_managers.values())
+        _managers.clear()
+    for manager in managers:
+        manager.close()
+
+
+def checkpoint_wal(db_path: str = None, max_wal_bytes: int = DEFAULT_MAX_WAL_BYTES):
+    """Фоновый checkpoint: PASSIVE в обычном режиме, TRUNCATE если WAL вырос больше max_wal_bytes"""
+    manager = get_manager(db_path)
+    mode = 'TRUNCATE' if manager.wal_size() > max_wal_bytes else 'PASSIVE'
+    return manager.checkpoint(mode)
@@ -0,0 +1,80 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from database.connection import DEFAULT_READERS
+
+
+# Потоки базы данных: по одному на каждое соединение чтения и одно на запись
+DEFAULT_WORKERS = DEFAULT_READERS + 1
+
+# Максимум запросов, ожидающих выполнения; остальные корутины ждут свободного места
+DEFAULT_MAX_PENDING = 256
+
+
+class DatabaseExecutor:
+    """Выполняет синхронные функции базы данных в отдельных потоках с ограниченной очередью"""
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, max_pending: int = DEFAULT_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='db')
+        self._slots = None
+        self._loop = None
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        # Семафор привязан к event loop, поэтому создается заново для нового цикла
+        loop = asyncio.get_running_loop()
+        if self._slots is None or self._loop is not loop:
+            self._slots = asyncio.Semaphore(self.max_pending)
+            self._loop = loop
+        return self._slots
+
+    async def run(self, func, *args, **kwargs):
+        """Выполняет func(*args, **kwargs) в потоке базы данных и возвращает результат"""
+        async with self._get_slots():
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._pool, functools.partial(func, *args, **kwargs))
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Дожидается завершения запросов и останавливает потоки"""
+        self._pool.shutdown(wait=wait)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> DatabaseExecutor:
+    """Возвращает общий исполнитель запросов (создается при первом обращении)"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = DatabaseExecutor()
+    return _executor
+
+
+def configure_executor(workers: int = DEFAULT_WORKERS, max_pending: int = DEFAULT_MAX_PENDING) -> DatabaseExecutor:
+    """Пересоздает общий исполнитель с новыми параметрами"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown()
+        _executor = DatabaseExecutor(workers=workers, max_pending=max_pending)
+    return _executor
+
+
+def shutdown_executor() -> None:
+    """Останавливает общий исполнитель (вызывается при остановке бота)"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown()
+            _executor = None
+
+
+async def run_db(func, *args, **kwargs):
+    """Выполняет синхронную функцию базы данных, не блокируя event loop"""
+    return await get_executor().run(func, *args, **kwargs)
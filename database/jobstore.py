@@ -0,0 +1,175 @@
+"""
+Хранилище задач APScheduler в базе бота.
+
+Аналог SQLAlchemyJobStore на sqlite3 и ConnectionManager: задачи переживают
+перезапуск бота, а пропущенные за время простоя запуски выполняются при старте
+(с учетом misfire_grace_time и coalesce задачи). Функции задач и их аргументы
+сериализуются pickle, поэтому задача должна ссылаться на функцию уровня модуля
+и не получать в args объекты, которые нельзя сохранить (например, Application).
+
+Методы хранилища APScheduler вызывает в потоке event loop, поэтому у хранилища свое
+соединение (ConnectionManager.connect), а не общее соединение записи: add_job и
+update_job не ждут блокировки общего писателя, которую держат пачка group commit
+или checkpoint WAL. SQLite по-прежнему допускает одну транзакцию записи на базу:
+если другое соединение пишет прямо сейчас, запись задачи ждет ее коммита
+(не дольше busy_timeout профиля).
+"""
+import pickle
+import threading
+from contextlib import contextmanager
+
+from apscheduler.job import Job
+from apscheduler.jobstores.base import BaseJobStore, ConflictingIdError, JobLookupError
+from apscheduler.util import datetime_to_utc_timestamp, utc_timestamp_to_datetime
+
+from database.connection import get_manager
+
+
+class SQLiteJobStore(BaseJobStore):
+    """Хранит задачи планировщика в таблице apscheduler_jobs"""
+
+    def __init__(self, db_path: str = None, tablename: str = 'apscheduler_jobs',
+                 pickle_protocol: int = pickle.HIGHEST_PROTOCOL):
+        super().__init__()
+        self.db_path = db_path
+        self.tablename = tablename
+        self.pickle_protocol = pickle_protocol
+        self._conn = None
+        self._lock = threading.Lock()
+
+    @property
+    def manager(self):
+        return get_manager(self.db_path)
+
+    @contextmanager
+    def reader(self):
+        with self._lock:
+            if self._conn is None:
+                self._conn = self.manager.connect()
+            yield self._conn
+
+    @contextmanager
+    def writer(self):
+        """Транзакция записи на соединении хранилища"""
+        with self.reader() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            else:
+                conn.execute('COMMIT')
+
+    def start(self, scheduler, alias):
+        super().start(scheduler, alias)
+        with self.writer() as conn:
+            conn.execute(f'''
+                CREATE TABLE IF NOT EXISTS {self.tablename} (
+                    id TEXT PRIMARY KEY,
+                    next_run_time REAL,
+                    job_state BLOB NOT NULL
+                )
+            ''')
+            conn.execute(f'''
+                CREATE INDEX IF NOT EXISTS idx_{self.tablename}_next_run_time
+                ON {self.tablename}(next_run_time)
+            ''')
+
+    def lookup_job(self, job_id):
+        with self.reader() as conn:
+            row = conn.execute(
+                f'SELECT job_state FROM {self.tablename} WHERE id = ?', (job_id,)
+            ).fetchone()
+        return self._reconstitute_job(row[0]) if row else None
+
+    def get_due_jobs(self, now):
+        timestamp = datetime_to_utc_timestamp(now)
+        return self._get_jobs('WHERE next_run_time <= ?', (timestamp,))
+
+    def get_next_run_time(self):
+        with self.reader() as conn:
+            row = conn.execute(f'''
+                SELECT next_run_time FROM {self.tablename}
+                WHERE next_run_time IS NOT NULL
+                ORDER BY next_run_time
+                LIMIT 1
+            ''').fetchone()
+        return utc_timestamp_to_datetime(row[0]) if row else None
+
+    def get_all_jobs(self):
+        jobs = self._get_jobs()
+        self._fix_paused_jobs_sorting(jobs)
+        return jobs
+
+    def add_job(self, job):
+        with self.writer() as conn:
+            cursor = conn.execute(f'''
+                INSERT INTO {self.tablename} (id, next_run_time, job_state) VALUES (?, ?, ?)
+                ON CONFLICT(id) DO NOTHING
+            ''', (job.id, datetime_to_utc_timestamp(job.next_run_time), self._serialize(job)))
+            if cursor.rowcount == 0:
+                raise ConflictingIdError(job.id)
+
+    def update_job(self, job):
+        with self.writer() as conn:
+            cursor = conn.execute(f'''
+                UPDATE {self.tablename} SET next_run_time = ?, job_state = ? WHERE id = ?
+            ''', (datetime_to_utc_timestamp(job.next_run_time), self._serialize(job), job.id))
+            if cursor.rowcount == 0:
+                raise JobLookupError(job.id)
+
+    def remove_job(self, job_id):
+        with self.writer() as conn:
+            cursor = conn.execute(f'DELETE FROM {self.tablename} WHERE id = ?', (job_id,))
+            if cursor.rowcount == 0:
+                raise JobLookupError(job_id)
+
+    def remove_all_jobs(self):
+        with self.writer() as conn:
+            conn.execute(f'DELETE FROM {self.tablename}')
+
+    def shutdown(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        super().shutdown()
+
+    def _serialize(self, job) -> bytes:
+        return pickle.dumps(job.__getstate__(), self.pickle_protocol)
+
+    def _reconstitute_job(self, job_state):
+        job_state = pickle.loads(job_state)
+        job_state['jobstore'] = self
+        job = Job.__new__(Job)
+        job.__setstate__(job_state)
+        job._scheduler = self._scheduler
+        job._jobstore_alias = self._alias
+        return job
+
+    def _get_jobs(self, condition: str = '', params=()):
+        jobs = []
+        failed_job_ids = []
+        with self.reader() as conn:
+            rows = conn.execute(f'''
+                SELECT id, job_state FROM {self.tablename} {condition}
+                ORDER BY next_run_time
+            ''', params).fetchall()
+        for job_id, job_state in rows:
+            try:
+                jobs.append(self._reconstitute_job(job_state))
+            except BaseException:
+                self._logger.exception('Не удалось восстановить задачу "%s" - она будет удалена', job_id)
+                failed_job_ids.append(job_id)
+
+        # Задачи, которые не удалось восстановить (например, удаленная функция), удаляются
+        if failed_job_ids:
+            with self.writer() as conn:
+                conn.executemany(
+                    f'DELETE FROM {self.tablename} WHERE id = ?', [(job_id,) for job_id in failed_job_ids]
+                )
+        return jobs
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} (db_path={self.manager.db_path})>'
@@ -0,0 +1,99 @@
+"""
+Легковесные модели строк базы данных.
+
+Классы используют __slots__ и создаются через row_factory курсора,
+поэтому на строку выделяется один объект без словаря атрибутов.
+Поля, не выбранные запросом (проекция колонок), равны None.
+"""
+
+
+class Row:
+    """Базовый класс строки: поля перечислены в __slots__ в порядке колонок таблицы"""
+    __slots__ = ()
+
+    # Кэш соответствия "набор колонок курсора -> поля, не выбранные запросом"
+    _missing_cache = {}
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.get(name))
+
+    @classmethod
+    def row_factory(cls, cursor, row):
+        """row_factory для sqlite3: строит объект модели по описанию колонок курсора"""
+        names = tuple(column[0] for column in cursor.description)
+        key = (cls, names)
+        missing = cls._missing_cache.get(key)
+        if missing is None:
+            unknown = set(names) - set(cls.__slots__)
+            if unknown:
+                raise ValueError(f"{cls.__name__}: неизвестные колонки {sorted(unknown)}")
+            missing = tuple(name for name in cls.__slots__ if name not in names)
+            cls._missing_cache[key] = missing
+
+        obj = cls.__new__(cls)
+        for name, value in zip(names, row):
+            setattr(obj, name, value)
+        for name in missing:
+            setattr(obj, name, None)
+        return obj
+
+    @classmethod
+    def columns(cls, names=None) -> str:
+        """Список колонок для SELECT; имена проверяются по полям модели"""
+        if names is None:
+            return ', '.join(cls.__slots__)
+        unknown = set(names) - set(cls.__slots__)
+        if unknown:
+            raise ValueError(f"{cls.__name__}: неизвестные колонки {sorted(unknown)}")
+        return ', '.join(names)
+
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self):
+        fields = ', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)
+        return f'{type(self).__name__}({fields})'
+
+
+class UserForm(Row):
+    """Анкета пользователя (строка users / user_latest)"""
+    __slots__ = (
+        'id', 'user_id', 'username', 'height', 'weight', 'activity_level', 'gender',
+        'years_experience', 'brm', 'goal', 'created_at', 'updated_at',
+    )
+
+
+class TrainingSession(Row):
+    """Тренировочная сессия (строка training_sessions)"""
+    __slots__ = (
+        'id', 'user_id', 'week_number', 'training_days', 'current_day', 'completed_days',
+        'session_active', 'check01_passed', 'check02_passed', 'created_at', 'updated_at',
+        'timezone', 'reminder_offset', 'next_check_at', 'next_reminder_at', 'last_check_date',
+    )
+
+
+class TrainingLogEntry(Row):
+    """Запись лога тренировок (строка training_log)"""
+    __slots__ = (
+        'id', 'user_id', 'session_id', 'training_date', 'training_type', 'completed',
+        'pain_feedback', 'created_at', 'expires_at',
+    )
+
+
+class UserSettings(Row):
+    """Настройки напоминаний пользователя (строка user_settings)"""
+    __slots__ = ('user_id', 'timezone', 'reminder_offset', 'updated_at')
+
+
+class FormHistoryEntry(Row):
+    """Анкета в истории пользователя вместе со значениями предыдущей анкеты (LAG) и числом анкет"""
+    __slots__ = (
+        'id', 'height', 'weight', 'activity_level', 'gender', 'years_experience', 'goal', 'created_at',
+        'previous_weight', 'previous_activity_level', 'total',
+    )
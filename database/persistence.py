@@ -0,0 +1,157 @@
+"""
+Persistence PTB в базе бота: context.user_data и состояния ConversationHandler
+переживают перезапуск (current_state, check_step, session_id, training_log_id,
+ответы незаконченной анкеты /form).
+
+Запись отложенная: PTB раз в update_interval секунд передает данные пользователей,
+у которых были update, и все они записываются одной транзакцией; строки, данные
+которых не изменились, база не перезаписывает (сравнение в UPSERT). При остановке бота (flush) записывается
+все, что еще не записано; при аварийном падении теряются изменения последнего интервала.
+
+Чтение ленивое: при старте user_data не загружаются, данные пользователя читаются
+из базы при его первом update (refresh_user_data), поэтому время запуска не зависит
+от числа пользователей. Разговоры ConversationHandler загружаются при старте целиком,
+но в базе хранятся только незавершенные.
+"""
+import asyncio
+import json
+import logging
+import os
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+from database import async_db
+
+
+logger = logging.getLogger(__name__)
+
+# Как часто изменения записываются в базу, с
+DEFAULT_UPDATE_INTERVAL = float(os.getenv('PERSISTENCE_INTERVAL', '10'))
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+
+class SQLitePersistence(BasePersistence):
+    """Хранит user_data и разговоры ConversationHandler в таблицах bot_user_data и bot_conversations"""
+
+    def __init__(self, update_interval: float = DEFAULT_UPDATE_INTERVAL, db_path: str = None):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        self.db_path = db_path
+        # Пользователи, данные которых уже прочитаны из базы. Живет столько же, сколько
+        # Application.user_data: PTB хранит user_data до drop_user_data, тогда же удаляется id
+        self._loaded = set()
+        # Изменения, ожидающие записи: user_id -> JSON (None - удалить),
+        # (имя, ключ разговора) -> JSON состояния (None - разговор завершен)
+        self._pending_users = {}
+        self._pending_conversations = {}
+        self._flush_task = None
+        self._write_lock = asyncio.Lock()
+        self.flushes = 0
+
+    # user_data
+    async def get_user_data(self) -> dict:
+        # Данные пользователей читаются при первом update (refresh_user_data)
+        return {}
+
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        if user_id in self._loaded:
+            return
+        data = await async_db.get_persisted_user_data(user_id, db_path=self.db_path)
+        if user_id in self._loaded:
+            return
+        self._loaded.add(user_id)
+        if data is not None:
+            # Значения, записанные до загрузки, новее сохраненных
+            for key, value in json.loads(data).items():
+                user_data.setdefault(key, value)
+
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        self._set_user(user_id, _dumps(data) if data else None)
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._loaded.discard(user_id)
+        self._set_user(user_id, None)
+
+    def _set_user(self, user_id: int, data) -> None:
+        if user_id in self._pending_users and self._pending_users[user_id] == data:
+            return
+        self._pending_users[user_id] = data
+        self._schedule_flush()
+
+    # Разговоры ConversationHandler
+    async def get_conversations(self, name: str) -> dict:
+        rows = await async_db.get_persisted_conversations(name, db_path=self.db_path)
+        return {tuple(json.loads(key)): json.loads(state) for key, state in rows}
+
+    async def update_conversation(self, name: str, key, new_state) -> None:
+        self._pending_conversations[name, _dumps(key)] = None if new_state is None else _dumps(new_state)
+        self._schedule_flush()
+
+    # Запись
+    def _schedule_flush(self) -> None:
+        """Одна запись на вызов Application.update_persistence: он передает все изменения сразу"""
+        if self._flush_task is None:
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_soon())
+
+    async def _flush_soon(self) -> None:
+        # Даем update_persistence передать изменения остальных пользователей
+        await asyncio.sleep(0)
+        self._flush_task = None
+        try:
+            await self._write_pending()
+        except Exception:
+            logger.exception("Не удалось записать состояние бота, повтор при следующей записи")
+
+    async def _write_pending(self) -> None:
+        async with self._write_lock:
+            users, self._pending_users = self._pending_users, {}
+            conversations, self._pending_conversations = self._pending_conversations, {}
+            if not users and not conversations:
+                return
+            try:
+                await async_db.save_persisted_state(users, conversations, db_path=self.db_path)
+            except Exception:
+                # Изменения, пришедшие во время записи, новее неудачной пачки
+                self._pending_users = {**users, **self._pending_users}
+                self._pending_conversations = {**conversations, **self._pending_conversations}
+                raise
+            self.flushes += 1
+
+    async def flush(self) -> None:
+        """Записывает все изменения при остановке бота"""
+        if self._flush_task is not None:
+            await self._flush_task
+        await self._write_pending()
+
+    # Остальные данные PTB не хранятся (store_data)
+    async def get_chat_data(self) -> dict:
+        return {}
+
+    async def get_bot_data(self) -> dict:
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        pass
+
+    async def update_bot_data(self, data: dict) -> None:
+        pass
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: dict) -> None:
+        pass
@@ -0,0 +1,167 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+
+from database.connection import get_manager
+
+
+logger = logging.getLogger(__name__)
+
+# Максимальное время ожидания перед коммитом пачки, с
+DEFAULT_FLUSH_INTERVAL = float(os.getenv('DB_FLUSH_INTERVAL_MS', '5')) / 1000
+
+# Максимальное количество операций в одной транзакции
+DEFAULT_MAX_BATCH = int(os.getenv('DB_MAX_BATCH', '200'))
+
+# Максимальная длина очереди; при переполнении submit() ждет
+DEFAULT_MAX_PENDING = 10000
+
+# Сколько durable-запись ждет коммита, с; после этого submit_write выбрасывает TimeoutError
+DEFAULT_WRITE_TIMEOUT = float(os.getenv('DB_WRITE_TIMEOUT', '60'))
+
+_STOP = object()
+
+
+class WriteQueue:
+    """Очередь записи с group commit: объединяет операции в одну транзакцию
+
+    Операция - функция op(conn), выполняемая на соединении записи. Пачка
+    коммитится, когда прошло flush_interval секунд с первой операции или
+    набралось max_batch операций. Каждая операция выполняется в своем
+    SAVEPOINT, поэтому ошибка одной операции не откатывает остальные.
+    Future операции завершается только после COMMIT (подтверждение записи).
+    """
+
+    def __init__(self, manager, flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+                 max_batch: int = DEFAULT_MAX_BATCH, max_pending: int = DEFAULT_MAX_PENDING):
+        self.manager = manager
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._closed = False
+        self.batches = 0
+        self.operations = 0
+        self._thread = threading.Thread(target=self._run, name='db-write-queue', daemon=True)
+        self._thread.start()
+
+    def submit(self, op) -> Future:
+        """Ставит операцию в очередь; результат op(conn) доступен через Future после коммита"""
+        if self._closed:
+            raise RuntimeError("Очередь записи остановлена")
+        future = Future()
+        self._queue.put((op, future))
+        return future
+
+    def flush(self, timeout: float = None) -> None:
+        """Дожидается коммита всех операций, поставленных до вызова"""
+        self.submit(lambda conn: None).result(timeout)
+
+    def close(self) -> None:
+        """Коммитит оставшиеся операции и останавливает поток"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._commit(batch)
+
+    def _commit(self, batch) -> None:
+        started = []
+        results = []
+        try:
+            with self.manager.writer() as conn:
+                for op, future in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    started.append(future)
+                    conn.execute('SAVEPOINT write_queue')
+                    try:
+                        result = op(conn)
+                    except Exception as e:
+                        conn.execute('ROLLBACK TO write_queue')
+                        conn.execute('RELEASE write_queue')
+                        results.append((future, e, True))
+                    else:
+                        conn.execute('RELEASE write_queue')
+                        results.append((future, result, False))
+        except Exception as e:
+            # Транзакция не закоммичена (ошибка BEGIN, COMMIT или самого соединения) -
+            # ни одна операция пачки не записана, включая еще не начатые
+            logger.exception("Ошибка коммита пачки из %s операций", len(batch))
+            for _, future in batch:
+                try:
+                    if not future.done():
+                        future.set_exception(e)
+                except InvalidStateError:
+                    pass  # Future отменили между проверкой и set_exception
+            return
+
+        self.batches += 1
+        self.operations += len(results)
+        for future, value, failed in results:
+            if failed:
+                future.set_exception(value)
+            else:
+                future.set_result(value)
+
+
+def _log_failed_write(future: Future) -> None:
+    error = future.exception()
+    if error is not None:
+        logger.error("Отложенная запись в базу не выполнена: %s", error)
+
+
+def submit_write(op, db_path: str = None, durable: bool = True, on_commit=None):
+    """Выполняет op(conn) в транзакции записи: через очередь group commit, если она включена
+
+    durable=True - дожидается коммита и возвращает результат op (read-your-writes).
+    durable=False - возвращается сразу после постановки в очередь (ошибки пишутся в лог).
+    on_commit(result) вызывается после успешного коммита (например, для инвалидации кэша).
+    """
+    manager = get_manager(db_path)
+    write_queue = manager.write_queue
+    if write_queue is None:
+        with manager.writer() as conn:
+            result = op(conn)
+    else:
+        future = write_queue.submit(op)
+        if not durable:
+            future.add_done_callback(_log_failed_write)
+            if on_commit is not None:
+                future.add_done_callback(lambda f: f.exception() is None and on_commit(f.result()))
+            return None
+        result = future.result(DEFAULT_WRITE_TIMEOUT)
+    if on_commit is not None:
+        on_commit(result)
+    return result
+
+
+def enable_write_queue(db_path: str = None, flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+                       max_batch: int = DEFAULT_MAX_BATCH) -> WriteQueue:
+    """Включает group commit для базы; очередь сбрасывается при закрытии менеджера соединений"""
+    manager = get_manager(db_path)
+    if manager.write_queue is None:
+        manager.write_queue = WriteQueue(manager, flush_interval=flush_interval, max_batch=max_batch)
+    return manager.write_queue
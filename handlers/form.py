@@ -13,7 +13,7 @@ from utils.states import (
     MAIN_STATE,
 )
 from utils.calculations import compute_brm, parse_height, parse_weight, validate_activity, normalize_gender, parse_age
-from database.DataBase import save_user_to_db, get_user_by_id, has_user_forms, get_user_first_form
+from database.async_db import save_user_to_db, get_user_by_id, has_user_forms, get_user_first_form
 from utils.texts import text01, text02
 from Keyboards.keyboards import *
 
@@ -22,7 +22,7 @@ async def start_form(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.message.from_user
     
     # Проверяем, есть ли у пользователя уже анкеты
-    if has_user_forms(user.id):
+    if await has_user_forms(user.id):
         # Если есть, начинаем краткую анкету
         await update.message.reply_text(
             "📝 Обновление анкеты!\n"
@@ -138,16 +138,16 @@ async def get_goal(update: Update, context: ContextTypes.DEFAULT_TYPE):
         'brm': brm_value,
     }
 
-    save_user_to_db(user_data)
+    await save_user_to_db(user_data)
 
-    saved_user = get_user_by_id(user.id)
+    saved_user = await get_user_by_id(user.id, columns=('created_at',))
 
     from Keyboards.keyboards import main_keyboard
     reply_markup = ReplyKeyboardMarkup(main_keyboard, resize_keyboard=True)
 
     await update.message.reply_text(
         "✅ Анкета успешно сохранена!\n"
-        f"📅 Дата заполнения: {saved_user[8]}\n\n"
+        f"📅 Дата заполнения: {saved_user.created_at}\n\n"
         "Ваши данные:\n"
         f"📏 Рост: {context.user_data['height']} см\n"
         f"⚖️ Вес: {context.user_data['weight']} кг\n"
@@ -202,7 +202,7 @@ async def get_short_activity_level(update: Update, context: ContextTypes.DEFAULT
     user = update.message.from_user
     
     # Получаем первую анкету пользователя для копирования остальных данных
-    first_form = get_user_first_form(user.id)
+    first_form = await get_user_first_form(user.id)
     if not first_form:
         await update.message.reply_text("Ошибка: не найдена первая анкета. Попробуйте заполнить полную анкету.")
         return ConversationHandler.END
@@ -210,38 +210,38 @@ async def get_short_activity_level(update: Update, context: ContextTypes.DEFAULT
     # Вычисляем новый BRM с обновленными данными
     brm_value = compute_brm(
         weight_kg=float(context.user_data['weight']),
-        height_cm=float(first_form[3]),  # рост из первой анкеты
-        age_years=int(first_form[7]),    # возраст из первой анкеты
+        height_cm=float(first_form.height),  # рост из первой анкеты
+        age_years=int(first_form.years_experience),    # возраст из первой анкеты
         activity_level_text=str(context.user_data['activity_level']),
-        gender_text=str(first_form[6])   # пол из первой анкеты
+        gender_text=str(first_form.gender)   # пол из первой анкеты
     )
 
     # Сохраняем краткую анкету с данными из первой анкеты
     user_data = {
         'user_id': user.id,
         'username': user.username,
-        'height': first_form[3],  # рост из первой анкеты
+        'height': first_form.height,  # рост из первой анкеты
         'weight': context.user_data['weight'],
         'activity_level': context.user_data['activity_level'],
-        'gender': first_form[6],  # пол из первой анкеты
-        'years_experience': first_form[7],  # возраст из первой анкеты
-        'goal': first_form[9],    # цель из первой анкеты
+        'gender': first_form.gender,  # пол из первой анкеты
+        'years_experience': first_form.years_experience,  # возраст из первой анкеты
+        'goal': first_form.goal,    # цель из первой анкеты
         'brm': brm_value,
     }
 
-    save_user_to_db(user_data)
+    await save_user_to_db(user_data)
 
     from Keyboards.keyboards import main_keyboard
     reply_markup = ReplyKeyboardMarkup(main_keyboard, resize_keyboard=True)
 
     await update.message.reply_text(
         "✅ Анкета обновлена!\n\n"
-        f"📏 Рост: {first_form[3]} см (из первой анкеты)\n"
+        f"📏 Рост: {first_form.height} см (из первой анкеты)\n"
         f"⚖️ Вес: {context.user_data['weight']} кг (обновлен)\n"
         f"🏃 Уровень активности: {context.user_data['activity_level']} (обновлен)\n"
-        f"👤 Пол: {first_form[6]} (из первой анкеты)\n"
-        f"🎂 Возраст: {first_form[7]} лет (из первой анкеты)\n"
-        f"🎯 Цель: {first_form[9]} (из первой анкеты)",
+        f"👤 Пол: {first_form.gender} (из первой анкеты)\n"
+        f"🎂 Возраст: {first_form.years_experience} лет (из первой анкеты)\n"
+        f"🎯 Цель: {first_form.goal} (из первой анкеты)",
         reply_markup=reply_markup
     )
 
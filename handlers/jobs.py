@@ -0,0 +1,270 @@
+"""
+Задачи планировщика и их запуск.
+
+Задачи хранятся в базе (database.jobstore.SQLiteJobStore), поэтому точки входа -
+функции уровня модуля без аргументов: Application берется из set_application().
+Минутная задача слотов напоминаний запоминает последнюю обработанную минуту
+(watermark) и после простоя бота догоняет пропущенные минуты пачками.
+
+При нескольких экземплярах бота планировщик запускает только лидер - владелец
+аренды (SCHEDULER_LEASE=database, строка в таблице leases). Остальные
+экземпляры ждут, пока аренда не истечет. Каждая минута отмечается в job_runs,
+поэтому после смены лидера уже обработанные минуты не выполняются повторно.
+Незавершенную минуту новый лидер забирает, только когда прежний владелец
+аренду потерял; потеряв аренду, экземпляр отменяет свои выполняющиеся задачи.
+SCHEDULER_LEASE=local - один экземпляр без выборов (например, для отладки).
+"""
+import asyncio
+import functools
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+
+from database.async_db import (
+    acquire_lease, release_lease, begin_job_run, finish_job_run, purge_job_runs,
+    get_scheduler_state, set_scheduler_state
+)
+from database.connection import checkpoint_wal
+from database.executor import run_db
+from database.jobstore import SQLiteJobStore
+from handlers.training_check import process_reminder_slots
+
+
+logger = logging.getLogger(__name__)
+
+# Насколько далеко назад догоняются пропущенные минуты; более старые пропускаются
+CATCHUP_WINDOW = timedelta(hours=float(os.getenv('SCHEDULER_CATCHUP_HOURS', '12')))
+
+# Сколько минут обрабатывает один запуск задачи (остальные - следующие запуски)
+CATCHUP_BATCH = 30
+
+# Отставание, начиная с которого минута считается догоняемой (см. process_reminder_slots)
+CATCHUP_LAG = timedelta(minutes=5)
+
+# Имя состояния в scheduler_state: последняя обработанная минута (UTC, ISO 8601)
+REMINDER_SLOTS_STATE = 'reminder_slots'
+
+# Аренда лидерства: срок и период продления, с
+LEASE_NAME = 'scheduler'
+LEASE_TTL = float(os.getenv('SCHEDULER_LEASE_TTL', '30'))
+LEASE_RENEW_INTERVAL = LEASE_TTL / 3
+
+# Сколько хранятся отметки о выполненных запусках задач, с
+JOB_RUNS_RETENTION = 7 * 24 * 3600
+
+_application = None
+_scheduler = None
+_lease = None
+_election = None
+
+# Задачи планировщика, которые выполняются сейчас (asyncio.Task)
+_running_jobs = set()
+
+
+class DatabaseLease:
+    """Аренда лидерства строкой в таблице leases базы бота"""
+
+    def __init__(self, name: str = LEASE_NAME, ttl: float = LEASE_TTL, owner: str = None):
+        self.name = name
+        self.ttl = ttl
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    async def acquire(self) -> bool:
+        """Захватывает или продлевает аренду; True - этот экземпляр лидер"""
+        return await acquire_lease(self.name, self.owner, self.ttl)
+
+    async def release(self) -> None:
+        await release_lease(self.name, self.owner)
+
+
+class LocalLease:
+    """Аренда без выборов: единственный экземпляр всегда лидер"""
+
+    def __init__(self, name: str = LEASE_NAME, owner: str = 'local'):
+        self.name = name
+        self.owner = owner
+
+    async def acquire(self) -> bool:
+        return True
+
+    async def release(self) -> None:
+        pass
+
+
+def create_lease():
+    """Аренда по SCHEDULER_LEASE: database (по умолчанию) или local"""
+    kind = os.getenv('SCHEDULER_LEASE', 'database')
+    if kind == 'local':
+        return LocalLease()
+    if kind != 'database':
+        raise ValueError(f"Неизвестный SCHEDULER_LEASE: {kind}")
+    return DatabaseLease()
+
+
+def set_application(application) -> None:
+    global _application
+    _application = application
+
+
+def leader_job(func):
+    """Задача планировщика, которую можно отменить и дождаться при потере лидерства"""
+    @functools.wraps(func)
+    async def wrapper():
+        task = asyncio.current_task()
+        _running_jobs.add(task)
+        try:
+            return await func()
+        finally:
+            _running_jobs.discard(task)
+    return wrapper
+
+
+@leader_job
+async def reminder_slots_job():
+    """Обрабатывает минуты от последней обработанной до текущей (догоняет простой)"""
+    now = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    state = await get_scheduler_state(REMINDER_SLOTS_STATE)
+    minute = datetime.fromisoformat(state) + timedelta(minutes=1) if state else now
+
+    if minute < now - CATCHUP_WINDOW:
+        skipped = int((now - CATCHUP_WINDOW - minute).total_seconds() // 60)
+        logger.warning("Пропущено %s мин простоя за пределами окна догона %s", skipped, CATCHUP_WINDOW)
+        minute = now - CATCHUP_WINDOW
+
+    processed = 0
+    owner = _lease.owner if _lease is not None else None
+    lease = _lease.name if _lease is not None else LEASE_NAME
+    while minute <= now and processed < CATCHUP_BATCH:
+        run_key = minute.isoformat()
+        # Минуту, уже обработанную прежним лидером, повторно не выполняем
+        if await begin_job_run(REMINDER_SLOTS_STATE, run_key, owner, lease):
+            await process_reminder_slots(_application, minute, catch_up=now - minute > CATCHUP_LAG,
+                                         not_before=now - CATCHUP_WINDOW)
+            await finish_job_run(REMINDER_SLOTS_STATE, run_key)
+        await set_scheduler_state(REMINDER_SLOTS_STATE, run_key)
+        minute += timedelta(minutes=1)
+        processed += 1
+
+    if minute <= now:
+        logger.info("Догоняем слоты напоминаний: осталось %s мин", int((now - minute).total_seconds() // 60) + 1)
+
+
+@leader_job
+async def checkpoint_database():
+    """Периодический checkpoint WAL, чтобы файл -wal не рос без ограничений"""
+    busy, log_pages, checkpointed = await run_db(checkpoint_wal)
+    if busy:
+        logger.warning("WAL checkpoint не завершен: %s из %s страниц перенесено", checkpointed, log_pages)
+
+
+@leader_job
+async def purge_old_job_runs():
+    """Удаляет старые отметки о запусках задач"""
+    await purge_job_runs(JOB_RUNS_RETENTION)
+
+
+def create_scheduler(db_path: str = None) -> AsyncIOScheduler:
+    """Планировщик с задачами в базе бота"""
+    scheduler = AsyncIOScheduler(
+        jobstores={'default': SQLiteJobStore(db_path)},
+        job_defaults={
+            # Несколько пропущенных запусков выполняются одним: пропущенные минуты
+            # обрабатывает сама задача по watermark
+            'coalesce': True,
+            'max_instances': 1,
+            'misfire_grace_time': 60,
+        },
+        timezone=timezone.utc,
+    )
+    # Проверки тренировок идут по местному времени пользователей: задача каждую минуту
+    # обрабатывает только слоты (часовой пояс, сдвиг), у которых наступило время
+    scheduler.add_job(
+        reminder_slots_job,
+        trigger=CronTrigger(second=0),
+        id='reminder_slots',
+        replace_existing=True
+    )
+    scheduler.add_job(
+        checkpoint_database,
+        trigger=IntervalTrigger(seconds=30),
+        id='wal_checkpoint',
+        replace_existing=True
+    )
+    scheduler.add_job(
+        purge_old_job_runs,
+        trigger=CronTrigger(hour=3, minute=30),
+        id='purge_job_runs',
+        replace_existing=True
+    )
+    return scheduler
+
+
+def _start_leading() -> None:
+    global _scheduler
+    _scheduler = create_scheduler()
+    _scheduler.start()
+    # Сразу догоняем пропущенное за время простоя (или за время смены лидера)
+    _scheduler.modify_job('reminder_slots', next_run_time=datetime.now(timezone.utc))
+
+
+async def _stop_leading() -> None:
+    """Останавливает планировщик, отменяет выполняющиеся задачи и дожидается их завершения"""
+    global _scheduler
+    if _scheduler is None:
+        return
+    _scheduler.shutdown(wait=False)
+    _scheduler = None
+    # AsyncIOScheduler останавливается в следующей итерации цикла (в том числе закрывает
+    # соединение хранилища задач) - даем ей выполниться
+    await asyncio.sleep(0)
+    # Прерванная минута остается незавершенной в job_runs: ее выполнит следующий лидер
+    running = list(_running_jobs)
+    for task in running:
+        task.cancel()
+    await asyncio.gather(*running, return_exceptions=True)
+
+
+async def run_election(lease) -> None:
+    """Продлевает аренду и запускает планировщик, пока этот экземпляр - лидер"""
+    while True:
+        try:
+            leader = await lease.acquire()
+        except Exception:
+            logger.exception("Не удалось продлить аренду лидерства")
+            leader = False
+
+        if leader and _scheduler is None:
+            logger.info("Экземпляр %s стал лидером: планировщик запущен", lease.owner)
+            _start_leading()
+        elif not leader and _scheduler is not None:
+            logger.warning("Экземпляр %s потерял лидерство: планировщик остановлен", lease.owner)
+            await _stop_leading()
+        await asyncio.sleep(LEASE_RENEW_INTERVAL)
+
+
+async def start_scheduler(application) -> None:
+    """post_init приложения: участвует в выборах лидера; планировщик запускает только лидер"""
+    global _lease, _election
+    set_application(application)
+    _lease = create_lease()
+    _election = asyncio.create_task(run_election(_lease))
+
+
+async def shutdown_scheduler() -> None:
+    """Останавливает выборы и планировщик, дожидается отмены выполняющихся задач и отдает аренду"""
+    global _lease, _election
+    if _election is not None:
+        _election.cancel()
+        await asyncio.gather(_election, return_exceptions=True)
+        _election = None
+    leader = _scheduler is not None
+    await _stop_leading()
+    if leader and _lease is not None:
+        await _lease.release()
+    _lease = None
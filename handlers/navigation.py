@@ -2,19 +2,30 @@ from telegram import Update, ReplyKeyboardMarkup, KeyboardButton
 from telegram.ext import ContextTypes
 
 from utils.states import MENU_STATE, MAIN_STATE, ANKETA_STATE, TRAINING_TECHNIQUE_STATE
-from Keyboards.keyboards import menu_keyboard, main_keyboard, anketa_keyboard
-from database.DataBase import get_user_by_id, get_active_training_session, advance_to_next_week, update_training_session
+from utils.routing import ANY_STATE, build_routes, normalize_text
+from Keyboards.keyboards import menu_keyboard, main_keyboard, anketa_keyboard, training_keyboard, technique_keyboard
+from database.async_db import get_user_by_id, get_active_training_session, advance_to_next_week, update_training_session
 from utils.texts import text01, text02, text03, text_technique_arms, text_technique_body, text_technique_legs
 
 
+# Состояния навигации по меню (маршруты ANY_STATE действуют во всех)
+NAVIGATION_STATES = (MENU_STATE, MAIN_STATE, ANKETA_STATE, TRAINING_TECHNIQUE_STATE)
+
+# Клавиатуры меню создаются один раз
+MENU_MARKUP = ReplyKeyboardMarkup(menu_keyboard, resize_keyboard=True)
+MAIN_MARKUP = ReplyKeyboardMarkup(main_keyboard, resize_keyboard=True)
+ANKETA_MARKUP = ReplyKeyboardMarkup(anketa_keyboard, resize_keyboard=True)
+TRAINING_MARKUP = ReplyKeyboardMarkup(training_keyboard, resize_keyboard=True)
+TECHNIQUE_MARKUP = ReplyKeyboardMarkup(technique_keyboard, resize_keyboard=True)
+
+
 async def show_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Показывает главное меню (состояние 0)"""
     context.user_data['current_state'] = MENU_STATE
-    reply_markup = ReplyKeyboardMarkup(menu_keyboard, resize_keyboard=True)
     await update.message.reply_text(
         "🏠 Главное меню\n\n"
         "Выберите действие:",
-        reply_markup=reply_markup
+        reply_markup=MENU_MARKUP
     )
     return MENU_STATE
 
@@ -22,11 +33,10 @@ async def show_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def show_main(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Показывает основное меню (состояние 1)"""
     context.user_data['current_state'] = MAIN_STATE
-    reply_markup = ReplyKeyboardMarkup(main_keyboard, resize_keyboard=True)
     await update.message.reply_text(
         "📋 Основное меню\n\n"
         "Выберите действие:",
-        reply_markup=reply_markup
+        reply_markup=MAIN_MARKUP
     )
     return MAIN_STATE
 
@@ -34,11 +44,10 @@ async def show_main(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def show_anketa_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Показывает меню анкеты (состояние 2)"""
     context.user_data['current_state'] = ANKETA_STATE
-    reply_markup = ReplyKeyboardMarkup(anketa_keyboard, resize_keyboard=True)
     await update.message.reply_text(
         "📝 Меню анкеты\n\n"
         "Выберите действие:",
-        reply_markup=reply_markup
+        reply_markup=ANKETA_MARKUP
     )
     return ANKETA_STATE
 
@@ -46,7 +55,7 @@ async def show_anketa_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def show_goal_and_diet(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Показывает цель пользователя и план питания"""
     user = update.message.from_user
-    user_data = get_user_by_id(user.id)
+    user_data = await get_user_by_id(user.id, columns=('goal',))
     
     if not user_data:
         await update.message.reply_text(
@@ -56,10 +65,10 @@ async def show_goal_and_diet(update: Update, context: ContextTypes.DEFAULT_TYPE)
         return MAIN_STATE
     
     # Показываем цель пользователя
-    goal_text = f"🎯 Ваша цель: {user_data[9]}\n\n"
+    goal_text = f"🎯 Ваша цель: {user_data.goal}\n\n"
     
     # Показываем план питания в зависимости от цели
-    if user_data[9] == 'дефицит':
+    if user_data.goal == 'дефицит':
         diet_text = text01
     else:
         diet_text = text02
@@ -67,166 +76,85 @@ async def show_goal_and_diet(update: Update, context: ContextTypes.DEFAULT_TYPE)
     full_text = goal_text + diet_text
     
     # Отправляем сообщение с кнопкой возврата
-    reply_markup = ReplyKeyboardMarkup(main_keyboard, resize_keyboard=True)
     await update.message.reply_text(
         full_text,
-        reply_markup=reply_markup
+        reply_markup=MAIN_MARKUP
     )
     return MAIN_STATE
 
 
 async def show_training_technique_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Показывает меню с техникой выполнения упражнений"""
-    from Keyboards.keyboards import technique_keyboard
-
     context.user_data['current_state'] = TRAINING_TECHNIQUE_STATE
-    reply_markup = ReplyKeyboardMarkup(technique_keyboard, resize_keyboard=True)
-
     await update.message.reply_text(
         "🧠 Раздел техники\n\n"
         "Выберите группу упражнений, чтобы получить рекомендации по технике.",
-        reply_markup=reply_markup
+        reply_markup=TECHNIQUE_MARKUP
     )
     return TRAINING_TECHNIQUE_STATE
 
 
+async def show_technique_arms(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await update.message.reply_text(text_technique_arms, reply_markup=TECHNIQUE_MARKUP)
+    return TRAINING_TECHNIQUE_STATE
+
+
+async def show_technique_body(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await update.message.reply_text(text_technique_body, reply_markup=TECHNIQUE_MARKUP)
+    return TRAINING_TECHNIQUE_STATE
+
+
+async def show_technique_legs(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await update.message.reply_text(text_technique_legs, reply_markup=TECHNIQUE_MARKUP)
+    return TRAINING_TECHNIQUE_STATE
+
+
+async def return_to_training_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Возврат из раздела техники в меню тренировочного процесса"""
+    context.user_data['current_state'] = MAIN_STATE
+    await update.message.reply_text(
+        "🏋️ Возвращаемся в меню тренировочного процесса.",
+        reply_markup=TRAINING_MARKUP
+    )
+    return MAIN_STATE
+
+
+async def show_recovery_recommendations(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await update.message.reply_text(text03, reply_markup=MAIN_MARKUP)
+    return MAIN_STATE
+
+
+async def show_training_process(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Статус активной тренировочной сессии или выбор дней, если сессии нет"""
+    session = await get_active_training_session(update.message.from_user.id)
+    if session:
+        await show_training_status(update, context, session)
+    else:
+        await start_training_process(update, context)
+    return MAIN_STATE
+
+
+async def show_achievements(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await update.message.reply_text(
+        "🏆 Достижения пока в разработке.\n"
+        "Скоро будет доступно!"
+    )
+    return MENU_STATE
+
+
 async def handle_navigation(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Обрабатывает навигацию между состояниями"""
-    text = update.message.text.lower()
+    """Обрабатывает навигацию между состояниями (один поиск в NAVIGATION_ROUTES)"""
     current_state = context.user_data.get('current_state', MENU_STATE)
-    
-    # Обработка команд из анкеты - эти команды обрабатываются в anketa_launcher.py
-    # Просто возвращаем текущее состояние
-    
-    if text == "main":
-        if current_state == MENU_STATE:
-            return await show_main(update, context)
-        elif current_state == ANKETA_STATE:
-            return await show_main(update, context)
-    
-    elif text == "questionnaire":
-        if current_state == MAIN_STATE:
-            return await show_anketa_menu(update, context)
-    
-    elif text == "return":
-        if current_state == ANKETA_STATE:
-            return await show_main(update, context)
-        elif current_state == TRAINING_TECHNIQUE_STATE:
-            from Keyboards.keyboards import training_keyboard
-
-            context.user_data['current_state'] = MAIN_STATE
-            reply_markup = ReplyKeyboardMarkup(training_keyboard, resize_keyboard=True)
-            await update.message.reply_text(
-                "🏋️ Возвращаемся в меню тренировочного процесса.",
-                reply_markup=reply_markup
-            )
-            return MAIN_STATE
-    
-    elif text == "main menu":
-        if current_state == MAIN_STATE:
-            return await show_menu(update, context)
-    
-    elif text == "goal & diet":
-        if current_state == MAIN_STATE:
-            return await show_goal_and_diet(update, context)
-    
-    elif text == "recovery recommendations":
-        if current_state == MAIN_STATE:
-            reply_markup = ReplyKeyboardMarkup(main_keyboard, resize_keyboard=True)
-            await update.message.reply_text(
-                text03,
-                reply_markup=reply_markup
-            )
-            return current_state
-    
-    elif text == "training process":
-        if current_state == MAIN_STATE:
-            user = update.message.from_user
-            # Проверяем, есть ли активная тренировочная сессия
-            from database.DataBase import get_active_training_session
-            session = get_active_training_session(user.id)
-            
-            if session:
-                # Если есть активная сессия, показываем текущий статус
-                await show_training_status(update, context, session)
-            else:
-                # Если нет активной сессии, начинаем выбор дней
-                await start_training_process(update, context)
-            return current_state
-
-    elif text == "🧠 техника":
-        if current_state == MAIN_STATE:
-            return await show_training_technique_menu(update, context)
-
-    elif text == "руки":
-        if current_state == TRAINING_TECHNIQUE_STATE:
-            from Keyboards.keyboards import technique_keyboard
-
-            reply_markup = ReplyKeyboardMarkup(technique_keyboard, resize_keyboard=True)
-            await update.message.reply_text(
-                text_technique_arms,
-                reply_markup=reply_markup
-            )
-            return TRAINING_TECHNIQUE_STATE
-
-    elif text == "спина":
-        if current_state == TRAINING_TECHNIQUE_STATE:
-            from Keyboards.keyboards import technique_keyboard
-
-            reply_markup = ReplyKeyboardMarkup(technique_keyboard, resize_keyboard=True)
-            await update.message.reply_text(
-                text_technique_body,
-                reply_markup=reply_markup
-            )
-            return TRAINING_TECHNIQUE_STATE
-
-    elif text == "ноги":
-        if current_state == TRAINING_TECHNIQUE_STATE:
-            from Keyboards.keyboards import technique_keyboard
-
-            reply_markup = ReplyKeyboardMarkup(technique_keyboard, resize_keyboard=True)
-            await update.message.reply_text(
-                text_technique_legs,
-                reply_markup=reply_markup
-            )
-            return TRAINING_TECHNIQUE_STATE
-    
-    elif text == "/achievements":
-        if current_state == MENU_STATE:
-            await update.message.reply_text(
-                "🏆 Достижения пока в разработке.\n"
-                "Скоро будет доступно!"
-            )
-            return current_state
-    
-    elif text == "следующая неделя":
-        if current_state == ANKETA_STATE:
-            return await handle_next_week(update, context)
-    
-    # Обработка кнопок тренировочного процесса
-    elif text == "📋 упражнения дня":
-        return await show_today_exercises(update, context)
-    
-    elif text == "📅 расписание":
-        return await show_training_schedule(update, context)
-    
-    elif text == "✅ я выполнил тренировку":
-        return await handle_skip_day_button(update, context)
-    
-    elif text == "📊 статус":
-        return await show_training_status_button(update, context)
-    
-    elif text == "🏠 главное меню":
-        return await show_main(update, context)
-    
-    elif text == "⬅️ предыдущая неделя":
-        return await handle_previous_week(update, context)
-    
-    elif text == "➡️ следующая неделя":
-        return await handle_next_week_from_training(update, context)
-    
-    # Если команда не распознана, остаемся в текущем состоянии
-    return current_state
+    handler = resolve_route(current_state, update.message.text)
+    if handler is None:
+        # Если команда не распознана, остаемся в текущем состоянии
+        return current_state
+    return await handler(update, context)
+
+
+def resolve_route(state, text: str):
+    """Обработчик кнопки text в состоянии state или None"""
+    return NAVIGATION_ROUTES.get((state, normalize_text(text)))
 
 
 async def start_training_process(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -249,10 +177,10 @@ async def start_training_process(update: Update, context: ContextTypes.DEFAULT_T
 
 async def show_training_status(update: Update, context: ContextTypes.DEFAULT_TYPE, session):
     """Показывает текущий статус тренировочной сессии"""
-    week_num = session[2]
-    training_days = session[3]
-    current_day = session[4]
-    completed_days = session[5]
+    week_num = session.week_number
+    training_days = session.training_days
+    current_day = session.current_day
+    completed_days = session.completed_days
     
     status_text = f"📊 Статус тренировок (Неделя {week_num}):\n\n"
     status_text += f"📅 Дни тренировок: {training_days}\n"
@@ -265,8 +193,7 @@ async def show_training_status(update: Update, context: ContextTypes.DEFAULT_TYP
         status_text += "💪 Продолжайте тренировки!"
     
     # Используем новую тренировочную клавиатуру
-    from Keyboards.keyboards import training_keyboard
-    reply_markup = ReplyKeyboardMarkup(training_keyboard, resize_keyboard=True)
+    reply_markup = TRAINING_MARKUP
     
     # Проверяем, это callback query или message
     if update.callback_query:
@@ -280,7 +207,7 @@ async def handle_next_week(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.message.from_user
     
     # Проверяем, есть ли активная тренировочная сессия
-    session = get_active_training_session(user.id)
+    session = await get_active_training_session(user.id)
     if not session:
         await update.message.reply_text(
             "❌ У вас нет активной тренировочной сессии.\n"
@@ -289,7 +216,7 @@ async def handle_next_week(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return ANKETA_STATE
     
     # Переводим на следующую неделю
-    new_week = advance_to_next_week(user.id)
+    new_week = await advance_to_next_week(user.id)
     if new_week:
         await update.message.reply_text(
             f"📅 Переходим к неделе {new_week}!\n\n"
@@ -309,14 +236,14 @@ async def handle_next_week(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def show_today_exercises(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Показывает упражнения для текущего дня в зависимости от недели и дня"""
     user = update.message.from_user
-    session = get_active_training_session(user.id)
+    session = await get_active_training_session(user.id)
     
     if not session:
         await update.message.reply_text("❌ У вас нет активной тренировочной сессии.")
         return
     
-    current_day = session[4]  # 0, 1 или 2
-    week_num = session[2]  # номер недели (1, 2, 3...)
+    current_day = session.current_day  # 0, 1 или 2
+    week_num = session.week_number  # номер недели (1, 2, 3...)
     
     # Определяем тип тренировки по дню
     training_types = ["День 1: Грудь, Плечи, Трицепс", "День 2: Спина, Бицепс", "День 3: Ноги и Кор"]
@@ -336,8 +263,7 @@ async def show_today_exercises(update: Update, context: ContextTypes.DEFAULT_TYP
         exercises_text = f"❌ Не удалось загрузить упражнения для недели {week_num}, день {current_day + 1}"
     
     # Выводим упражнения (включая заглушки типа "day12")
-    from Keyboards.keyboards import training_keyboard
-    reply_markup = ReplyKeyboardMarkup(training_keyboard, resize_keyboard=True)
+    reply_markup = TRAINING_MARKUP
     
     await update.message.reply_text(
         f"📋 {training_type} (Неделя {week_num})\n\n"
@@ -349,16 +275,16 @@ async def show_today_exercises(update: Update, context: ContextTypes.DEFAULT_TYP
 async def show_training_schedule(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Показывает расписание тренировок"""
     user = update.message.from_user
-    session = get_active_training_session(user.id)
+    session = await get_active_training_session(user.id)
     
     if not session:
         await update.message.reply_text("❌ У вас нет активной тренировочной сессии.")
         return
     
-    week_num = session[2]
-    training_days = session[3]
-    current_day = session[4]
-    completed_days = session[5]
+    week_num = session.week_number
+    training_days = session.training_days
+    current_day = session.current_day
+    completed_days = session.completed_days
     
     schedule_text = f"📅 Расписание тренировок (Неделя {week_num}):\n\n"
     schedule_text += f"📆 Дни тренировок: {training_days}\n\n"
@@ -369,51 +295,36 @@ async def show_training_schedule(update: Update, context: ContextTypes.DEFAULT_T
         status = "✅" if i < completed_days else "⏳" if i == current_day else "⭕"
         schedule_text += f"{status} {day_type}\n"
     
-    from Keyboards.keyboards import training_keyboard
-    reply_markup = ReplyKeyboardMarkup(training_keyboard, resize_keyboard=True)
+    reply_markup = TRAINING_MARKUP
     
     await update.message.reply_text(schedule_text, reply_markup=reply_markup)
 
 
 async def handle_skip_day_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обрабатывает кнопку "Я выполнил тренировку" - работает как реальное выполнение тренировки"""
-    from datetime import datetime
-    from database.DataBase import add_training_log
+    from database.async_db import add_training_log
+    from utils.timezones import local_now
     
     user = update.message.from_user
-    session = get_active_training_session(user.id)
+    session = await get_active_training_session(user.id)
     
     if not session:
         await update.message.reply_text("❌ У вас нет активной тренировочной сессии.")
         return
     
-    session_id = session[0]
-    current_day = session[4]
+    session_id = session.id
+    current_day = session.current_day
     
     # Определяем тип тренировки по текущему дню
     training_types = ["День 1: Грудь, Плечи, Трицепс", "День 2: Спина, Бицепс", "День 3: Ноги и Кор"]
     training_type = training_types[current_day]
     
     # Создаем запись в логе тренировок (completed=True, так как пользователь выполнил)
-    today = datetime.now().date()
+    today = local_now(session.timezone).date()
     today_str = today.strftime('%Y-%m-%d')
     
-    # Добавляем запись в лог
-    add_training_log(user.id, session_id, today_str, training_type, True)
-    
-    # Получаем ID созданной записи для дальнейшей обработки
-    # Ищем последнюю запись для этого пользователя и сессии за сегодня
-    import sqlite3
-    conn = sqlite3.connect('users.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT * FROM training_log 
-        WHERE user_id = ? AND session_id = ? AND training_date = ?
-        ORDER BY created_at DESC 
-        LIMIT 1
-    ''', (user.id, session_id, today_str))
-    training_log = cursor.fetchone()
-    conn.close()
+    # Добавляем запись в лог; id записи возвращается тем же запросом
+    training_log_id = await add_training_log(user.id, session_id, today_str, training_type, True)
     
     # Спрашиваем о боли (как при реальном выполнении)
     keyboard = [
@@ -429,8 +340,7 @@ async def handle_skip_day_button(update: Update, context: ContextTypes.DEFAULT_T
     )
     
     # Сохраняем в контексте для обработки ответа о боли
-    if training_log:
-        context.user_data['training_log_id'] = training_log[0]  # Реальный ID записи
+    context.user_data['training_log_id'] = training_log_id  # Реальный ID записи
     context.user_data['training_type'] = training_type
     context.user_data['session_id'] = session_id
 
@@ -438,7 +348,7 @@ async def handle_skip_day_button(update: Update, context: ContextTypes.DEFAULT_T
 async def show_training_status_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Показывает статус тренировок по кнопке"""
     user = update.message.from_user
-    session = get_active_training_session(user.id)
+    session = await get_active_training_session(user.id)
     
     if not session:
         await update.message.reply_text("❌ У вас нет активной тренировочной сессии.")
@@ -450,16 +360,16 @@ async def show_training_status_button(update: Update, context: ContextTypes.DEFA
 async def handle_skip_day_missed(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """ВРЕМЕННАЯ ФУНКЦИЯ: Обрабатывает пропуск дня (не выполнение тренировки)"""
     user = update.message.from_user
-    session = get_active_training_session(user.id)
+    session = await get_active_training_session(user.id)
     
     if not session:
         await update.message.reply_text("❌ У вас нет активной тренировочной сессии.")
         return
     
-    session_id = session[0]
-    current_day = session[4]
-    completed_days = session[5]
-    week_num = session[2]
+    session_id = session.id
+    current_day = session.current_day
+    completed_days = session.completed_days
+    week_num = session.week_number
     
     # Определяем тип тренировки, которая была пропущена
     training_types = ["День 1: Грудь, Плечи, Трицепс", "День 2: Спина, Бицепс", "День 3: Ноги и Кор"]
@@ -470,15 +380,14 @@ async def handle_skip_day_missed(update: Update, context: ContextTypes.DEFAULT_T
     
     # Обновляем сессию - НЕ меняем current_day и completed_days
     # Тренировка остается той же самой для выполнения
-    update_training_session(
+    await update_training_session(
         session_id,
         current_day=current_day,  # Остается тот же день
         completed_days=completed_days  # Не увеличиваем!
     )
     
     # Показываем сообщение о пропуске
-    from Keyboards.keyboards import training_keyboard
-    reply_markup = ReplyKeyboardMarkup(training_keyboard, resize_keyboard=True)
+    reply_markup = TRAINING_MARKUP
     
     await update.message.reply_text(
         f"⏸️ День пропущен!\n\n"
@@ -491,7 +400,7 @@ async def handle_skip_day_missed(update: Update, context: ContextTypes.DEFAULT_T
     )
     
     # Показываем обновленный статус
-    updated_session = get_active_training_session(user.id)
+    updated_session = await get_active_training_session(user.id)
     if updated_session:
         await show_training_status(update, context, updated_session)
 
@@ -499,14 +408,14 @@ async def handle_skip_day_missed(update: Update, context: ContextTypes.DEFAULT_T
 async def handle_previous_week(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обрабатывает переход на предыдущую неделю (для тестирования)"""
     user = update.message.from_user
-    session = get_active_training_session(user.id)
+    session = await get_active_training_session(user.id)
     
     if not session:
         await update.message.reply_text("❌ У вас нет активной тренировочной сессии.")
         return
     
-    session_id = session[0]
-    current_week = session[2]
+    session_id = session.id
+    current_week = session.week_number
     
     if current_week <= 1:
         await update.message.reply_text("❌ Вы уже на первой неделе!")
@@ -514,7 +423,7 @@ async def handle_previous_week(update: Update, context: ContextTypes.DEFAULT_TYP
     
     # Уменьшаем номер недели
     new_week = current_week - 1
-    update_training_session(
+    await update_training_session(
         session_id,
         week_number=new_week,
         completed_days=0,
@@ -522,8 +431,7 @@ async def handle_previous_week(update: Update, context: ContextTypes.DEFAULT_TYP
         check02_passed=False
     )
     
-    from Keyboards.keyboards import training_keyboard
-    reply_markup = ReplyKeyboardMarkup(training_keyboard, resize_keyboard=True)
+    reply_markup = TRAINING_MARKUP
     
     await update.message.reply_text(
         f"⬅️ Перешли на неделю {new_week}!\n\n"
@@ -535,17 +443,16 @@ async def handle_previous_week(update: Update, context: ContextTypes.DEFAULT_TYP
 async def handle_next_week_from_training(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обрабатывает переход на следующую неделю из тренировочного процесса"""
     user = update.message.from_user
-    session = get_active_training_session(user.id)
+    session = await get_active_training_session(user.id)
     
     if not session:
         await update.message.reply_text("❌ У вас нет активной тренировочной сессии.")
         return
     
     # Переводим на следующую неделю
-    new_week = advance_to_next_week(user.id)
+    new_week = await advance_to_next_week(user.id)
     if new_week:
-        from Keyboards.keyboards import training_keyboard
-        reply_markup = ReplyKeyboardMarkup(training_keyboard, resize_keyboard=True)
+        reply_markup = TRAINING_MARKUP
         
         await update.message.reply_text(
             f"➡️ Перешли на неделю {new_week}!\n\n"
@@ -554,3 +461,31 @@ async def handle_next_week_from_training(update: Update, context: ContextTypes.D
         )
     else:
         await update.message.reply_text("❌ Ошибка при переходе на следующую неделю.")
+
+
+# Маршруты кнопок: (состояние, текст кнопки, обработчик); текст сравнивается без учета регистра
+NAVIGATION_ROUTES = build_routes((
+    (MENU_STATE, "main", show_main),
+    (ANKETA_STATE, "main", show_main),
+    (MAIN_STATE, "questionnaire", show_anketa_menu),
+    (ANKETA_STATE, "return", show_main),
+    (TRAINING_TECHNIQUE_STATE, "return", return_to_training_menu),
+    (MAIN_STATE, "main menu", show_menu),
+    (MAIN_STATE, "goal & diet", show_goal_and_diet),
+    (MAIN_STATE, "recovery recommendations", show_recovery_recommendations),
+    (MAIN_STATE, "training process", show_training_process),
+    (MAIN_STATE, "🧠 Техника", show_training_technique_menu),
+    (TRAINING_TECHNIQUE_STATE, "руки", show_technique_arms),
+    (TRAINING_TECHNIQUE_STATE, "спина", show_technique_body),
+    (TRAINING_TECHNIQUE_STATE, "ноги", show_technique_legs),
+    (MENU_STATE, "/achievements", show_achievements),
+    (ANKETA_STATE, "следующая неделя", handle_next_week),
+    # Кнопки тренировочного процесса
+    (ANY_STATE, "📋 Упражнения дня", show_today_exercises),
+    (ANY_STATE, "📅 Расписание", show_training_schedule),
+    (ANY_STATE, "✅ Я выполнил тренировку", handle_skip_day_button),
+    (ANY_STATE, "📊 Статус", show_training_status_button),
+    (ANY_STATE, "🏠 Главное меню", show_main),
+    (ANY_STATE, "⬅️ Предыдущая неделя", handle_previous_week),
+    (ANY_STATE, "➡️ Следующая неделя", handle_next_week_from_training),
+), NAVIGATION_STATES)
@@ -0,0 +1,63 @@
+from telegram import Update
+from telegram.ext import CommandHandler, ContextTypes
+
+from database.async_db import get_user_settings, set_user_settings
+from utils.timezones import (
+    DEFAULT_TIMEZONE, MIN_REMINDER_OFFSET, MAX_REMINDER_OFFSET, REMINDER_OFFSET_STEP,
+    local_now, parse_timezone, parse_reminder_offset
+)
+
+
+TIMEZONE_HELP = (
+    "Использование:\n"
+    "/timezone Europe/Moscow - установить часовой пояс\n"
+    "/timezone UTC+5 - часовой пояс по смещению от UTC\n"
+    "/timezone Europe/Moscow -60 - пояс и сдвиг напоминаний в минутах "
+    f"(от {MIN_REMINDER_OFFSET} до {MAX_REMINDER_OFFSET}, кратно {REMINDER_OFFSET_STEP})\n\n"
+    "Вопрос о тренировке приходит в 23:00, напоминание - в 16:00 по вашему времени "
+    "(со сдвигом, если он задан)."
+)
+
+
+async def timezone_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Показывает или меняет часовой пояс и сдвиг напоминаний пользователя"""
+    user = update.message.from_user
+    args = context.args or []
+
+    if not args:
+        settings = await get_user_settings(user.id)
+        timezone = settings.timezone if settings else None
+        reminder_offset = settings.reminder_offset if settings else 0
+        now = local_now(timezone)
+        await update.message.reply_text(
+            f"🕒 Ваш часовой пояс: {timezone or DEFAULT_TIMEZONE}"
+            f"{'' if timezone else ' (по умолчанию)'}\n"
+            f"Местное время: {now.strftime('%H:%M')}\n"
+            f"Сдвиг напоминаний: {reminder_offset:+d} мин\n\n" + TIMEZONE_HELP
+        )
+        return
+
+    timezone = parse_timezone(args[0])
+    if timezone is None:
+        await update.message.reply_text(f"❌ Неизвестный часовой пояс: {args[0]}\n\n" + TIMEZONE_HELP)
+        return
+
+    reminder_offset = 0
+    if len(args) > 1:
+        reminder_offset = parse_reminder_offset(args[1])
+        if reminder_offset is None:
+            await update.message.reply_text(f"❌ Недопустимый сдвиг: {args[1]}\n\n" + TIMEZONE_HELP)
+            return
+
+    await set_user_settings(user.id, timezone, reminder_offset)
+    now = local_now(timezone)
+    await update.message.reply_text(
+        f"✅ Часовой пояс сохранен: {timezone}\n"
+        f"Местное время: {now.strftime('%H:%M')}\n"
+        f"Сдвиг напоминаний: {reminder_offset:+d} мин"
+    )
+
+
+def register_settings_handlers(application):
+    """Регистрирует команды настроек пользователя"""
+    application.add_handler(CommandHandler("timezone", timezone_command))
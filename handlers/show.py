@@ -1,7 +1,7 @@
-from telegram import Update
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 
-from database.DataBase import get_user_by_id, get_all_user_forms, get_all_users, delete_last_user_form, delete_all_user_forms, get_user_previous_form
+from database.async_db import get_user_by_id, get_user_form_history, delete_last_user_form, delete_all_user_forms
 from error_solutions import send_long_message
 
 
@@ -46,24 +46,26 @@ def format_date(date_value):
 
 async def show_me(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.message.from_user
-    user_data = get_user_by_id(user.id)
+    user_data = await get_user_by_id(user.id, columns=(
+        'height', 'weight', 'activity_level', 'gender', 'years_experience', 'created_at', 'updated_at'
+    ))
     if user_data:
-        bmi = float(user_data[4]) / ((float(user_data[3]) / 100) ** 2)
+        bmi = float(user_data.weight) / ((float(user_data.height) / 100) ** 2)
         
         # Форматируем даты
-        created_date = format_date(user_data[8])
-        updated_date = format_date(user_data[9])
+        created_date = format_date(user_data.created_at)
+        updated_date = format_date(user_data.updated_at)
         
         await update.message.reply_text(
             "📋 Ваша последняя анкета:\n\n"
             f"📅 Дата заполнения: {created_date}\n"
             f"✏️ Дата обновления: {updated_date}\n"
-            f"📏 Рост: {user_data[3]} см\n"
-            f"⚖️ Вес: {user_data[4]} кг\n"
+            f"📏 Рост: {user_data.height} см\n"
+            f"⚖️ Вес: {user_data.weight} кг\n"
             f"📊 ИМТ: {bmi:.1f}\n"
-            f"🏃 Уровень активности: {user_data[5]}\n"
-            f"👤 Пол: {user_data[6]}\n"
-            f"🎂 Возраст: {user_data[7]} лет\n\n"
+            f"🏃 Уровень активности: {user_data.activity_level}\n"
+            f"👤 Пол: {user_data.gender}\n"
+            f"🎂 Возраст: {user_data.years_experience} лет\n\n"
             "Чтобы увидеть все ваши анкеты, используйте /my_forms"
         )
     else:
@@ -73,172 +75,101 @@ async def show_me(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
 
 
+NO_FORMS_TEXT = (
+    "❌ У вас еще нет заполненных анкет.\n"
+    "Заполните анкету с помощью команды /form"
+)
+
+
+def format_form_entry(form, number: int) -> str:
+    """Текст анкеты #number в истории: первая - полностью, остальные - изменения относительно предыдущей"""
+    bmi = float(form.weight) / ((float(form.height) / 100) ** 2)
+    date_str = format_date(form.created_at)
+
+    if number == 1:
+        # Первая анкета - показываем полностью
+        return (
+            f"📋 Анкета #{number} (от {date_str}) - ПОЛНАЯ АНКЕТА:\n"
+            f"📏 Рост: {form.height} см\n"
+            f"⚖️ Вес: {form.weight} кг\n"
+            f"📊 ИМТ: {bmi:.1f}\n"
+            f"🏃 Активность: {form.activity_level}\n"
+            f"👤 Пол: {form.gender}\n"
+            f"🎂 Возраст: {form.years_experience} лет\n"
+            f"🎯 Цель: {form.goal}"
+        )
+
+    # Последующие анкеты - только вес и активность с предыдущими значениями
+    weight_change = ""
+    activity_change = ""
+    if form.previous_weight is not None and float(form.weight) != float(form.previous_weight):
+        weight_change = f" (был {form.previous_weight})"
+    if form.previous_activity_level is not None and form.activity_level != form.previous_activity_level:
+        activity_change = f" (был {form.previous_activity_level})"
+
+    return (
+        f"📋 Анкета #{number} (от {date_str}) - ОБНОВЛЕНИЕ:\n"
+        f"⚖️ Вес: {form.weight} кг{weight_change}\n"
+        f"📊 ИМТ: {bmi:.1f}\n"
+        f"🏃 Активность: {form.activity_level}{activity_change}"
+    )
+
+
+def render_forms_page(forms, first_number: int):
+    """Текст и кнопки страницы истории; first_number - номер первой анкеты страницы"""
+    total = forms[0].total
+    last_number = first_number + len(forms) - 1
+    entries = [format_form_entry(form, number) for number, form in enumerate(forms, first_number)]
+    text = f"📊 Ваш прогресс - {total} анкет (#{first_number}-#{last_number}):\n\n" + "\n\n".join(entries)
+
+    # Номер анкеты в callback_data, чтобы не считать его запросом
+    buttons = []
+    if first_number > 1:
+        buttons.append(InlineKeyboardButton("⬅️ Назад", callback_data=f"forms:prev:{forms[0].id}:{first_number}"))
+    if last_number < total:
+        buttons.append(InlineKeyboardButton("Вперед ➡️", callback_data=f"forms:next:{forms[-1].id}:{last_number}"))
+    return text, InlineKeyboardMarkup([buttons]) if buttons else None
+
+
 async def show_my_forms(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.message.from_user
-    forms = get_all_user_forms(user.id)
+    forms = await get_user_form_history(user.id)
     if not forms:
-        await update.message.reply_text(
-            "❌ У вас еще нет заполненных анкет.\n"
-            "Заполните анкету с помощью команды /form"
-        )
+        await update.message.reply_text(NO_FORMS_TEXT)
         return
-    
-    # Убираем дубликаты по ID записи
-    unique_forms = []
-    seen_ids = set()
-    for form in forms:
-        if form[0] not in seen_ids:  # form[0] - это id записи
-            unique_forms.append(form)
-            seen_ids.add(form[0])
-    
-    if not unique_forms:
-        await update.message.reply_text(
-            "❌ У вас еще нет заполненных анкет.\n"
-            "Заполните анкету с помощью команды /form"
-        )
-        return
-    
-    # Отправляем каждую анкету отдельным сообщением
-    await update.message.reply_text(f"📊 Ваш прогресс - {len(unique_forms)} анкет:")
-    
-    for i, form in enumerate(unique_forms, 1):
-        height_cm = float(form[3])
-        weight_kg = float(form[4])
-        bmi = weight_kg / ((height_cm / 100) ** 2)
-        
-        # Форматируем дату
-        date_str = format_date(form[8])
-        
-        if i == 1:
-            # Первая анкета - показываем полностью
-            response = (
-                f"📋 Анкета #{i} (от {date_str}) - ПОЛНАЯ АНКЕТА:\n"
-                f"📏 Рост: {form[3]} см\n"
-                f"⚖️ Вес: {form[4]} кг\n"
-                f"📊 ИМТ: {bmi:.1f}\n"
-                f"🏃 Активность: {form[5]}\n"
-                f"👤 Пол: {form[6]}\n"
-                f"🎂 Возраст: {form[7]} лет\n"
-                f"🎯 Цель: {form[9]}"
-            )
-        else:
-            # Последующие анкеты - показываем только вес и активность с предыдущими значениями
-            previous_form = get_user_previous_form(user.id, form[0])
-            
-            if previous_form:
-                # Сравниваем с предыдущей анкетой
-                prev_weight = previous_form[4]
-                prev_activity = previous_form[5]
-                
-                weight_change = ""
-                activity_change = ""
-                
-                if float(form[4]) != float(prev_weight):
-                    weight_change = f" (был {prev_weight})"
-                
-                if form[5] != prev_activity:
-                    activity_change = f" (был {prev_activity})"
-                
-                response = (
-                    f"📋 Анкета #{i} (от {date_str}) - ОБНОВЛЕНИЕ:\n"
-                    f"⚖️ Вес: {form[4]} кг{weight_change}\n"
-                    f"📊 ИМТ: {bmi:.1f}\n"
-                    f"🏃 Активность: {form[5]}{activity_change}"
-                )
-            else:
-                # Если предыдущей анкеты нет (не должно происходить)
-                response = (
-                    f"📋 Анкета #{i} (от {date_str}) - ОБНОВЛЕНИЕ:\n"
-                    f"⚖️ Вес: {form[4]} кг\n"
-                    f"📊 ИМТ: {bmi:.1f}\n"
-                    f"🏃 Активность: {form[5]}"
-                )
-        
-        await update.message.reply_text(response)
+
+    text, reply_markup = render_forms_page(forms, 1)
+    await update.message.reply_text(text, reply_markup=reply_markup)
 
 
 async def show_all(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user = update.message.from_user
-    forms = get_all_user_forms(user.id)
+    await show_my_forms(update, context)
+
+
+async def handle_forms_page(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Листает историю анкет (кнопки forms:prev / forms:next)"""
+    query = update.callback_query
+    await query.answer()
+
+    _, direction, form_id, number = query.data.split(':')
+    form_id, number = int(form_id), int(number)
+    if direction == 'next':
+        forms = await get_user_form_history(query.from_user.id, after_id=form_id)
+        first_number = number + 1
+    else:
+        forms = await get_user_form_history(query.from_user.id, before_id=form_id)
+        first_number = number - len(forms)
+
+    if not forms or first_number < 1:
+        # Анкета, от которой листали, удалена - начинаем с первой страницы
+        forms = await get_user_form_history(query.from_user.id)
+        first_number = 1
     if not forms:
-        await update.message.reply_text(
-            "❌ У вас еще нет заполненных анкет.\n"
-            "Заполните анкету с помощью команды /form"
-        )
+        await query.edit_message_text(NO_FORMS_TEXT)
         return
-    
-    # Убираем дубликаты по ID записи
-    unique_forms = []
-    seen_ids = set()
-    for form in forms:
-        if form[0] not in seen_ids:  # form[0] - это id записи
-            unique_forms.append(form)
-            seen_ids.add(form[0])
-    
-    if not unique_forms:
-        await update.message.reply_text(
-            "❌ У вас еще нет заполненных анкет.\n"
-            "Заполните анкету с помощью команды /form"
-        )
-        return
-    
-    # Отправляем каждую анкету отдельным сообщением
-    await update.message.reply_text(f"📊 Ваш прогресс - {len(unique_forms)} анкет:")
-    
-    for i, form in enumerate(unique_forms, 1):
-        height_cm = float(form[3])
-        weight_kg = float(form[4])
-        bmi = weight_kg / ((height_cm / 100) ** 2)
-        
-        # Форматируем дату
-        date_str = format_date(form[8])
-        
-        if i == 1:
-            # Первая анкета - показываем полностью
-            response = (
-                f"📋 Анкета #{i} (от {date_str}) - ПОЛНАЯ АНКЕТА:\n"
-                f"📏 Рост: {form[3]} см\n"
-                f"⚖️ Вес: {form[4]} кг\n"
-                f"📊 ИМТ: {bmi:.1f}\n"
-                f"🏃 Активность: {form[5]}\n"
-                f"👤 Пол: {form[6]}\n"
-                f"🎂 Возраст: {form[7]} лет\n"
-                f"🎯 Цель: {form[9]}"
-            )
-        else:
-            # Последующие анкеты - показываем только вес и активность с предыдущими значениями
-            previous_form = get_user_previous_form(user.id, form[0])
-            
-            if previous_form:
-                # Сравниваем с предыдущей анкетой
-                prev_weight = previous_form[4]
-                prev_activity = previous_form[5]
-                
-                weight_change = ""
-                activity_change = ""
-                
-                if float(form[4]) != float(prev_weight):
-                    weight_change = f" (был {prev_weight})"
-                
-                if form[5] != prev_activity:
-                    activity_change = f" (был {prev_activity})"
-                
-                response = (
-                    f"📋 Анкета #{i} (от {date_str}) - ОБНОВЛЕНИЕ:\n"
-                    f"⚖️ Вес: {form[4]} кг{weight_change}\n"
-                    f"📊 ИМТ: {bmi:.1f}\n"
-                    f"🏃 Активность: {form[5]}{activity_change}"
-                )
-            else:
-                # Если предыдущей анкеты нет (не должно происходить)
-                response = (
-                    f"📋 Анкета #{i} (от {date_str}) - ОБНОВЛЕНИЕ:\n"
-                    f"⚖️ Вес: {form[4]} кг\n"
-                    f"📊 ИМТ: {bmi:.1f}\n"
-                    f"🏃 Активность: {form[5]}"
-                )
-        
-        await update.message.reply_text(response)
+
+    text, reply_markup = render_forms_page(forms, first_number)
+    await query.edit_message_text(text, reply_markup=reply_markup)
 
 
 async def handle_show_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -259,7 +190,7 @@ async def handle_show_command(update: Update, context: ContextTypes.DEFAULT_TYPE
 
 async def clear_last(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.message.from_user
-    deleted = delete_last_user_form(user.id)
+    deleted = await delete_last_user_form(user.id)
     if deleted:
         await update.message.reply_text("Последняя анкета удалена.")
     else:
@@ -268,7 +199,7 @@ async def clear_last(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def clear_all(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.message.from_user
-    deleted = delete_all_user_forms(user.id)
+    deleted = await delete_all_user_forms(user.id)
     if deleted:
         await update.message.reply_text("Все ваши анкеты удалены.")
     else:
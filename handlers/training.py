@@ -1,7 +1,8 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import ContextTypes, CallbackQueryHandler
+from telegram.ext import ContextTypes
 
-from database.DataBase import create_training_session, get_active_training_session, update_training_session
+from database.async_db import create_training_session, get_active_training_session, update_training_session
+from utils.routing import CallbackRouter
 from utils.texts import text04
 from Keyboards.keyboards import main_keyboard
 
@@ -27,7 +28,7 @@ async def handle_training_days_selection(update: Update, context: ContextTypes.D
         return
     
     # Создаем новую тренировочную сессию
-    session_id = create_training_session(user.id, 1, training_days)
+    session_id = await create_training_session(user.id, 1, training_days)
     
     # Показываем план тренировок
     await query.edit_message_text(
@@ -45,7 +46,7 @@ async def start_training(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer()
     
     user = query.from_user
-    session = get_active_training_session(user.id)
+    session = await get_active_training_session(user.id)
     
     if not session:
         await query.edit_message_text("❌ Ошибка: тренировочная сессия не найдена")
@@ -62,23 +63,23 @@ async def skip_day(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer()
     
     user = query.from_user
-    session = get_active_training_session(user.id)
+    session = await get_active_training_session(user.id)
     
     if not session:
         await query.edit_message_text("❌ Ошибка: тренировочная сессия не найдена")
         return
     
-    session_id = session[0]
-    current_day = session[4]
-    completed_days = session[5]
-    week_num = session[2]
+    session_id = session.id
+    current_day = session.current_day
+    completed_days = session.completed_days
+    week_num = session.week_number
     
     # Увеличиваем счетчики
     new_completed_days = completed_days + 1
     new_current_day = (current_day + 1) % 3
     
     # Обновляем сессию
-    update_training_session(
+    await update_training_session(
         session_id,
         current_day=new_current_day,
         completed_days=new_completed_days
@@ -93,7 +94,7 @@ async def skip_day(update: Update, context: ContextTypes.DEFAULT_TYPE):
         # Показываем обновленный статус
         from handlers.navigation import show_training_status
         # Обновляем сессию в контексте
-        updated_session = get_active_training_session(user.id)
+        updated_session = await get_active_training_session(user.id)
         await show_training_status(update, context, updated_session)
 
 
@@ -103,7 +104,7 @@ async def show_status(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer()
     
     user = query.from_user
-    session = get_active_training_session(user.id)
+    session = await get_active_training_session(user.id)
     
     if not session:
         await query.edit_message_text("❌ Ошибка: тренировочная сессия не найдена")
@@ -113,9 +114,15 @@ async def show_status(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await show_training_status(update, context, session)
 
 
+# Кнопки тренировочного процесса: точное значение callback_data или префикс
+TRAINING_CALLBACKS = CallbackRouter({
+    "days_": handle_training_days_selection,
+    "start_training": start_training,
+    "skip_day": skip_day,
+    "show_status": show_status,
+})
+
+
 def register_training_handlers(application):
     """Регистрирует обработчики для тренировочного процесса"""
-    application.add_handler(CallbackQueryHandler(handle_training_days_selection, pattern="^days_"))
-    application.add_handler(CallbackQueryHandler(start_training, pattern="^start_training$"))
-    application.add_handler(CallbackQueryHandler(skip_day, pattern="^skip_day$"))
-    application.add_handler(CallbackQueryHandler(show_status, pattern="^show_status$"))
+    application.add_handler(TRAINING_CALLBACKS.handler())
@@ -1,168 +1,146 @@
-import asyncio
-from datetime import datetime, timedelta
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
 from telegram import Update, ReplyKeyboardMarkup, KeyboardButton
 from telegram.ext import ContextTypes
 
-from database.DataBase import (
-    get_all_active_training_sessions, 
-    add_training_log, 
+from database.async_db import (
+    claim_due_training_checks,
+    claim_due_training_reminders,
+    deactivate_training_sessions,
+    deactivate_unanswered_sessions,
     update_training_session,
     get_active_training_session,
-    get_pending_training_check
+    get_pending_training_check,
+    update_training_log
 )
 from Keyboards.keyboards import main_keyboard
-
-
-# Маппинг дней недели
-DAYS_MAPPING = {
-    "Пн-Ср-Пт": [0, 2, 4],  # Понедельник, Среда, Пятница
-    "Вт-Чт-Сб": [1, 3, 5],  # Вторник, Четверг, Суббота
-    "Ср-Пт-Вс": [2, 4, 6],  # Среда, Пятница, Воскресенье
-}
-
-# Типы тренировок по дням
-TRAINING_TYPES = ["День 1: Грудь, Плечи, Трицепс", "День 2: Спина, Бицепс", "День 3: Ноги и Кор"]
-
-
-def get_day_of_week():
-    """Возвращает текущий день недели (0=Понедельник, 6=Воскресенье)"""
-    return datetime.now().weekday()
-
-
-def is_training_day(training_days_str: str, today: int = None):
-    """Проверяет, является ли сегодня день тренировки"""
-    if today is None:
-        today = get_day_of_week()
-    
-    training_days = DAYS_MAPPING.get(training_days_str)
-    if training_days:
-        return today in training_days
-    return False
-
-
-def get_training_day_number(training_days_str: str, today: int = None):
-    """Возвращает номер дня тренировки (0, 1 или 2)"""
-    if today is None:
-        today = get_day_of_week()
-    
-    training_days = DAYS_MAPPING.get(training_days_str)
-    if training_days:
-        try:
-            return training_days.index(today)
-        except ValueError:
-            return None
-    return None
-
-
-async def check_training_completion(application):
-    """Проверяет выполнение тренировок в 23:00"""
-    sessions = get_all_active_training_sessions()
-    today = datetime.now().date()
-    today_str = today.strftime('%Y-%m-%d')
-    
-    for session in sessions:
-        user_id = session[1]
-        session_id = session[0]
-        training_days_str = session[3]
-        current_day = session[4]
-        completed_days = session[5]
-        
-        # Проверяем, является ли сегодня день тренировки
-        if not is_training_day(training_days_str):
-            continue
-        
-        # Проверяем, была ли уже создана запись о тренировке сегодня
-        existing_log = get_pending_training_check(user_id, today_str)
-        if existing_log:
-            continue
-        
-        # Определяем тип тренировки
-        training_day_num = get_training_day_number(training_days_str)
-        if training_day_num is None:
-            continue
-        
-        training_type = TRAINING_TYPES[training_day_num]
-        
-        # Создаем запись о тренировке
-        add_training_log(user_id, session_id, today_str, training_type, None)
-        
-        # Отправляем сообщение пользователю
-        keyboard = [
-            [KeyboardButton("✅ Да, выполнил"), KeyboardButton("❌ Нет, не выполнил")]
-        ]
-        reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-        
-        await application.bot.send_message(
-            chat_id=user_id,
-            text=f"🏋️ Выполнили ли вы тренировку сегодня?\n\n"
-                 f"Тренировка: {training_type}",
-            reply_markup=reply_markup
-        )
-
-
-async def check_training_completion_next_day(application):
-    """Проверяет выполнение тренировок на следующий день в 16:00"""
-    sessions = get_all_active_training_sessions()
-    yesterday = (datetime.now() - timedelta(days=1)).date()
-    yesterday_str = yesterday.strftime('%Y-%m-%d')
-    
-    for session in sessions:
-        user_id = session[1]
-        session_id = session[0]
-        training_days_str = session[3]
-        
-        # Проверяем, был ли вчера день тренировки
-        yesterday_weekday = yesterday.weekday()
-        if not is_training_day(training_days_str, yesterday_weekday):
-            continue
-        
-        # Проверяем, была ли уже проверка или ответ
-        pending_log = get_pending_training_check(user_id, yesterday_str)
-        if not pending_log:
-            continue
-        
-        # Отправляем напоминание
-        keyboard = [
-            [KeyboardButton("✅ Да, выполнил"), KeyboardButton("❌ Нет, не выполнил")]
-        ]
-        reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-        
-        await application.bot.send_message(
-            chat_id=user_id,
-            text=f"🏋️ Напоминание: выполнили ли вы тренировку вчера?\n\n"
-                 f"Тренировка: {pending_log[4]}",
-            reply_markup=reply_markup
-        )
+from utils.broadcast import broadcast
+from utils.intents import Intent, classify
+from utils.timezones import local_now
+
+
+logger = logging.getLogger(__name__)
+
+
+async def iter_due_checks(now, not_before=None):
+    """Создает проверки тренировки для сессий, у которых наступило время проверки, пачками"""
+    while True:
+        entries = await claim_due_training_checks(now, not_before)
+        for entry in entries:
+            if entry.id is not None:
+                yield entry
+        if not entries:
+            break
+
+
+async def iter_due_reminders(now, not_before=None):
+    """Сессии, у которых наступило время напоминания и проверка еще без ответа, пачками"""
+    while True:
+        entries = await claim_due_training_reminders(now, not_before)
+        for entry in entries:
+            if entry.training_type is not None:
+                yield entry
+        if not entries:
+            break
+
+
+async def deactivate_blocked_users(user_ids):
+    """on_blocked для рассылки: завершает сессии пользователей, заблокировавших бота"""
+    await deactivate_training_sessions(user_ids)
+
+
+async def process_reminder_slots(application, now=None, catch_up: bool = False, not_before=None):
+    """Обрабатывает минуту now: проверки для пользователей, у которых наступило местное время
+
+    Проверки, напоминания и сроки ответа выбираются из очередей по next_check_at /
+    next_reminder_at / expires_at; запланированные раньше not_before (долгий простой)
+    не отправляются.
+    catch_up=True - минута догоняется после простоя бота: вопросы и напоминания
+    отправляются, а сессии с истекшим сроком ответа не сбрасываются, так как
+    пользователи не успели ответить.
+    """
+    now = (now or datetime.now(dt_timezone.utc)).replace(second=0, microsecond=0)
+    await check_training_completion(application, now, not_before)
+    await check_training_completion_next_day(application, now, not_before)
+    if catch_up:
+        # Истекшие к этой минуте проверки снимаются с очереди без сброса сессий
+        not_before = now + timedelta(minutes=1)
+    await reset_unanswered_sessions(application, now, not_before)
+
+
+async def check_training_completion(application, now=None, not_before=None):
+    """Проверяет выполнение тренировок в 23:00 по местному времени"""
+    now = now or datetime.now(dt_timezone.utc)
+
+    keyboard = [
+        [KeyboardButton("✅ Да, выполнил"), KeyboardButton("❌ Нет, не выполнил")]
+    ]
+    reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+
+    # Только сессии, у которых наступило next_check_at: стоимость зависит от числа проверок, а не сессий
+    async def messages():
+        async for entry in iter_due_checks(now, not_before):
+            yield {
+                'chat_id': entry.user_id,
+                'text': f"🏋️ Выполнили ли вы тренировку сегодня?\n\n"
+                        f"Тренировка: {entry.training_type}",
+                'reply_markup': reply_markup,
+            }
+
+    await broadcast(application.bot, messages(), name='check_training_23',
+                    on_blocked=deactivate_blocked_users)
+
+
+async def check_training_completion_next_day(application, now=None, not_before=None):
+    """Проверяет выполнение тренировок на следующий день в 16:00 по местному времени"""
+    now = now or datetime.now(dt_timezone.utc)
+
+    keyboard = [
+        [KeyboardButton("✅ Да, выполнил"), KeyboardButton("❌ Нет, не выполнил")]
+    ]
+    reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+
+    # Тренировки вчерашнего дня, на которые еще нет ответа
+    async def messages():
+        async for entry in iter_due_reminders(now, not_before):
+            yield {
+                'chat_id': entry.user_id,
+                'text': f"🏋️ Напоминание: выполнили ли вы тренировку вчера?\n\n"
+                        f"Тренировка: {entry.training_type}",
+                'reply_markup': reply_markup,
+            }
+
+    await broadcast(application.bot, messages(), name='check_training_16',
+                    on_blocked=deactivate_blocked_users)
 
 
 async def handle_training_completion_response(update: Update, context: ContextTypes.DEFAULT_TYPE, completed: bool):
     """Обрабатывает ответ пользователя о выполнении тренировки"""
     user = update.message.from_user
-    text = update.message.text.lower()
     
     # Определяем дату тренировки
-    session = get_active_training_session(user.id)
+    session = await get_active_training_session(user.id)
     if not session:
         await update.message.reply_text("❌ Тренировочная сессия не найдена")
         return
     
-    # Ищем последнюю непроверенную тренировку
-    today = datetime.now().date()
+    # Ищем последнюю непроверенную тренировку (даты - по местному времени пользователя)
+    today = local_now(session.timezone).date()
     today_str = today.strftime('%Y-%m-%d')
     
-    pending_log = get_pending_training_check(user.id, today_str)
+    pending_log = await get_pending_training_check(user.id, today_str)
     if not pending_log:
         # Проверяем вчерашнюю тренировку
-        yesterday = (datetime.now() - timedelta(days=1)).date()
+        yesterday = today - timedelta(days=1)
         yesterday_str = yesterday.strftime('%Y-%m-%d')
-        pending_log = get_pending_training_check(user.id, yesterday_str)
+        pending_log = await get_pending_training_check(user.id, yesterday_str)
     
     if not pending_log:
         await update.message.reply_text("❌ Тренировка не найдена")
         return
     
-    session_id = session[0]
-    training_type = pending_log[4]
+    session_id = session.id
+    training_type = pending_log.training_type
     
     if completed:
         # Тренировка выполнена - спрашиваем о боли
@@ -179,7 +157,7 @@ async def handle_training_completion_response(update: Update, context: ContextTy
         )
         
         # Сохраняем в контексте для следующего шага
-        context.user_data['training_log_id'] = pending_log[0]
+        context.user_data['training_log_id'] = pending_log.id
         context.user_data['training_type'] = training_type
         context.user_data['session_id'] = session_id
     else:
@@ -187,24 +165,15 @@ async def handle_training_completion_response(update: Update, context: ContextTy
         await handle_training_postponement(update, context, session, training_type)
     
     # Обновляем запись в базе
-    import sqlite3
-    conn = sqlite3.connect('users.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-        UPDATE training_log 
-        SET completed = ? 
-        WHERE id = ?
-    ''', (completed, pending_log[0]))
-    conn.commit()
-    conn.close()
+    await update_training_log(pending_log.id, completed=completed)
 
 
 async def handle_training_postponement(update: Update, context: ContextTypes.DEFAULT_TYPE, session, training_type: str):
     """Обрабатывает перенос тренировки на следующий день"""
-    session_id = session[0]
-    training_days_str = session[3]
-    current_day = session[4]
-    completed_days = session[5]
+    session_id = session.id
+    training_days_str = session.training_days
+    current_day = session.current_day
+    completed_days = session.completed_days
     
     # Переносим тренировку на следующий день
     # Просто увеличиваем current_day, но не completed_days
@@ -218,8 +187,9 @@ async def handle_training_postponement(update: Update, context: ContextTypes.DEF
     )
 
 
-async def handle_pain_feedback(update: Update, context: ContextTypes.DEFAULT_TYPE, pain_type: str):
-    """Обрабатывает ответ о боли после тренировки"""
+async def handle_pain_feedback(update: Update, context: ContextTypes.DEFAULT_TYPE, pain_type: str,
+                               intent: Intent = None):
+    """Обрабатывает ответ о боли после тренировки (intent - classify(pain_type), если уже известен)"""
     user = update.message.from_user
     training_log_id = context.user_data.get('training_log_id')
     
@@ -228,7 +198,7 @@ async def handle_pain_feedback(update: Update, context: ContextTypes.DEFAULT_TYP
         return
     
     # Пока только "Здоров" работает
-    if pain_type.lower() != "здоров":
+    if (intent or classify(pain_type)) is not Intent.HEALTHY:
         await update.message.reply_text(
             "🚧 Функция адаптации тренировки под боль пока в разработке.\n"
             "Спасибо за информацию!"
@@ -238,23 +208,14 @@ async def handle_pain_feedback(update: Update, context: ContextTypes.DEFAULT_TYP
     # Если это скип дня, не обновляем базу логов
     if training_log_id != 'skip_day':
         # Обновляем запись в базе
-        import sqlite3
-        conn = sqlite3.connect('users.db')
-        cursor = conn.cursor()
-        cursor.execute('''
-            UPDATE training_log 
-            SET pain_feedback = ? 
-            WHERE id = ?
-        ''', (pain_type, training_log_id))
-        conn.commit()
-        conn.close()
+        await update_training_log(training_log_id, pain_feedback=pain_type)
     
     # Если это скип дня, счетчики уже обновлены, просто проверяем завершение недели
     if training_log_id == 'skip_day':
         session_id = context.user_data.get('session_id')
-        session = get_active_training_session(user.id)
+        session = await get_active_training_session(user.id)
         if session:
-            completed_days = session[5]
+            completed_days = session.completed_days
             
             # Проверяем, завершена ли неделя (3 тренировки подряд)
             if completed_days >= 3:
@@ -271,13 +232,13 @@ async def handle_pain_feedback(update: Update, context: ContextTypes.DEFAULT_TYP
     else:
         # Обычная тренировка - увеличиваем счетчики
         session_id = context.user_data.get('session_id')
-        session = get_active_training_session(user.id)
+        session = await get_active_training_session(user.id)
         if session:
-            completed_days = session[5]
-            current_day = session[4]
+            completed_days = session.completed_days
+            current_day = session.current_day
             
             # Увеличиваем completed_days если это новая тренировка
-            update_training_session(
+            await update_training_session(
                 session_id,
                 completed_days=completed_days + 1,
                 current_day=(current_day + 1) % 3
@@ -304,10 +265,10 @@ async def handle_pain_feedback(update: Update, context: ContextTypes.DEFAULT_TYP
 
 async def handle_week_completion(update: Update, context: ContextTypes.DEFAULT_TYPE, session):
     """Обрабатывает завершение недели тренировок"""
-    week_num = session[2]
-    session_id = session[0]
-    check01_passed = session[7]
-    check02_passed = session[8]
+    week_num = session.week_number
+    session_id = session.id
+    check01_passed = session.check01_passed
+    check02_passed = session.check02_passed
     
     await update.message.reply_text(
         f"🎉 Неделя {week_num} выполнена!\n\n"
@@ -352,9 +313,9 @@ async def handle_week_completion(update: Update, context: ContextTypes.DEFAULT_T
 
 async def handle_check_process(update: Update, context: ContextTypes.DEFAULT_TYPE, session):
     """Обрабатывает процесс чека после второй недели (check01 и check02)"""
-    session_id = session[0]
-    check01_passed = session[7]
-    check02_passed = session[8]
+    session_id = session.id
+    check01_passed = session.check01_passed
+    check02_passed = session.check02_passed
     
     if not check01_passed:
         # Показываем check01 (только после второй недели)
@@ -391,7 +352,7 @@ async def handle_check_process(update: Update, context: ContextTypes.DEFAULT_TYP
 
 async def handle_check02_weekly(update: Update, context: ContextTypes.DEFAULT_TYPE, session):
     """Обрабатывает check02 для недель после второй (check01 больше не спрашивается)"""
-    session_id = session[0]
+    session_id = session.id
     
     await update.message.reply_text(
         "📋 Чек-лист 2:\n\n"
@@ -410,16 +371,16 @@ async def handle_check_response(update: Update, context: ContextTypes.DEFAULT_TY
     
     if not session_id:
         # Если нет session_id в контексте, пытаемся получить из сессии
-        session = get_active_training_session(user.id)
+        session = await get_active_training_session(user.id)
         if session:
-            session_id = session[0]
+            session_id = session.id
         else:
             await update.message.reply_text("❌ Ошибка обработки")
             return
     
     if check_result:
         # check01 пройден - переходим к check02
-        update_training_session(session_id, check01_passed=True)
+        await update_training_session(session_id, check01_passed=True)
         
         # Переходим к check02
         await update.message.reply_text(
@@ -438,7 +399,7 @@ async def handle_check_response(update: Update, context: ContextTypes.DEFAULT_TY
         )
         
         # Сбрасываем счетчик выполненных дней
-        update_training_session(session_id, completed_days=0, current_day=0)
+        await update_training_session(session_id, completed_days=0, current_day=0)
         
         # Очищаем контекст
         context.user_data.pop('check_step', None)
@@ -452,26 +413,26 @@ async def handle_check02_response(update: Update, context: ContextTypes.DEFAULT_
     
     if not session_id:
         # Если нет session_id в контексте, пытаемся получить из сессии
-        session = get_active_training_session(user.id)
+        session = await get_active_training_session(user.id)
         if session:
-            session_id = session[0]
+            session_id = session.id
         else:
             await update.message.reply_text("❌ Ошибка обработки")
             return
     
     # Получаем текущую сессию для определения недели
-    session = get_active_training_session(user.id)
+    session = await get_active_training_session(user.id)
     if not session:
         await update.message.reply_text("❌ Сессия не найдена")
         return
     
-    week_num = session[2]
+    week_num = session.week_number
     
     # ВРЕМЕННАЯ ЗАПЛАТКА: принимаем любое значение (даже текст)
     calories_text = calories.strip()
     
     # check02 пройден
-    update_training_session(session_id, check02_passed=True)
+    await update_training_session(session_id, check02_passed=True)
     
     # Очищаем контекст
     context.user_data.pop('check_step', None)
@@ -489,25 +450,22 @@ async def handle_check02_response(update: Update, context: ContextTypes.DEFAULT_
     )
 
 
-async def reset_unanswered_sessions(application):
+async def reset_unanswered_sessions(application, now=None, not_before=None):
     """Сбрасывает сессии, на которые пользователь не ответил до конца следующего дня"""
-    from datetime import datetime, timedelta
-    sessions = get_all_active_training_sessions()
-    two_days_ago = (datetime.now() - timedelta(days=2)).date()
-    two_days_ago_str = two_days_ago.strftime('%Y-%m-%d')
-    
-    for session in sessions:
-        user_id = session[1]
-        session_id = session[0]
-        
-        # Проверяем, была ли тренировка 2 дня назад без ответа
-        pending_log = get_pending_training_check(user_id, two_days_ago_str)
-        if pending_log:
-            # Сбрасываем сессию
-            update_training_session(session_id, session_active=False)
-            
-            await application.bot.send_message(
-                chat_id=user_id,
-                text="⚠️ Тренировочная сессия сброшена из-за отсутствия ответа.\n\n"
-                     "Запустите новый тренировочный процесс через меню."
-            )
+    now = now or datetime.now(dt_timezone.utc)
+
+    # Сессии завершаются одним запросом; рассылка получает готовый список получателей
+    user_ids = await deactivate_unanswered_sessions(now, not_before)
+    if not user_ids:
+        return
+
+    messages = (
+        {
+            'chat_id': user_id,
+            'text': "⚠️ Тренировочная сессия сброшена из-за отсутствия ответа.\n\n"
+                    "Запустите новый тренировочный процесс через меню.",
+        }
+        for user_id in user_ids
+    )
+    await broadcast(application.bot, messages, name='reset_unanswered',
+                    on_blocked=deactivate_blocked_users)
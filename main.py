@@ -1,24 +1,30 @@
 import logging
 import os
-import asyncio
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.triggers.cron import CronTrigger
+from urllib.parse import urlparse
 
 from dotenv import load_dotenv
 load_dotenv()  # Загружает переменные из .env файла
 from telegram import Update, ReplyKeyboardMarkup, KeyboardButton
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
+from telegram.request import HTTPXRequest
 
 from database.DataBase import init_db, get_user_by_id
+from database.connection import close_all, get_manager
+from database.executor import shutdown_executor
+from database.persistence import SQLitePersistence
+from database.write_queue import enable_write_queue
 from anketa_launcher import register_anketa_handlers
 from handlers.navigation import show_menu, handle_navigation
 from handlers.training import register_training_handlers
+from handlers.settings import register_settings_handlers
+from handlers.jobs import start_scheduler, shutdown_scheduler
+from utils.broadcast import DEFAULT_CONCURRENCY as BROADCAST_CONCURRENCY
+from utils.intents import Intent, TRAINING_INTENTS, classify, classify_answer
+from utils.replies import BufferedApplication, BufferedBot
+from utils.update_processor import PerUserUpdateProcessor
 from handlers.training_check import (
-    check_training_completion, 
-    check_training_completion_next_day,
     handle_training_completion_response,
     handle_pain_feedback,
-    reset_unanswered_sessions,
     handle_check_response,
     handle_check02_response
 )
@@ -34,15 +40,36 @@ logger = logging.getLogger(__name__)
 # Получение токена из переменной окружения
 BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 
+# Адрес Bot API (например, локальный tools/fake_telegram.py: http://127.0.0.1:8081/bot)
+TELEGRAM_BASE_URL = os.getenv('TELEGRAM_BASE_URL', 'https://api.telegram.org/bot')
+
+# Получение update: polling (по умолчанию) или webhook
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+
+# Webhook: публичный адрес, который вызывает Telegram (путь адреса - путь локального сервера),
+# локальный адрес сервера, секрет заголовка X-Telegram-Bot-Api-Secret-Token и сколько
+# update Telegram доставляет одновременно
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8443'))
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET')
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', '40'))
+
+# Сколько update обрабатывается одновременно (update одного пользователя - всегда по порядку);
+# 1 - по одному, как раньше
+CONCURRENT_UPDATES = int(os.getenv('CONCURRENT_UPDATES', '1'))
+
+# Соединений с Bot API: ответы обработчиков, рассылки и запас для задач планировщика
+BOT_CONNECTION_POOL_SIZE = CONCURRENT_UPDATES + BROADCAST_CONCURRENCY + 8
+
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработчик команды /start - показывает главное меню"""
     return await show_menu(update, context)
 
 
-async def handle_training_response(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Обрабатывает ответы о выполнении тренировки и чеки"""
-    text = update.message.text.lower()
+async def handle_training_response(update: Update, context: ContextTypes.DEFAULT_TYPE, intent: Intent = None):
+    """Обрабатывает ответы о выполнении тренировки и чеки (intent - уже распознанный classify)"""
     check_step = context.user_data.get('check_step')
     
     # Обработка чека - проверяем ПЕРВЫМ, чтобы перехватить все сообщения
@@ -51,20 +78,22 @@ async def handle_training_response(update: Update, context: ContextTypes.DEFAULT
         await handle_check02_response(update, context, update.message.text)
         return None
     elif check_step == 'check01':
-        if "да" in text or "✅" in text:
+        answer = classify_answer(update.message.text)
+        if answer is Intent.YES:
             await handle_check_response(update, context, True)
-        elif "нет" in text or "❌" in text:
+        elif answer is Intent.NO:
             await handle_check_response(update, context, False)
         return None
     
     # Обработка ответов о тренировке
-    if "да, выполнил" in text or ("✅" in text and "да" in text):
+    if intent is None:
+        intent = classify(update.message.text)
+    if intent is Intent.TRAINING_DONE:
         await handle_training_completion_response(update, context, True)
-    elif "нет, не выполнил" in text or ("❌" in text and "нет" in text):
+    elif intent is Intent.TRAINING_MISSED:
         await handle_training_completion_response(update, context, False)
-    elif any(pain in text for pain in ["здоров", "болит рука", "болит спина", "болят ноги"]):
-        pain_type = update.message.text
-        await handle_pain_feedback(update, context, pain_type)
+    elif intent is Intent.HEALTHY or intent is Intent.PAIN:
+        await handle_pain_feedback(update, context, update.message.text, intent)
     else:
         # Если не распознано, отправляем в обычную навигацию
         return await handle_navigation(update, context)
@@ -72,18 +101,71 @@ async def handle_training_response(update: Update, context: ContextTypes.DEFAULT
     return None
 
 
+def run_application(application: Application):
+    """Запускает получение update в режиме BOT_MODE; обработчики в обоих режимах одни и те же"""
+    if BOT_MODE == 'polling':
+        application.run_polling()
+        return
+    if BOT_MODE != 'webhook':
+        raise ValueError(f"Неизвестный BOT_MODE: {BOT_MODE} (polling или webhook)")
+    if not WEBHOOK_URL or not WEBHOOK_SECRET:
+        raise ValueError("Для BOT_MODE=webhook задайте WEBHOOK_URL и WEBHOOK_SECRET")
+
+    # Запросы без правильного секрета сервер PTB отклоняет с кодом 403
+    application.run_webhook(
+        listen=WEBHOOK_LISTEN,
+        port=WEBHOOK_PORT,
+        url_path=urlparse(WEBHOOK_URL).path.lstrip('/'),
+        webhook_url=WEBHOOK_URL,
+        secret_token=WEBHOOK_SECRET,
+        max_connections=WEBHOOK_MAX_CONNECTIONS,
+    )
+
+
+async def on_shutdown(application: Application):
+    """Останавливает планировщик и поток базы данных, коммитит очередь записи и закрывает соединения"""
+    await shutdown_scheduler()
+    logger.info("Кэш активных сессий: %s", get_manager().session_cache.stats())
+    logger.info("Записей состояния бота в базу: %s", application.persistence.flushes)
+    shutdown_executor()
+    close_all()
+
+
 def main():
     # Проверка наличия токена
     if not BOT_TOKEN:
         raise ValueError("Токен бота не найден! Установите переменную окружения TELEGRAM_BOT_TOKEN")
 
     init_db()
-    application = Application.builder().token(BOT_TOKEN).build()
+    # Group commit для записей (DB_WRITE_QUEUE=1): записи объединяются в общие транзакции
+    if os.getenv('DB_WRITE_QUEUE') == '1':
+        enable_write_queue()
+    # Планировщик (задачи хранятся в базе) запускается в post_init, когда event loop уже создан.
+    # Ответы обработчика на один update отправляются одним сообщением (utils/replies.py).
+    # user_data и анкета /form сохраняются в базе и переживают перезапуск (database/persistence.py)
+    builder = (
+        Application.builder().bot(BufferedBot(
+            BOT_TOKEN,
+            base_url=TELEGRAM_BASE_URL,
+            # Готовый бот не получает настроек запросов билдера, поэтому пулы задаются здесь
+            request=HTTPXRequest(connection_pool_size=BOT_CONNECTION_POOL_SIZE),
+            get_updates_request=HTTPXRequest(),
+        ))
+        .application_class(BufferedApplication)
+        .persistence(SQLitePersistence())
+        .post_init(start_scheduler)
+        .post_shutdown(on_shutdown)
+    )
+    if CONCURRENT_UPDATES > 1:
+        # Разные пользователи - параллельно, update одного пользователя - по порядку
+        builder = builder.concurrent_updates(PerUserUpdateProcessor(CONCURRENT_UPDATES))
+    application = builder.build()
     
     # Добавляем обработчики
     application.add_handler(CommandHandler("start", start))
     register_anketa_handlers(application)
     register_training_handlers(application)
+    register_settings_handlers(application)
     
     # Добавляем универсальный обработчик для всех текстовых сообщений
     # Он проверяет наличие активных процессов (check_step, тренировки) и обрабатывает соответственно
@@ -96,9 +178,9 @@ def main():
             return await handle_training_response(update, context)
         
         # Проверяем, не является ли это ответом на тренировку или боль
-        text = update.message.text.lower()
-        if any(pattern in text for pattern in ["да, выполнил", "нет, не выполнил", "здоров", "болит рука", "болит спина", "болят ноги"]):
-            return await handle_training_response(update, context)
+        intent = classify(update.message.text)
+        if intent in TRAINING_INTENTS:
+            return await handle_training_response(update, context, intent)
         
         # Иначе передаем в обычную навигацию
         return await handle_navigation(update, context)
@@ -106,40 +188,9 @@ def main():
     # Добавляем универсальный обработчик для всех текстовых сообщений (включая числа)
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_all_messages))
     
-    # Настраиваем планировщик задач
-    scheduler = AsyncIOScheduler()
-    scheduler.add_job(
-        check_training_completion,
-        trigger=CronTrigger(hour=23, minute=0),
-        args=[application],
-        id='check_training_23',
-        replace_existing=True
-    )
-    scheduler.add_job(
-        check_training_completion_next_day,
-        trigger=CronTrigger(hour=16, minute=0),
-        args=[application],
-        id='check_training_16',
-        replace_existing=True
-    )
-    scheduler.add_job(
-        reset_unanswered_sessions,
-        trigger=CronTrigger(hour=23, minute=59),
-        args=[application],
-        id='reset_unanswered',
-        replace_existing=True
-    )
-    
-    print("Бот запущен...")
-    
-    # Запускаем планировщик после создания event loop
-    async def start_scheduler():
-        scheduler.start()
-    
-    # Добавляем задачу запуска планировщика
-    application.job_queue.run_once(lambda context: asyncio.create_task(start_scheduler()), when=1)
+    print(f"Бот запущен ({BOT_MODE})...")
     
-    application.run_polling()
+    run_application(application)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,130 @@
+"""
+Бенчмарк задержки обработчиков при конкурентной нагрузке: синхронные вызовы
+database.DataBase прямо в event loop против database.async_db.
+
+Запуск: python -m tools.bench_db --rate 400 --duration 5
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from database import DataBase, async_db
+from database.connection import configure, close_all
+from database.executor import run_db, shutdown_executor
+
+
+# Искусственная задержка записи (имитация медленного fsync), задается через --write-delay
+WRITE_DELAY = 0.0
+
+
+def slow_update_training_session(*args, **kwargs):
+    if WRITE_DELAY:
+        time.sleep(WRITE_DELAY)
+    return DataBase.update_training_session(*args, **kwargs)
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def seed(users: int):
+    """Заполняет базу пользователями с активными сессиями и записями лога"""
+    for user_id in range(1, users + 1):
+        DataBase.save_user_to_db({
+            'user_id': user_id, 'username': f'user{user_id}', 'height': 180, 'weight': 80,
+            'activity_level': 'Средняя', 'gender': 'Мужской', 'years_experience': 30,
+            'brm': 2500, 'goal': 'дефицит'
+        })
+        session_id = DataBase.create_training_session(user_id, 1, 'Пн-Ср-Пт')
+        DataBase.add_training_log(user_id, session_id, '2024-01-01', 'День 1: Грудь, Плечи, Трицепс', None)
+
+
+async def pain_feedback_sync(user_id: int):
+    # Повторяет обращения к базе из handle_pain_feedback
+    session = DataBase.get_active_training_session(user_id)
+    slow_update_training_session(session.id, completed_days=session.completed_days, current_day=session.current_day)
+    DataBase.get_pending_training_check(user_id, '2024-01-01')
+    DataBase.get_active_training_session(user_id)
+
+
+async def pain_feedback_async(user_id: int):
+    session = await async_db.get_active_training_session(user_id)
+    await run_db(slow_update_training_session, session.id, completed_days=session.completed_days, current_day=session.current_day)
+    await async_db.get_pending_training_check(user_id, '2024-01-01')
+    await async_db.get_active_training_session(user_id)
+
+
+async def navigation():
+    # Обработчик без обращений к базе (например, переход по меню)
+    await asyncio.sleep(0)
+
+
+async def run_load(handler, rate: int, duration: float, users: int):
+    """Подает обновления с постоянной частотой и измеряет задержку от поступления до завершения"""
+    latencies = {'db': [], 'nav': []}
+    tasks = []
+    rng = random.Random(42)
+
+    async def process(kind, arrival, user_id):
+        if kind == 'db':
+            await handler(user_id)
+        else:
+            await navigation()
+        latencies[kind].append(time.perf_counter() - arrival)
+
+    start = time.perf_counter()
+    total = int(rate * duration)
+    for i in range(total):
+        arrival = start + i / rate
+        delay = arrival - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        kind = 'db' if rng.random() < 0.5 else 'nav'
+        tasks.append(asyncio.create_task(process(kind, arrival, rng.randint(1, users))))
+    await asyncio.gather(*tasks)
+    return latencies, time.perf_counter() - start
+
+
+def report(name, latencies, elapsed):
+    total = sum(len(v) for v in latencies.values())
+    print(f"{name}: {total} обновлений за {elapsed:.2f} с ({total / elapsed:.0f} обн/с)")
+    for kind, values in latencies.items():
+        ms = [v * 1000 for v in values]
+        print(f"  {kind:4} p50={percentile(ms, 50):8.2f} мс  p95={percentile(ms, 95):8.2f} мс  "
+              f"p99={percentile(ms, 99):8.2f} мс")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rate', type=int, default=400, help='обновлений в секунду')
+    parser.add_argument('--duration', type=float, default=5.0, help='длительность каждого прогона, с')
+    parser.add_argument('--users', type=int, default=1000, help='количество пользователей в базе')
+    parser.add_argument('--write-delay', type=float, default=0.0,
+                        help='искусственная задержка каждой записи, мс (имитация медленного диска)')
+    args = parser.parse_args()
+
+    global WRITE_DELAY
+    WRITE_DELAY = args.write_delay / 1000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        configure(os.path.join(tmp, 'bench.db'))
+        DataBase.init_db()
+        seed(args.users)
+
+        for name, handler in (('sync', pain_feedback_sync), ('async', pain_feedback_async)):
+            latencies, elapsed = asyncio.run(run_load(handler, args.rate, args.duration, args.users))
+            report(name, latencies, elapsed)
+
+        shutdown_executor()
+        close_all()
+
+
+if __name__ == '__main__':
+    main()
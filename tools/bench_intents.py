@@ -0,0 +1,67 @@
+"""
+Микробенчмарк распознавания ответов: utils.intents.classify против прежних
+проверок подстрок в main.py (any(pattern in text ...) и цепочка if/elif).
+
+Запуск: python -m tools.bench_intents --messages 200000
+"""
+import argparse
+import random
+import time
+
+from utils.intents import Intent, classify
+
+
+# Сообщения, которые приходят в handle_all_messages: кнопки меню и ответы, свободный текст
+MESSAGES = (
+    'main', 'questionnaire', 'training process', 'goal & diet', '📋 Упражнения дня', '📊 Статус',
+    '✅ Я выполнил тренировку', '🏠 Главное меню', '➡️ Следующая неделя', '🧠 Техника', 'руки',
+    '✅ Да, выполнил', '❌ Нет, не выполнил', 'Здоров', 'Болит рука', 'Болит спина', 'Болят ноги',
+    '2500', '180', 'Средняя', 'Мужской', 'привет, когда следующая тренировка?',
+    'сегодня не получилось, болит спина после вчерашнего',
+)
+
+TRAINING_PATTERNS = ["да, выполнил", "нет, не выполнил", "здоров", "болит рука", "болит спина", "болят ноги"]
+PAIN_PATTERNS = ["здоров", "болит рука", "болит спина", "болят ноги"]
+
+
+def classify_substrings(text: str) -> Intent:
+    """Прежние проверки handle_all_messages и handle_training_response"""
+    text = text.lower()
+    if not any(pattern in text for pattern in TRAINING_PATTERNS):
+        return Intent.NONE
+    if "да, выполнил" in text or ("✅" in text and "да" in text):
+        return Intent.TRAINING_DONE
+    if "нет, не выполнил" in text or ("❌" in text and "нет" in text):
+        return Intent.TRAINING_MISSED
+    if any(pain in text for pain in PAIN_PATTERNS):
+        return Intent.HEALTHY if text == "здоров" else Intent.PAIN
+    return Intent.NONE
+
+
+def run(func, messages) -> float:
+    started = time.perf_counter()
+    for message in messages:
+        func(message)
+    return len(messages) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=200_000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    messages = [rng.choice(MESSAGES) for _ in range(args.messages)]
+
+    mismatches = [message for message in MESSAGES if classify(message) is not classify_substrings(message)]
+    if mismatches:
+        raise SystemExit(f"Результаты различаются: {mismatches}")
+
+    for name, func in (('substrings', classify_substrings), ('classify', classify)):
+        run(func, messages[:1000])  # прогрев
+        print(f"{name:<12} {run(func, messages):>12,.0f} сообщений/с")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+"""
+Регрессионная проверка планов запросов database.DataBase.
+
+Вызывает каждую функцию модуля на временной базе с тестовыми данными,
+перехватывает все выполненные SQL-запросы и прогоняет их через
+EXPLAIN QUERY PLAN. Проверка падает (код выхода 1), если запрос
+сканирует таблицу целиком (SCAN без индекса), сортирует результат во
+временном B-дереве (USE TEMP B-TREE) или если функция модуля не
+покрыта списком CALLS.
+
+Запуск: python -m tools.check_query_plans
+"""
+import inspect
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime, timezone
+
+from database import DataBase
+from database.connection import configure, close_all
+
+
+# Строки плана, которые считаются регрессией
+FORBIDDEN_PLAN = [
+    re.compile(r'^SCAN (\w+)$'),                 # полный проход по таблице без индекса
+    re.compile(r'^SCAN (\w+) USING ROWID'),      # проход по rowid без ограничения
+    re.compile(r'USE TEMP B-TREE'),              # сортировка/группировка во временном дереве
+]
+
+# Служебные запросы, у которых нет плана
+SKIPPED_STATEMENTS = re.compile(
+    r'^\s*(BEGIN|COMMIT|ROLLBACK|SAVEPOINT|RELEASE|PRAGMA|CREATE|DROP|ANALYZE)\b', re.IGNORECASE
+)
+
+# Допустимые исключения: {(имя функции, строка плана): причина}. Разрешена только
+# указанная строка - любая другая запрещенная строка плана той же функции - регрессия
+ALLOWED = {
+    ('backfill_user_latest', 'SCAN u1'): 'однократный перенос всей таблицы users',
+    ('get_user_form_history', 'USE TEMP B-TREE FOR ORDER BY'):
+        'оконная функция сортирует только строки страницы (не больше limit + 1)',
+}
+
+# Момент, к которому наступили все запланированные проверки, напоминания и сроки ответа
+DUE_NOW = datetime(2100, 1, 1, tzinfo=timezone.utc)
+
+SAMPLE_USER = {
+    'user_id': 1, 'username': 'user1', 'height': 180, 'weight': 80,
+    'activity_level': 'Средняя', 'gender': 'Мужской', 'years_experience': 30,
+    'brm': 2500, 'goal': 'дефицит'
+}
+
+# Вызовы всех функций DataBase.py: (имя функции, аргументы, именованные аргументы).
+# Функции с несколькими вариантами запроса перечислены несколько раз.
+CALLS = [
+    ('save_user_to_db', (SAMPLE_USER,), {}),
+    ('get_all_users', (), {}),
+    ('get_user_by_id', (1,), {}),
+    ('get_user_form_history', (1,), {}),
+    ('get_user_form_history', (1,), {'after_id': 1}),
+    ('get_user_form_history', (1,), {'before_id': 1}),
+    ('has_user_forms', (1,), {}),
+    ('get_user_first_form', (1,), {}),
+    ('create_training_session', (1, 1, 'Пн-Ср-Пт'), {}),
+    ('get_active_training_session', (1,), {}),
+    ('update_training_session', (1,), {'current_day': 1, 'completed_days': 1}),
+    ('add_training_log', (1, 1, '2024-01-01', 'День 1: Грудь, Плечи, Трицепс', None), {}),
+    ('update_training_log', (1,), {'completed': True}),
+    ('update_training_log', (1,), {'pain_feedback': 'Здоров'}),
+    ('get_training_log', (1,), {}),
+    ('get_training_log', (1,), {'session_id': 1}),
+    ('get_pending_training_check', (1, '2024-01-01'), {}),
+    ('claim_due_training_checks', (DUE_NOW,), {}),
+    ('claim_due_training_reminders', (DUE_NOW,), {}),
+    ('set_user_settings', (1, 'Asia/Tokyo', -60), {}),
+    ('get_user_settings', (1,), {}),
+    ('set_scheduler_state', ('reminder_slots', '2024-01-01T00:00:00+00:00'), {}),
+    ('get_scheduler_state', ('reminder_slots',), {}),
+    ('save_persisted_state', ({1: '{"check_step": "check01"}', 2: None}, {('anketa', '[1, 1]'): '0'}), {}),
+    ('save_persisted_state', ({}, {('anketa', '[1, 1]'): None}), {}),
+    ('get_persisted_user_data', (1,), {}),
+    ('get_persisted_conversations', ('anketa',), {}),
+    ('acquire_lease', ('scheduler', 'host:1', 30), {}),
+    ('release_lease', ('scheduler', 'host:1'), {}),
+    ('begin_job_run', ('reminder_slots', '2024-01-01T00:00:00+00:00', 'host:1', 'scheduler'), {}),
+    ('begin_job_run', ('reminder_slots', '2024-01-01T00:00:00+00:00', 'host:2', 'scheduler'), {}),
+    ('finish_job_run', ('reminder_slots', '2024-01-01T00:00:00+00:00'), {}),
+    ('purge_job_runs', (0,), {}),
+    ('advance_to_next_week', (1,), {}),
+    ('deactivate_training_sessions', ([4, 5],), {}),
+    ('deactivate_unanswered_sessions', (DUE_NOW,), {}),
+    ('delete_last_user_form', (1,), {}),
+    ('delete_all_user_forms', (1,), {}),
+    ('backfill_user_latest', (), {}),
+]
+
+# Функции, которые не выполняют запросов к данным
+NOT_QUERIES = {'init_db', 'create_indexes', 'create_triggers'}
+
+
+def seed():
+    """Несколько пользователей с анкетами, сессиями и логом, чтобы планы были реалистичными"""
+    for user_id in range(1, 6):
+        for weight in (80, 79, 78):
+            DataBase.save_user_to_db(dict(SAMPLE_USER, user_id=user_id, weight=weight))
+        session_id = DataBase.create_training_session(user_id, 1, 'Пн-Ср-Пт')
+        DataBase.add_training_log(user_id, session_id, '2024-01-01', 'День 1: Грудь, Плечи, Трицепс', None)
+        DataBase.add_training_log(user_id, session_id, '2024-01-03', 'День 2: Спина, Бицепс', True)
+
+
+def module_functions():
+    return {
+        name for name, func in inspect.getmembers(DataBase, inspect.isfunction)
+        if func.__module__ == DataBase.__name__ and not name.startswith('_')
+    }
+
+
+def explain(conn, sql):
+    return [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql)]
+
+
+def check(db_path: str):
+    problems = []
+
+    missing = module_functions() - NOT_QUERIES - {name for name, _, _ in CALLS}
+    for name in sorted(missing):
+        problems.append(f"{name}: функция не покрыта списком CALLS")
+
+    statements = []
+    manager = configure(db_path)
+    manager.set_trace_callback(statements.append)
+    DataBase.init_db(db_path)
+    seed()
+
+    explain_conn = sqlite3.connect(db_path)
+    checked = 0
+    for name, args, kwargs in CALLS:
+        statements.clear()
+        # Кэш активных сессий скрыл бы запрос - каждый вызов идет в базу
+        manager.session_cache.clear()
+        getattr(DataBase, name)(*args, **kwargs)
+        # Запросы из триггеров трассируются текстом исходного запроса - убираем повторы
+        for sql in dict.fromkeys(statements):
+            if SKIPPED_STATEMENTS.match(sql):
+                continue
+            checked += 1
+            plan = explain(explain_conn, sql)
+            bad = [
+                line for line in plan
+                if any(p.search(line) for p in FORBIDDEN_PLAN) and (name, line) not in ALLOWED
+            ]
+            status = 'OK '
+            if bad:
+                status = 'ERR'
+                problems.append(f"{name}: {'; '.join(bad)}\n    {' '.join(sql.split())}")
+            print(f"[{status}] {name}: {' | '.join(plan) or '(нет плана)'}")
+    explain_conn.close()
+    close_all()
+    return checked, problems
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        checked, problems = check(os.path.join(tmp, 'plans.db'))
+
+    print(f"\nПроверено запросов: {checked}")
+    if problems:
+        print(f"Найдено проблем: {len(problems)}")
+        for problem in problems:
+            print(f"  - {problem}")
+        sys.exit(1)
+    print("Все запросы используют индексы")
+
+
+if __name__ == '__main__':
+    main()
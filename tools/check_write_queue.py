@@ -0,0 +1,78 @@
+"""
+Проверка очереди group commit (database.write_queue) при ошибке транзакции.
+
+Если пачку не удалось закоммитить (BEGIN IMMEDIATE не получил блокировку,
+ошибка COMMIT), каждая операция пачки должна завершиться ошибкой - иначе
+submit_write ждет ее результата вечно и занимает поток базы данных.
+Проверка падает (код выхода 1), если хотя бы одна Future осталась незавершенной.
+
+Запуск: python -m tools.check_write_queue
+"""
+import logging
+import sqlite3
+import sys
+import threading
+from concurrent.futures import wait
+from contextlib import contextmanager
+
+from database.write_queue import WriteQueue
+
+
+# Операций в проверяемой пачке
+OPERATIONS = 50
+
+# Сколько ждать завершения всех Future, с
+TIMEOUT = 5.0
+
+
+class FailingManager:
+    """ConnectionManager, транзакция которого падает на BEGIN или на COMMIT"""
+
+    def __init__(self, fail_on: str):
+        self.fail_on = fail_on
+        self.conn = sqlite3.connect(':memory:', isolation_level=None, check_same_thread=False)
+        # Пачка собирается, пока первая операция ждет транзакции
+        self.release = threading.Event()
+
+    @contextmanager
+    def writer(self):
+        self.release.wait()
+        if self.fail_on == 'begin':
+            raise sqlite3.OperationalError('database is locked')
+        self.conn.execute('BEGIN IMMEDIATE')
+        yield self.conn
+        self.conn.execute('ROLLBACK')
+        raise sqlite3.OperationalError('disk I/O error')
+
+
+def check(fail_on: str) -> list:
+    manager = FailingManager(fail_on)
+    write_queue = WriteQueue(manager, flush_interval=0.05, max_batch=OPERATIONS)
+    futures = [write_queue.submit(lambda conn: conn.execute('SELECT 1').fetchone()) for _ in range(OPERATIONS)]
+    manager.release.set()
+    done, not_done = wait(futures, TIMEOUT)
+    write_queue.close()
+
+    problems = []
+    if not_done:
+        problems.append(f"{fail_on}: не завершены {len(not_done)} из {OPERATIONS} операций")
+    succeeded = [future for future in done if future.exception() is None]
+    if succeeded:
+        problems.append(f"{fail_on}: {len(succeeded)} операций считаются записанными без коммита")
+    print(f"[{'ERR' if problems else 'OK '}] ошибка {fail_on}: завершено {len(done)} из {OPERATIONS}")
+    return problems
+
+
+def main():
+    # Ошибки коммита здесь ожидаемые - очередь пишет их в лог с traceback
+    logging.getLogger('database.write_queue').setLevel(logging.CRITICAL)
+    problems = check('begin') + check('commit')
+    if problems:
+        for problem in problems:
+            print(f"  - {problem}")
+        sys.exit(1)
+    print("Все операции неудачных пачек завершены ошибкой")
+
+
+if __name__ == '__main__':
+    main()
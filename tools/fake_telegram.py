@@ -0,0 +1,384 @@
+"""
+Локальная замена Telegram Bot API для нагрузочных тестов без сети.
+
+Сервер отвечает на getMe, getUpdates (long polling), sendMessage,
+editMessageText, answerCallbackQuery и служебные вызовы run_polling
+(deleteWebhook, close, ...), отдает боту синтетические update с заданной
+частотой, может задерживать ответы (--latency) и отвечать 429 RetryAfter
+(--flood-rate). Все обращения бота записываются (--record, JSON Lines).
+
+После setWebhook (BOT_MODE=webhook) update не ждут getUpdates, а отправляются
+POST-запросом на адрес webhook с секретом в X-Telegram-Bot-Api-Secret-Token,
+не больше max_connections одновременно - как это делает Telegram.
+
+Запуск:
+    python -m tools.fake_telegram --port 8081 --rate 50 --users 100 --duration 60
+    TELEGRAM_BASE_URL=http://127.0.0.1:8081/bot TELEGRAM_BOT_TOKEN=1:fake python main.py
+"""
+import argparse
+import itertools
+import json
+import logging
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+
+logger = logging.getLogger(__name__)
+
+BOT_USER = {'id': 1, 'is_bot': True, 'first_name': 'FakeBot', 'username': 'fake_bot',
+            'can_join_groups': False, 'can_read_all_group_messages': False, 'supports_inline_queries': False}
+
+# Тексты синтетических сообщений по умолчанию (команды и кнопки главного меню)
+DEFAULT_TEXTS = ('/start', 'main', 'questionnaire', 'training process', 'main menu')
+
+# Вызовы, которые сервер принимает без побочных эффектов (нужны run_polling / initialize)
+SERVICE_METHODS = {'close', 'logOut', 'setMyCommands', 'deleteMyCommands'}
+
+# Попытки доставки update на webhook (сервер бота может еще запускаться)
+WEBHOOK_ATTEMPTS = 20
+WEBHOOK_RETRY_DELAY = 0.1
+
+# Вызовы, которые могут получить 429 при --flood-rate
+FLOOD_METHODS = {'sendMessage', 'editMessageText', 'answerCallbackQuery'}
+
+
+class ApiError(Exception):
+    def __init__(self, code: int, description: str, parameters: dict = None):
+        super().__init__(description)
+        self.code = code
+        self.description = description
+        self.parameters = parameters
+
+
+class FakeTelegram:
+    """Состояние сервера: очередь update, сообщения бота и журнал вызовов"""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, flood_rate: float = 0.0,
+                 retry_after: int = 1, record_path: str = None, seed: int = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.flood_rate = flood_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+
+        self.updates = []
+        self.update_ids = itertools.count(1)
+        self.message_ids = itertools.count(1)
+        self.callback_ids = itertools.count(1)
+        self.condition = threading.Condition()
+
+        self.webhook = None
+        self._delivery = None
+
+        self.calls = []
+        self.listeners = []
+        self._record = open(record_path, 'a', encoding='utf-8') if record_path else None
+        self._record_lock = threading.Lock()
+
+    # Синтетические update
+
+    def _push(self, update: dict) -> dict:
+        with self.condition:
+            update['update_id'] = next(self.update_ids)
+            if self.webhook is not None:
+                self._delivery.submit(self.deliver, self.webhook, update)
+            else:
+                self.updates.append(update)
+                self.condition.notify_all()
+        return update
+
+    @staticmethod
+    def _user(user_id: int) -> dict:
+        return {'id': user_id, 'is_bot': False, 'first_name': f'User{user_id}', 'username': f'user{user_id}',
+                'language_code': 'ru'}
+
+    def inject_message(self, user_id: int, text: str) -> dict:
+        """Добавляет в очередь сообщение пользователя user_id (команды размечаются как bot_command)"""
+        message = {
+            'message_id': next(self.message_ids),
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private', 'first_name': f'User{user_id}'},
+            'from': self._user(user_id),
+            'text': text,
+        }
+        if text.startswith('/'):
+            message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+        return self._push({'message': message})
+
+    def inject_callback(self, user_id: int, data: str, message: dict = None) -> dict:
+        """Добавляет в очередь нажатие inline-кнопки data; message - сообщение бота с кнопкой"""
+        callback = {
+            'id': str(next(self.callback_ids)),
+            'from': self._user(user_id),
+            'chat_instance': str(user_id),
+            'data': data,
+        }
+        if message is not None:
+            callback['message'] = message
+        return self._push({'callback_query': callback})
+
+    def pending_updates(self) -> int:
+        with self.condition:
+            return len(self.updates)
+
+    # Webhook
+
+    def set_webhook(self, params: dict) -> None:
+        with self.condition:
+            if self._delivery is not None:
+                self._delivery.shutdown(wait=False)
+            self.webhook = {'url': params['url'], 'secret_token': params.get('secret_token')}
+            self._delivery = ThreadPoolExecutor(int(params.get('max_connections') or 40),
+                                                thread_name_prefix='fake-telegram-webhook')
+            # Накопленные update Telegram тоже доставляет на webhook
+            pending, self.updates = self.updates, []
+            for update in pending:
+                self._delivery.submit(self.deliver, self.webhook, update)
+
+    def delete_webhook(self) -> None:
+        with self.condition:
+            if self._delivery is not None:
+                self._delivery.shutdown(wait=False)
+            self.webhook = None
+            self._delivery = None
+
+    def deliver(self, webhook: dict, update: dict) -> None:
+        """Отправляет update на webhook (поток доставки)"""
+        started = time.perf_counter()
+        request = urllib.request.Request(webhook['url'], data=json.dumps(update).encode('utf-8'), method='POST')
+        request.add_header('Content-Type', 'application/json')
+        if webhook['secret_token']:
+            request.add_header('X-Telegram-Bot-Api-Secret-Token', webhook['secret_token'])
+        status = None
+        for _ in range(WEBHOOK_ATTEMPTS):
+            try:
+                with urllib.request.urlopen(request, timeout=30) as response:
+                    status = response.status
+                break
+            except urllib.error.HTTPError as error:
+                status = error.code
+                break
+            except OSError:
+                time.sleep(WEBHOOK_RETRY_DELAY)
+        self.record('webhook', {'update_id': update['update_id']}, status, started)
+
+    # Методы Bot API
+
+    def get_updates(self, params: dict) -> list:
+        offset = int(params.get('offset') or 0)
+        limit = int(params.get('limit') or 100)
+        timeout = float(params.get('timeout') or 0)
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            # offset подтверждает все update с меньшим id
+            self.updates = [update for update in self.updates if update['update_id'] >= offset]
+            while not self.updates:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.condition.wait(remaining)
+            return self.updates[:limit]
+
+    def _bot_message(self, params: dict, message_id: int = None) -> dict:
+        chat_id = int(params['chat_id'])
+        message = {
+            'message_id': message_id or next(self.message_ids),
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private', 'first_name': f'User{chat_id}'},
+            'from': BOT_USER,
+            'text': params.get('text', ''),
+        }
+        if isinstance(params.get('reply_markup'), dict) and 'inline_keyboard' in params['reply_markup']:
+            message['reply_markup'] = params['reply_markup']
+        return message
+
+    def call(self, method: str, params: dict):
+        """Выполняет метод Bot API; ошибки - ApiError"""
+        if method == 'getUpdates':
+            if self.webhook is not None:
+                raise ApiError(409, "Conflict: can't use getUpdates method while webhook is active; "
+                                    "use deleteWebhook to delete the webhook first")
+            return self.get_updates(params)
+
+        if self.latency or self.jitter:
+            time.sleep(self.latency + self.random.uniform(0, self.jitter))
+        if method in FLOOD_METHODS and self.flood_rate and self.random.random() < self.flood_rate:
+            raise ApiError(429, f"Too Many Requests: retry after {self.retry_after}",
+                           {'retry_after': self.retry_after})
+
+        if method == 'getMe':
+            return BOT_USER
+        if method == 'sendMessage':
+            return self._bot_message(params)
+        if method == 'editMessageText':
+            if 'inline_message_id' in params:
+                return True
+            return self._bot_message(params, int(params['message_id']))
+        if method == 'setWebhook':
+            self.set_webhook(params)
+            return True
+        if method == 'deleteWebhook':
+            self.delete_webhook()
+            return True
+        if method == 'answerCallbackQuery' or method in SERVICE_METHODS:
+            return True
+        raise ApiError(404, 'Not Found')
+
+    def record(self, method: str, params: dict, status: int, started: float, result=None) -> None:
+        entry = {
+            'time': time.time(), 'method': method, 'params': params,
+            'status': status, 'duration': time.perf_counter() - started,
+        }
+        if isinstance(result, dict) and 'message_id' in result:
+            entry['message_id'] = result['message_id']
+        with self._record_lock:
+            self.calls.append(entry)
+            if self._record is not None:
+                self._record.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                self._record.flush()
+        for listener in self.listeners:
+            listener(entry)
+
+    def close(self) -> None:
+        self.delete_webhook()
+        if self._record is not None:
+            self._record.close()
+            self._record = None
+
+
+def parse_params(content_type: str, body: bytes) -> dict:
+    """Параметры запроса: JSON или форма, в которой PTB кодирует не строковые значения в JSON"""
+    if not body:
+        return {}
+    if content_type.startswith('application/json'):
+        return json.loads(body)
+    params = {}
+    for name, value in parse_qsl(body.decode('utf-8'), keep_blank_values=True):
+        try:
+            params[name] = json.loads(value)
+        except ValueError:
+            params[name] = value
+    return params
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    server_version = 'FakeTelegram/1.0'
+    protocol_version = 'HTTP/1.1'
+    # Заголовки и тело уходят отдельными write: без TCP_NODELAY ответ ждет delayed ACK (~40 мс)
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+    def _reply(self, status: int, payload: dict) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self) -> None:
+        started = time.perf_counter()
+        # Путь /bot<token>/<method>
+        method = self.path.split('?', 1)[0].rstrip('/').rsplit('/', 1)[-1]
+        length = int(self.headers.get('Content-Length') or 0)
+        params = parse_params(self.headers.get('Content-Type', ''), self.rfile.read(length))
+
+        fake = self.server.fake
+        result = None
+        try:
+            result = fake.call(method, params)
+        except ApiError as error:
+            payload = {'ok': False, 'error_code': error.code, 'description': error.description}
+            if error.parameters:
+                payload['parameters'] = error.parameters
+            status = error.code
+        else:
+            payload = {'ok': True, 'result': result}
+            status = 200
+        self._reply(status, payload)
+        fake.record(method, params, status, started, result)
+
+    do_GET = _handle
+    do_POST = _handle
+
+
+def start_server(fake: FakeTelegram, host: str = '127.0.0.1', port: int = 8081) -> ThreadingHTTPServer:
+    """Запускает сервер в фоновом потоке; base_url бота - http://host:port/bot"""
+    server = ThreadingHTTPServer((host, port), ApiHandler)
+    server.daemon_threads = True
+    server.fake = fake
+    threading.Thread(target=server.serve_forever, name='fake-telegram', daemon=True).start()
+    return server
+
+
+def run_injector(fake: FakeTelegram, rate: float, users: int, texts=DEFAULT_TEXTS,
+                 duration: float = None, stop: threading.Event = None) -> int:
+    """Отдает rate сообщений в секунду от users пользователей по кругу texts; возвращает число update"""
+    stop = stop or threading.Event()
+    position = {}
+    interval = 1.0 / rate
+    started = time.monotonic()
+    sent = 0
+    while not stop.is_set() and (duration is None or time.monotonic() - started < duration):
+        user_id = fake.random.randint(1, users)
+        step = position.get(user_id, 0)
+        position[user_id] = step + 1
+        fake.inject_message(user_id, texts[step % len(texts)])
+        sent += 1
+        # Равномерный темп без накопления ошибки sleep
+        delay = started + sent * interval - time.monotonic()
+        if delay > 0:
+            stop.wait(delay)
+    return sent
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--rate', type=float, default=0, help='синтетических сообщений в секунду (0 - не отправлять)')
+    parser.add_argument('--users', type=int, default=100, help='число пользователей, от которых идут сообщения')
+    parser.add_argument('--duration', type=float, default=None, help='длительность отправки, с')
+    parser.add_argument('--text', action='append', dest='texts', help='текст сообщения (можно несколько)')
+    parser.add_argument('--latency', type=float, default=0.0, help='задержка ответа на вызов, с')
+    parser.add_argument('--jitter', type=float, default=0.0, help='случайная добавка к задержке, до N с')
+    parser.add_argument('--flood-rate', type=float, default=0.0, help='доля вызовов с ответом 429')
+    parser.add_argument('--retry-after', type=int, default=1, help='retry_after в ответе 429, с')
+    parser.add_argument('--record', help='файл журнала вызовов (JSON Lines)')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+    fake = FakeTelegram(latency=args.latency, jitter=args.jitter, flood_rate=args.flood_rate,
+                        retry_after=args.retry_after, record_path=args.record, seed=args.seed)
+    server = start_server(fake, args.host, args.port)
+    print(f"Bot API: http://{args.host}:{args.port}/bot (TELEGRAM_BASE_URL)")
+
+    try:
+        if args.rate > 0:
+            sent = run_injector(fake, args.rate, args.users, tuple(args.texts or DEFAULT_TEXTS), args.duration)
+            print(f"Отправлено update: {sent}")
+        # Сервер работает, пока бот не заберет очередь и не будет прерван (Ctrl+C)
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        fake.close()
+        counts = {}
+        for call in fake.calls:
+            counts[call['method']] = counts.get(call['method'], 0) + 1
+        print(f"Вызовов Bot API: {len(fake.calls)} {counts}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,318 @@
+"""
+Нагрузочный тест полного пути пользователя через локальный Bot API (tools/fake_telegram.py).
+
+Запускает main.py с TELEGRAM_BASE_URL на локальный сервер и временной базой,
+затем N виртуальных пользователей одновременно проходят сценарий: /start, main,
+questionnaire, /form (все шесть шагов), training process, выбор дней (callback),
+две недели тренировок (✅ Я выполнил тренировку, Здоров), переход на следующую
+неделю и ответы на check01 / check02. Каждый шаг ждет ответа бота, время ответа
+учитывается по обработчику шага.
+
+Отчет: update в секунду и p50/p95/p99 по обработчикам; --output сохраняет
+результат в JSON, --baseline сравнивает p95 с результатом прошлого запуска.
+--mode webhook запускает бота с BOT_MODE=webhook: update доставляются POST-запросами
+на его сервер, и задержки можно сравнить с polling.
+
+Запуск:
+    python -m tools.load_test --users 200 --ramp 10 --output polling.json
+    python -m tools.load_test --users 200 --ramp 10 --mode webhook --baseline polling.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import secrets
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+from tools.bench_db import percentile
+from tools.fake_telegram import FakeTelegram, start_server
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Step:
+    """Шаг сценария: текст (или callback_data) и ожидаемый фрагмент ответа"""
+    __slots__ = ('handler', 'text', 'expect', 'callback')
+
+    def __init__(self, handler: str, text: str, expect: str, callback: bool = False):
+        self.handler = handler
+        self.text = text
+        self.expect = expect
+        self.callback = callback
+
+
+def training_week(last_expect: str):
+    """Три тренировки недели; ответ на последнюю завершает неделю"""
+    steps = []
+    for day in range(3):
+        steps.append(Step('handle_skip_day_button', '✅ Я выполнил тренировку', 'Болело ли'))
+        steps.append(Step('handle_pain_feedback', 'Здоров', last_expect if day == 2 else 'Тренировка засчитана'))
+    return steps
+
+
+JOURNEY = (
+    Step('start', '/start', 'Главное меню'),
+    Step('show_main', 'main', 'Основное меню'),
+    Step('show_anketa_menu', 'questionnaire', 'Меню анкеты'),
+    Step('start_form', '/form', 'рост'),
+    Step('get_height', '180', 'вес'),
+    Step('get_weight', '80', 'уровень активности'),
+    Step('get_activity_level', 'Средняя', 'пол'),
+    Step('get_gender', 'Мужской', 'лет'),
+    Step('get_years_experience', '30', 'цель'),
+    Step('get_goal', 'Снизить вес (дефицит)', 'Анкета успешно сохранена'),
+    Step('start_training_process', 'training process', 'Выберите дни'),
+    Step('handle_training_days_selection', 'days_mon_wed_fri', 'Дни тренировок выбраны', callback=True),
+    Step('start_training', 'start_training', 'Статус тренировок', callback=True),
+    *training_week('Неделя 1 выполнена'),
+    Step('handle_next_week_from_training', '➡️ Следующая неделя', 'Перешли на неделю 2'),
+    *training_week('Чек-лист 1'),
+    Step('handle_check_response', '✅ Да', 'Чек-лист 1 пройден'),
+    Step('handle_check02_response', '2500', 'Чек-лист 2 пройден'),
+)
+
+
+class LoadTest:
+    def __init__(self, fake: FakeTelegram, timeout: float, think: float):
+        self.fake = fake
+        self.timeout = timeout
+        self.think = think
+        self.loop = None
+        self.replies = defaultdict(asyncio.Queue)
+        self.ready = asyncio.Event()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(Counter)
+        self.completed = 0
+        self.first_sent = None
+        self.last_reply = None
+
+    def on_call(self, entry: dict) -> None:
+        """Слушатель сервера (поток HTTP): передает ответы бота в очередь чата"""
+        received = time.perf_counter()
+        if entry['method'] in ('getUpdates', 'setWebhook'):
+            self.loop.call_soon_threadsafe(self.ready.set)
+        chat_id = entry['params'].get('chat_id')
+        if chat_id is not None and entry['method'] in ('sendMessage', 'editMessageText'):
+            self.loop.call_soon_threadsafe(self._deliver, int(chat_id), received, entry)
+
+    def _deliver(self, chat_id: int, received: float, entry: dict) -> None:
+        self.replies[chat_id].put_nowait((received, entry))
+
+    async def wait_reply(self, user_id: int, method: str):
+        queue = self.replies[user_id]
+        deadline = time.perf_counter() + self.timeout
+        while True:
+            received, entry = await asyncio.wait_for(queue.get(), max(0.0, deadline - time.perf_counter()))
+            if entry['method'] == method:
+                return received, entry
+
+    async def run_user(self, user_id: int, delay: float) -> None:
+        await asyncio.sleep(delay)
+        queue = self.replies[user_id]
+        message = None
+        for step in JOURNEY:
+            # Ответы прошлых шагов, пришедшие после ожидаемого, к этому шагу не относятся
+            while not queue.empty():
+                queue.get_nowait()
+
+            sent = time.perf_counter()
+            if self.first_sent is None:
+                self.first_sent = sent
+            if step.callback:
+                self.fake.inject_callback(user_id, step.text, message)
+            else:
+                self.fake.inject_message(user_id, step.text)
+
+            try:
+                received, entry = await self.wait_reply(user_id, 'editMessageText' if step.callback else 'sendMessage')
+            except asyncio.TimeoutError:
+                self.errors[step.handler]['timeout'] += 1
+                return
+            if entry['status'] != 200:
+                self.errors[step.handler][f"http_{entry['status']}"] += 1
+                return
+
+            self.last_reply = received
+            self.latencies[step.handler].append(received - sent)
+            text = entry['params'].get('text', '')
+            if step.expect not in text:
+                # Сценарий разошелся с ботом: дальнейшие шаги не имеют смысла
+                self.errors[step.handler]['unexpected_reply'] += 1
+                return
+            if 'inline_keyboard' in (entry['params'].get('reply_markup') or {}):
+                message = {
+                    'message_id': entry.get('message_id', 0), 'date': int(time.time()),
+                    'chat': {'id': user_id, 'type': 'private'}, 'text': text,
+                }
+            if self.think:
+                await asyncio.sleep(random.uniform(0, self.think))
+        self.completed += 1
+
+    async def run(self, users: int, ramp: float, first_user_id: int) -> None:
+        self.loop = asyncio.get_running_loop()
+        self.fake.listeners.append(self.on_call)
+        try:
+            await asyncio.wait_for(self.ready.wait(), 60)
+            await asyncio.gather(*(
+                self.run_user(first_user_id + index, ramp * index / users) for index in range(users)
+            ))
+        finally:
+            self.fake.listeners.remove(self.on_call)
+
+
+def start_bot(base_url: str, db_path: str, log_path: str, mode: str = 'polling',
+              webhook_port: int = None) -> subprocess.Popen:
+    env = dict(os.environ, TELEGRAM_BASE_URL=base_url, TELEGRAM_BOT_TOKEN='1:load-test',
+               DB_PATH=db_path, SCHEDULER_LEASE='local', BOT_MODE=mode)
+    if mode == 'webhook':
+        env.update(WEBHOOK_URL=f"http://127.0.0.1:{webhook_port}/telegram", WEBHOOK_LISTEN='127.0.0.1',
+                   WEBHOOK_PORT=str(webhook_port), WEBHOOK_SECRET=secrets.token_urlsafe(16))
+    log = open(log_path, 'w', encoding='utf-8')
+    return subprocess.Popen([sys.executable, 'main.py'], cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def stop_bot(process: subprocess.Popen) -> None:
+    # SIGINT - штатная остановка run_polling (коммит очереди записи, закрытие базы)
+    process.send_signal(signal.SIGINT if os.name != 'nt' else signal.CTRL_C_EVENT)
+    try:
+        process.wait(30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def summarize(test: LoadTest, fake: FakeTelegram, args) -> dict:
+    handlers = {}
+    for step in JOURNEY:
+        if step.handler in handlers:
+            continue
+        values = test.latencies[step.handler]
+        handlers[step.handler] = {
+            'count': len(values),
+            'errors': dict(test.errors[step.handler]),
+            'p50_ms': round(percentile(values, 50) * 1000, 2),
+            'p95_ms': round(percentile(values, 95) * 1000, 2),
+            'p99_ms': round(percentile(values, 99) * 1000, 2),
+            'max_ms': round(max(values, default=0) * 1000, 2),
+        }
+    updates = sum(len(values) for values in test.latencies.values())
+    duration = (test.last_reply - test.first_sent) if test.last_reply and test.first_sent else 0.0
+    return {
+        'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'config': {
+            'mode': args.mode, 'users': args.users, 'ramp': args.ramp, 'think': args.think, 'latency': args.latency,
+            'flood_rate': args.flood_rate, 'timeout': args.timeout,
+            'db_write_queue': os.getenv('DB_WRITE_QUEUE') == '1',
+            'concurrent_updates': int(os.getenv('CONCURRENT_UPDATES', '1')),
+        },
+        'journey_steps': len(JOURNEY),
+        'completed_journeys': test.completed,
+        'updates': updates,
+        'duration_s': round(duration, 3),
+        'updates_per_second': round(updates / duration, 1) if duration else 0.0,
+        'handlers': handlers,
+        'bot_api_calls': dict(Counter(call['method'] for call in fake.calls)),
+    }
+
+
+def print_report(result: dict, baseline: dict = None) -> None:
+    print(f"Режим: {result['config']['mode']}, пользователей: {result['config']['users']}, "
+          f"прошли сценарий: {result['completed_journeys']}")
+    print(f"Update: {result['updates']} за {result['duration_s']:.1f} с - {result['updates_per_second']:.1f} update/с")
+    header = f"{'обработчик':<32} {'n':>6} {'p50 мс':>9} {'p95 мс':>9} {'p99 мс':>9} {'ошибки':>8}"
+    if baseline:
+        header += f" {'p95 было':>9}"
+    print(header)
+    for name, stats in result['handlers'].items():
+        line = (f"{name:<32} {stats['count']:>6} {stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} "
+                f"{stats['p99_ms']:>9.1f} {sum(stats['errors'].values()):>8}")
+        if baseline:
+            previous = baseline['handlers'].get(name)
+            line += f" {previous['p95_ms']:>9.1f}" if previous else f" {'-':>9}"
+        print(line)
+    if baseline:
+        print(f"update/с было: {baseline['updates_per_second']:.1f} "
+              f"(commit {baseline.get('commit')}, {baseline['config'].get('mode', 'polling')})")
+
+
+async def run_load(fake: FakeTelegram, args) -> LoadTest:
+    test = LoadTest(fake, args.timeout, args.think)
+    await test.run(args.users, args.ramp, args.first_user_id)
+    return test
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=100, help='число виртуальных пользователей')
+    parser.add_argument('--ramp', type=float, default=5.0, help='за сколько секунд стартуют все пользователи')
+    parser.add_argument('--think', type=float, default=0.0, help='пауза пользователя между шагами, до N с')
+    parser.add_argument('--timeout', type=float, default=30.0, help='ожидание ответа бота на шаг, с')
+    parser.add_argument('--latency', type=float, default=0.0, help='задержка ответа Bot API, с')
+    parser.add_argument('--flood-rate', type=float, default=0.0, help='доля вызовов Bot API с ответом 429')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--mode', choices=('polling', 'webhook'), default='polling', help='режим получения update')
+    parser.add_argument('--webhook-port', type=int, default=8443)
+    parser.add_argument('--concurrent-updates', type=int, default=None,
+                        help='CONCURRENT_UPDATES бота (по умолчанию - из окружения)')
+    parser.add_argument('--first-user-id', type=int, default=1_000_000)
+    parser.add_argument('--external-bot', action='store_true',
+                        help='не запускать main.py: бот уже запущен с TELEGRAM_BASE_URL на этот сервер')
+    parser.add_argument('--record', help='журнал вызовов Bot API (JSON Lines)')
+    parser.add_argument('--output', help='файл результата (JSON)')
+    parser.add_argument('--baseline', help='результат прошлого запуска для сравнения')
+    args = parser.parse_args()
+
+    if args.concurrent_updates is not None:
+        os.environ['CONCURRENT_UPDATES'] = str(args.concurrent_updates)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            baseline = json.load(file)
+
+    fake = FakeTelegram(latency=args.latency, flood_rate=args.flood_rate, record_path=args.record)
+    server = start_server(fake, port=args.port)
+    base_url = f"http://127.0.0.1:{args.port}/bot"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bot = None
+        if not args.external_bot:
+            bot = start_bot(base_url, os.path.join(tmp, 'load.db'), os.path.join(tmp, 'bot.log'),
+                            args.mode, args.webhook_port)
+        try:
+            test = asyncio.run(run_load(fake, args))
+        finally:
+            if bot is not None:
+                stop_bot(bot)
+                if bot.returncode not in (0, -signal.SIGINT):
+                    with open(os.path.join(tmp, 'bot.log'), encoding='utf-8') as log:
+                        print(log.read()[-4000:])
+            server.shutdown()
+            fake.close()
+
+    result = summarize(test, fake, args)
+    print_report(result, baseline)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(result, file, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
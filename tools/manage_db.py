@@ -0,0 +1,46 @@
+"""
+Служебные команды для базы данных бота.
+
+Запуск:
+    python -m tools.manage_db init [--db users.db] [--profile balanced]
+    python -m tools.manage_db backfill-latest [--db users.db]
+"""
+import argparse
+
+from database.DataBase import init_db, backfill_user_latest
+from database.connection import DEFAULT_DB_PATH, DEFAULT_PROFILE, PRAGMA_PROFILES, close_all
+
+
+def cmd_init(args):
+    init_db(args.db, profile=args.profile)
+    print(f"Схема базы {args.db} создана/обновлена (профиль {args.profile})")
+
+
+def cmd_backfill_latest(args):
+    # init_db создает таблицу user_latest и триггеры, если база старая
+    init_db(args.db, profile=args.profile)
+    count = backfill_user_latest(args.db)
+    print(f"user_latest заполнена: {count} пользователей")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help='путь к файлу базы')
+    parser.add_argument('--profile', default=DEFAULT_PROFILE, choices=sorted(PRAGMA_PROFILES),
+                        help='профиль производительности SQLite')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('init', help='создать схему и индексы').set_defaults(func=cmd_init)
+    subparsers.add_parser(
+        'backfill-latest', help='заполнить user_latest по истории анкет (для существующих баз)'
+    ).set_defaults(func=cmd_backfill_latest)
+
+    args = parser.parse_args()
+    try:
+        args.func(args)
+    finally:
+        close_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+"""
+Рассылка сообщений задачами планировщика.
+
+Сообщения отправляются несколькими параллельными воркерами с соблюдением
+лимитов Telegram: общего (около 30 сообщений в секунду на бота) и
+на один чат (не чаще раза в секунду). RetryAfter приостанавливает всю
+рассылку на указанное время, после чего сообщение отправляется повторно.
+Пользователи, заблокировавшие бота (Forbidden), передаются в on_blocked.
+"""
+import asyncio
+import logging
+import os
+import time
+from datetime import timedelta
+
+from telegram.error import Forbidden, NetworkError, RetryAfter, TelegramError
+
+
+logger = logging.getLogger(__name__)
+
+# Общий лимит отправки, сообщений в секунду (с запасом от лимита Telegram в 30)
+DEFAULT_RATE = float(os.getenv('BROADCAST_RATE', '25'))
+
+# Минимальный интервал между сообщениями в один чат, с
+DEFAULT_PER_CHAT_INTERVAL = 1.0
+
+# Количество одновременных запросов к Bot API
+DEFAULT_CONCURRENCY = int(os.getenv('BROADCAST_CONCURRENCY', '16'))
+
+# Количество повторов сообщения после RetryAfter или сетевой ошибки
+DEFAULT_MAX_RETRIES = 3
+
+
+class RateLimiter:
+    """Равномерный лимит: не больше rate вызовов wait() в секунду"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+
+    async def wait(self) -> None:
+        now = time.monotonic()
+        slot = max(now, self._next)
+        self._next = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    def pause(self, seconds: float) -> None:
+        """Сдвигает следующие слоты не раньше чем через seconds (RetryAfter)"""
+        self._next = max(self._next, time.monotonic() + seconds)
+
+
+class BroadcastReport:
+    """Итоги рассылки"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.sent = 0
+        self.failed = 0
+        self.blocked = 0
+        self.retries = 0
+        self.started_at = time.monotonic()
+        self.elapsed = 0.0
+
+    @property
+    def rate(self) -> float:
+        return self.sent / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        return (f"{self.name}: отправлено {self.sent}, ошибок {self.failed}, "
+                f"заблокировали бота {self.blocked}, повторов {self.retries}, "
+                f"{self.elapsed:.1f} с ({self.rate:.1f} сообщ./с)")
+
+
+def _retry_after_seconds(error: RetryAfter) -> float:
+    retry_after = error.retry_after
+    if isinstance(retry_after, timedelta):
+        return retry_after.total_seconds()
+    return float(retry_after)
+
+
+async def broadcast(bot, messages, name: str = 'broadcast', on_blocked=None,
+                    rate: float = DEFAULT_RATE, per_chat_interval: float = DEFAULT_PER_CHAT_INTERVAL,
+                    concurrency: int = DEFAULT_CONCURRENCY,
+                    max_retries: int = DEFAULT_MAX_RETRIES) -> BroadcastReport:
+    """Отправляет сообщения и возвращает BroadcastReport
+
+    messages - итерируемый или асинхронно итерируемый источник словарей с
+    аргументами bot.send_message (chat_id, text, reply_markup, ...). Источник
+    читается по мере отправки, поэтому его можно строить пачками из базы.
+    on_blocked(chat_ids) - корутина, вызываемая в конце со списком чатов,
+    заблокировавших бота.
+    """
+    report = BroadcastReport(name)
+    limiter = RateLimiter(rate)
+    last_sent = {}
+    blocked = []
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+
+    async def send(message: dict) -> None:
+        chat_id = message['chat_id']
+        for attempt in range(max_retries + 1):
+            # Лимит на чат: следующий слот не раньше per_chat_interval после предыдущего
+            chat_slot = last_sent.get(chat_id, 0.0) + per_chat_interval
+            last_sent[chat_id] = max(time.monotonic(), chat_slot)
+            delay = chat_slot - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await limiter.wait()
+            try:
+                await bot.send_message(**message)
+            except RetryAfter as e:
+                seconds = _retry_after_seconds(e)
+                logger.warning("%s: RetryAfter %.0f с, рассылка приостановлена", name, seconds)
+                limiter.pause(seconds)
+            except Forbidden:
+                report.blocked += 1
+                blocked.append(chat_id)
+                return
+            except NetworkError as e:
+                logger.warning("%s: сетевая ошибка для чата %s: %s", name, chat_id, e)
+                await asyncio.sleep(2 ** attempt)
+            except TelegramError as e:
+                logger.warning("%s: сообщение в чат %s не отправлено: %s", name, chat_id, e)
+                report.failed += 1
+                return
+            else:
+                report.sent += 1
+                return
+            if attempt < max_retries:
+                report.retries += 1
+        report.failed += 1
+
+    async def worker() -> None:
+        while True:
+            message = await queue.get()
+            try:
+                await send(message)
+            except Exception:
+                logger.exception("%s: ошибка отправки в чат %s", name, message.get('chat_id'))
+                report.failed += 1
+            finally:
+                queue.task_done()
+
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    try:
+        if hasattr(messages, '__aiter__'):
+            async for message in messages:
+                await queue.put(message)
+        else:
+            for message in messages:
+                await queue.put(message)
+        await queue.join()
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    if blocked and on_blocked is not None:
+        try:
+            await on_blocked(blocked)
+        except Exception:
+            logger.exception("%s: не удалось обработать заблокировавших бота пользователей", name)
+
+    report.elapsed = time.monotonic() - report.started_at
+    # Минутные задачи чаще всего ничего не отправляют - такие рассылки не засоряют лог
+    level = logging.INFO if report.sent or report.failed or report.blocked else logging.DEBUG
+    logger.log(level, "%s", report)
+    return report
@@ -0,0 +1,76 @@
+"""
+Распознавание ответов пользователя в свободном тексте.
+
+Все фразы (ответы о тренировке, боль, да/нет для чек-листа) собраны в одно
+регулярное выражение: текст проходится один раз, найденные фразы превращаются
+в Intent по тем же правилам приоритета, что и раньше (выполнил > не выполнил > боль).
+Фразы ищутся как подстроки текста в нижнем регистре.
+"""
+import re
+from enum import Enum
+
+
+class Intent(Enum):
+    NONE = 'none'
+    TRAINING_DONE = 'training_done'        # "✅ Да, выполнил"
+    TRAINING_MISSED = 'training_missed'    # "❌ Нет, не выполнил"
+    HEALTHY = 'healthy'                    # кнопка "Здоров"
+    PAIN = 'pain'                          # "Болит рука" и другие ответы о боли
+    YES = 'yes'                            # ответ на check01
+    NO = 'no'
+
+
+TRAINING_DONE_PHRASE = 'да, выполнил'
+TRAINING_MISSED_PHRASE = 'нет, не выполнил'
+HEALTHY_PHRASE = 'здоров'
+PAIN_PHRASES = (HEALTHY_PHRASE, 'болит рука', 'болит спина', 'болят ноги')
+YES_MARKS = ('да', '✅')
+NO_MARKS = ('нет', '❌')
+
+# Фразы, с которыми сообщение относится к тренировке (а не к навигации)
+TRAINING_PHRASES = (TRAINING_DONE_PHRASE, TRAINING_MISSED_PHRASE) + PAIN_PHRASES
+
+# Ответы о боли (и о выполнении тренировки) обрабатывает handle_training_response
+TRAINING_INTENTS = frozenset({Intent.TRAINING_DONE, Intent.TRAINING_MISSED, Intent.HEALTHY, Intent.PAIN})
+
+# Длинные фразы раньше коротких: "да, выполнил" не должно разбиться на "да"
+_PHRASES = sorted(set(TRAINING_PHRASES + YES_MARKS + NO_MARKS), key=len, reverse=True)
+_PHRASES_RE = re.compile('|'.join(re.escape(phrase) for phrase in _PHRASES))
+
+# Фразы, которые содержат другие фразы: найденная длинная фраза означает и короткую
+_IMPLIED = {
+    TRAINING_DONE_PHRASE: ('да',),
+    TRAINING_MISSED_PHRASE: ('нет',),
+}
+
+
+def find_phrases(text: str) -> set:
+    """Фразы, которые встречаются в тексте (один проход по тексту)"""
+    found = set(_PHRASES_RE.findall(text.lower()))
+    for phrase, implied in _IMPLIED.items():
+        if phrase in found:
+            found.update(implied)
+    return found
+
+
+def classify(text: str) -> Intent:
+    """Ответ о тренировке или боли; Intent.NONE - сообщение для навигации"""
+    found = find_phrases(text)
+    if not found or found.isdisjoint(TRAINING_PHRASES):
+        return Intent.NONE
+    if TRAINING_DONE_PHRASE in found or {'✅', 'да'} <= found:
+        return Intent.TRAINING_DONE
+    if TRAINING_MISSED_PHRASE in found or {'❌', 'нет'} <= found:
+        return Intent.TRAINING_MISSED
+    # "Здоров" засчитывается только кнопкой, остальные ответы о боли пока не различаются
+    return Intent.HEALTHY if text.strip().lower() == HEALTHY_PHRASE else Intent.PAIN
+
+
+def classify_answer(text: str) -> Intent:
+    """Ответ да/нет на чек-лист (check01)"""
+    found = find_phrases(text)
+    if not found.isdisjoint(YES_MARKS):
+        return Intent.YES
+    if not found.isdisjoint(NO_MARKS):
+        return Intent.NO
+    return Intent.NONE
@@ -0,0 +1,106 @@
+"""
+Объединение ответов обработчика в одно сообщение.
+
+Обработчики часто отправляют несколько reply_text подряд (поздравление и
+статус, итог анкеты и пояснения). Пока обрабатывается update, BufferedBot
+не отправляет текстовые сообщения сразу, а копит их: соседние ответы в тот
+же чат склеиваются в одно сообщение до лимита Telegram в 4096 символов, с
+клавиатурой последнего из них. Буфер отправляется, когда обработка update
+закончилась, а также перед любым другим запросом к Bot API (answer,
+edit_message_text, ...), поэтому порядок сообщений в чате не меняется.
+
+Вне обработки update (рассылки планировщика) сообщения отправляются сразу.
+Буферизованный send_message возвращает None вместо Message.
+"""
+from contextvars import ContextVar
+
+from telegram import InlineKeyboardMarkup
+from telegram.constants import MessageLimit
+from telegram.ext import Application, ExtBot
+
+
+# Разделитель склеенных ответов
+REPLY_SEPARATOR = '\n\n'
+
+_reply_buffer = ContextVar('reply_buffer', default=None)
+
+
+class ReplyBuffer:
+    """Ответы текущего update, еще не отправленные в Telegram"""
+
+    def __init__(self):
+        self.pending = None
+
+    def can_merge(self, message: dict) -> bool:
+        pending = self.pending
+        if pending['chat_id'] != message['chat_id']:
+            return False
+        # Остальные параметры (parse_mode, entities, ...) должны совпадать
+        other = {k: v for k, v in message.items() if k not in ('text', 'reply_markup')}
+        if other != {k: v for k, v in pending.items() if k not in ('text', 'reply_markup')}:
+            return False
+        if other.get('entities'):
+            return False
+        # Inline-кнопки относятся к своему сообщению; обычная клавиатура - ко всему чату,
+        # и новая inline-клавиатура заменила бы ее
+        if isinstance(pending.get('reply_markup'), InlineKeyboardMarkup):
+            return False
+        if pending.get('reply_markup') is not None and isinstance(message.get('reply_markup'), InlineKeyboardMarkup):
+            return False
+        length = len(pending['text']) + len(REPLY_SEPARATOR) + len(message['text'])
+        return length <= MessageLimit.MAX_TEXT_LENGTH
+
+    async def add(self, bot: 'BufferedBot', message: dict) -> None:
+        if self.pending is not None and self.can_merge(message):
+            self.pending['text'] += REPLY_SEPARATOR + message['text']
+            if message.get('reply_markup') is not None:
+                self.pending['reply_markup'] = message['reply_markup']
+            return
+        await self.flush(bot)
+        self.pending = message
+
+    async def flush(self, bot: 'BufferedBot') -> None:
+        message, self.pending = self.pending, None
+        if message is not None:
+            await bot.send_message_now(**message)
+
+
+class BufferedBot(ExtBot):
+    """ExtBot, который копит текстовые ответы обработчика (см. BufferedApplication)"""
+
+    async def send_message(self, chat_id, text, *args, **kwargs):
+        buffer = _reply_buffer.get()
+        if buffer is None or args:
+            return await super().send_message(chat_id, text, *args, **kwargs)
+        await buffer.add(self, dict(kwargs, chat_id=chat_id, text=text))
+        return None
+
+    async def send_message_now(self, chat_id, text, **kwargs):
+        """Отправляет сообщение в обход буфера"""
+        return await super().send_message(chat_id, text, **kwargs)
+
+    async def _post(self, endpoint, *args, **kwargs):
+        # Любой другой запрос отправляет накопленные ответы первыми
+        buffer = _reply_buffer.get()
+        if buffer is not None and buffer.pending is not None:
+            await buffer.flush(self)
+        return await super()._post(endpoint, *args, **kwargs)
+
+
+class BufferedApplication(Application):
+    """Application, который отправляет ответы обработчиков одним сообщением после update"""
+
+    async def process_update(self, update: object) -> None:
+        buffer = ReplyBuffer()
+        token = _reply_buffer.set(buffer)
+        try:
+            await super().process_update(update)
+        finally:
+            try:
+                await buffer.flush(self.bot)
+            except Exception as exc:
+                # Ошибка отправки (например, RetryAfter) - как ошибка обработчика: в error handlers,
+                # а не в цикл получения update
+                await self.process_error(update=update, error=exc)
+            finally:
+                _reply_buffer.reset(token)
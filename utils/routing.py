@@ -0,0 +1,72 @@
+"""
+Табличная маршрутизация сообщений и callback-кнопок.
+
+Текстовые кнопки: таблица (состояние, текст) -> обработчик собирается один раз
+при импорте, выбор обработчика - один поиск в словаре. Маршрут с ANY_STATE
+работает в любом состоянии: он копируется в каждое состояние при сборке.
+
+Callback-кнопки: CallbackRouter выбирает обработчик по точному callback_data
+или по его префиксу (до первого '_' или ':' включительно), поэтому все кнопки
+модуля обслуживает один CallbackQueryHandler вместо перебора регулярных выражений.
+"""
+import re
+
+from telegram.ext import CallbackQueryHandler
+
+
+# Состояние маршрута, который работает в любом состоянии
+ANY_STATE = None
+
+_PREFIX_RE = re.compile(r'^[^_:]*[_:]')
+
+
+def normalize_text(text: str) -> str:
+    """Текст кнопки в виде ключа таблицы маршрутов"""
+    return text.strip().lower()
+
+
+def build_routes(table, states) -> dict:
+    """Словарь (состояние, текст) -> обработчик из строк таблицы (состояние, текст, обработчик)"""
+    routes = {}
+    for state, text, handler in table:
+        for route_state in (states if state is ANY_STATE else (state,)):
+            key = (route_state, normalize_text(text))
+            if key in routes:
+                raise ValueError(f"Маршрут {key} задан дважды")
+            routes[key] = handler
+    return routes
+
+
+class CallbackRouter:
+    """Обработчики callback_data по точному значению или префиксу ('days_', 'forms:')"""
+
+    def __init__(self, routes: dict = None):
+        self.routes = {}
+        for key, handler in (routes or {}).items():
+            self.add(key, handler)
+
+    def add(self, key: str, handler) -> None:
+        if key in self.routes:
+            raise ValueError(f"Маршрут callback {key!r} задан дважды")
+        self.routes[key] = handler
+
+    def resolve(self, data):
+        """Обработчик для callback_data или None"""
+        if not data:
+            return None
+        handler = self.routes.get(data)
+        if handler is None:
+            prefix = _PREFIX_RE.match(data)
+            if prefix is not None:
+                handler = self.routes.get(prefix.group())
+        return handler
+
+    def matches(self, data) -> bool:
+        return self.resolve(data) is not None
+
+    async def dispatch(self, update, context):
+        return await self.resolve(update.callback_query.data)(update, context)
+
+    def handler(self) -> CallbackQueryHandler:
+        """Один CallbackQueryHandler для всех маршрутов; остальные callback_data идут дальше"""
+        return CallbackQueryHandler(self.dispatch, pattern=self.matches)
@@ -0,0 +1,86 @@
+"""
+Расписание проверок тренировок.
+
+Время задач задается в местном времени пользователя (минута суток) и сдвигается
+на reminder_offset. Моменты следующей проверки и напоминания хранятся в
+training_sessions (next_check_at, next_reminder_at - UTC, секунды эпохи), срок
+ответа на проверку - в training_log (expires_at), поэтому задачи планировщика
+выбирают по индексу только строки, время которых наступило, а не все активные сессии.
+"""
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+
+from utils.timezones import DEFAULT_TIMEZONE, get_zone
+
+
+# Маппинг дней недели
+DAYS_MAPPING = {
+    "Пн-Ср-Пт": [0, 2, 4],  # Понедельник, Среда, Пятница
+    "Вт-Чт-Сб": [1, 3, 5],  # Вторник, Четверг, Суббота
+    "Ср-Пт-Вс": [2, 4, 6],  # Среда, Пятница, Воскресенье
+}
+
+# Типы тренировок по дням
+TRAINING_TYPES = ["День 1: Грудь, Плечи, Трицепс", "День 2: Спина, Бицепс", "День 3: Ноги и Кор"]
+
+# Местное время задач (минута суток); сдвигается на reminder_offset пользователя
+CHECK_TIME = 23 * 60            # вопрос о тренировке
+REMINDER_TIME = 16 * 60         # напоминание на следующий день
+RESET_TIME = 23 * 60 + 59       # сброс сессий без ответа
+
+
+def training_type_for(training_days: str, weekday: int):
+    """Тип тренировки расписания training_days в день недели weekday (None - день отдыха)"""
+    training_days_list = DAYS_MAPPING.get(training_days)
+    if not training_days_list or weekday not in training_days_list:
+        return None
+    return TRAINING_TYPES[training_days_list.index(weekday)]
+
+
+def slot_time(day: date, target_minute: int, timezone: str = None, reminder_offset: int = 0) -> datetime:
+    """Момент (UTC), когда в день day наступает местное время target_minute со сдвигом"""
+    local = datetime.combine(day, time(target_minute // 60, target_minute % 60),
+                             tzinfo=get_zone(timezone or DEFAULT_TIMEZONE))
+    return (local + timedelta(minutes=reminder_offset)).astimezone(dt_timezone.utc)
+
+
+def slot_date(moment: datetime, timezone: str = None, reminder_offset: int = 0) -> date:
+    """День, к которому относится слот, наступивший в moment (обратное к slot_time)"""
+    local = moment.astimezone(get_zone(timezone or DEFAULT_TIMEZONE))
+    return (local - timedelta(minutes=reminder_offset)).date()
+
+
+def next_check_time(training_days: str, timezone: str = None, reminder_offset: int = 0,
+                    after: datetime = None):
+    """Ближайшая после after проверка тренировки (CHECK_TIME в день тренировки); None - нет расписания"""
+    training_days_list = DAYS_MAPPING.get(training_days)
+    if not training_days_list:
+        return None
+    after = after or datetime.now(dt_timezone.utc)
+    day = slot_date(after, timezone, reminder_offset)
+    # Сдвиг не больше нескольких часов: достаточно начать с предыдущего дня и пройти неделю
+    for days in range(-1, 8):
+        candidate = day + timedelta(days=days)
+        if candidate.weekday() in training_days_list:
+            moment = slot_time(candidate, CHECK_TIME, timezone, reminder_offset)
+            if moment > after:
+                return moment
+    return None
+
+
+def reminder_time(training_date: date, timezone: str = None, reminder_offset: int = 0) -> datetime:
+    """Напоминание о тренировке training_date: REMINDER_TIME следующего дня"""
+    return slot_time(training_date + timedelta(days=1), REMINDER_TIME, timezone, reminder_offset)
+
+
+def reset_time(training_date: date, timezone: str = None, reminder_offset: int = 0) -> datetime:
+    """Срок ответа на проверку тренировки training_date: RESET_TIME через день, затем сессия сбрасывается"""
+    return slot_time(training_date + timedelta(days=2), RESET_TIME, timezone, reminder_offset)
+
+
+def to_timestamp(moment: datetime):
+    """Момент в секундах эпохи для колонок next_*_at и expires_at (None остается None)"""
+    return int(moment.timestamp()) if moment is not None else None
+
+
+def from_timestamp(timestamp: int) -> datetime:
+    return datetime.fromtimestamp(timestamp, dt_timezone.utc)
@@ -0,0 +1,110 @@
+"""
+Часовые пояса пользователей и сдвиг напоминаний.
+
+Время напоминаний задается в местном времени пользователя (например, 23:00)
+и сдвигается на reminder_offset минут; моменты напоминаний считает
+utils.schedule.
+"""
+import functools
+import logging
+import os
+import re
+from datetime import datetime, timezone as dt_timezone
+from zoneinfo import ZoneInfo, available_timezones
+
+
+logger = logging.getLogger(__name__)
+
+# Допустимый сдвиг напоминаний, минуты (кратно шагу)
+MIN_REMINDER_OFFSET = -180
+MAX_REMINDER_OFFSET = 180
+REMINDER_OFFSET_STEP = 15
+
+_UTC_OFFSET = re.compile(r'^(?:utc|gmt)?\s*([+-])\s*(\d{1,2})$', re.IGNORECASE)
+
+
+@functools.lru_cache(maxsize=None)
+def _timezone_names() -> dict:
+    """Имена часовых поясов IANA: {имя в нижнем регистре: имя}"""
+    return {name.lower(): name for name in available_timezones()}
+
+
+def server_timezone() -> str:
+    """Имя часового пояса IANA сервера: напоминания по умолчанию идут по его времени, как до поясов
+
+    Берется из TZ, /etc/timezone или ссылки /etc/localtime. Если имя узнать нельзя
+    (например, на Windows), используется текущее смещение сервера от UTC (Etc/GMT±N)
+    без перехода на летнее время - в этом случае лучше задать BOT_TIMEZONE явно.
+    """
+    tz = os.getenv('TZ', '').lstrip(':')
+    candidates = [tz]
+    # TZ в формате POSIX ('EST5EDT,M3.2.0,M11.1.0') важнее системных файлов - берем смещение
+    if not tz:
+        try:
+            with open('/etc/timezone', encoding='utf-8') as file:
+                candidates.append(file.read().strip())
+        except OSError:
+            pass
+        localtime = os.path.realpath('/etc/localtime')
+        if 'zoneinfo/' in localtime:
+            candidates.append(localtime.split('zoneinfo/', 1)[1])
+    for name in candidates:
+        if name and name.lower() in _timezone_names():
+            return _timezone_names()[name.lower()]
+
+    offset = datetime.now().astimezone().utcoffset()
+    hours, rest = divmod(int(offset.total_seconds()), 3600)
+    if rest:
+        logger.warning("Смещение сервера %s не выражается поясом Etc/GMT: используется UTC, задайте BOT_TIMEZONE",
+                       offset)
+        return 'UTC'
+    if not hours:
+        return 'UTC'
+    # В зонах Etc/GMT знак инвертирован: UTC+3 = Etc/GMT-3
+    return f"Etc/GMT{-hours:+d}"
+
+
+# Часовой пояс бота: используется для пользователей, не выбравших свой (timezone IS NULL).
+# По умолчанию - пояс сервера: до появления часовых поясов проверки шли по его времени
+DEFAULT_TIMEZONE = os.getenv('BOT_TIMEZONE') or server_timezone()
+
+
+@functools.lru_cache(maxsize=None)
+def get_zone(name: str) -> ZoneInfo:
+    return ZoneInfo(name)
+
+
+def parse_timezone(text: str):
+    """Имя часового пояса IANA по вводу пользователя ('Europe/Moscow', 'UTC+3', '-5'); None - не распознан"""
+    text = text.strip()
+    if text.lower() in ('utc', 'gmt'):
+        return 'UTC'
+    match = _UTC_OFFSET.match(text)
+    if match:
+        sign, hours = match.groups()
+        hours = int(hours)
+        if hours == 0:
+            return 'UTC'
+        if hours > 14:
+            return None
+        # В зонах Etc/GMT знак инвертирован: UTC+3 = Etc/GMT-3
+        name = f"Etc/GMT{'-' if sign == '+' else '+'}{hours}"
+        return name if name.lower() in _timezone_names() else None
+    return _timezone_names().get(text.lower())
+
+
+def parse_reminder_offset(text: str):
+    """Сдвиг напоминаний в минутах по вводу пользователя; None - недопустимое значение"""
+    try:
+        offset = int(text.strip())
+    except ValueError:
+        return None
+    if not MIN_REMINDER_OFFSET <= offset <= MAX_REMINDER_OFFSET or offset % REMINDER_OFFSET_STEP:
+        return None
+    return offset
+
+
+def local_now(timezone_name: str = None, now: datetime = None) -> datetime:
+    """Текущее местное время в часовом поясе пользователя (None - пояс бота)"""
+    now = now or datetime.now(dt_timezone.utc)
+    return now.astimezone(get_zone(timezone_name or DEFAULT_TIMEZONE))
@@ -0,0 +1,79 @@
+"""
+Параллельная обработка update с сохранением порядка для каждого пользователя.
+
+PTB с concurrent_updates обрабатывает update независимо, и два сообщения
+одного пользователя могут обгонять друг друга (ConversationHandler, check_step).
+PerUserUpdateProcessor ставит update одного пользователя в очередь (asyncio.Lock
+на пользователя, ожидающие получают его в порядке прихода), а update разных
+пользователей обрабатываются параллельно, не больше max_concurrent_updates сразу.
+
+Слот параллельности занимается только после блокировки пользователя: update,
+которые ждут своей очереди, не занимают слоты и не задерживают других пользователей.
+Поэтому семафор BaseUpdateProcessor (его max_concurrent_updates) ограничивает
+только число ожидающих update, а не обработку.
+"""
+import asyncio
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+
+# Сколько update может ждать своей очереди (практически без ограничения, как очередь PTB)
+MAX_PENDING_UPDATES = 100_000
+
+
+def update_key(update: object):
+    """Ключ очереди update: пользователь, иначе чат; None - порядок не важен"""
+    if isinstance(update, Update):
+        if update.effective_user is not None:
+            return 'user', update.effective_user.id
+        if update.effective_chat is not None:
+            return 'chat', update.effective_chat.id
+    return None
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Update разных пользователей - параллельно, одного пользователя - строго по порядку"""
+
+    __slots__ = ('concurrency', '_slots', '_locks')
+
+    def __init__(self, max_concurrent_updates: int, max_pending_updates: int = MAX_PENDING_UPDATES):
+        if max_concurrent_updates < 1:
+            raise ValueError("max_concurrent_updates должно быть положительным")
+        super().__init__(max(max_pending_updates, max_concurrent_updates, 2))
+        self.concurrency = max_concurrent_updates
+        self._slots = asyncio.BoundedSemaphore(max_concurrent_updates)
+        # Ключ -> [блокировка, число update этого ключа в обработке или в очереди]
+        self._locks = {}
+
+    async def do_process_update(self, update, coroutine) -> None:
+        key = update_key(update)
+        if key is None:
+            async with self._slots:
+                await coroutine
+            return
+
+        # До первого await: задачи update создаются в порядке прихода, поэтому
+        # в очередь блокировки они встают в том же порядке
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                async with self._slots:
+                    await coroutine
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[key]
+
+    def queued_users(self) -> int:
+        """Число пользователей, у которых есть update в обработке или в очереди"""
+        return len(self._locks)
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass